@@ -7,6 +7,7 @@ sys.path.append(parent_directory)
 
 import json
 import common.jsonline as io
+import common.probeout as probeout
 import lib.bindlog as bindlog
 import common.encoding as encoding
 import config as c
@@ -26,30 +27,30 @@ def distribute_client_file(raw_client_file, db, pattern):
     "Measurements": 0,
     "JSON Decode Error": 0
   }
-  with open(raw_client_file, "r") as f:
-    for i, line in enumerate(f):
-      stats['Measurements'] += 1
-      try:
-        d = json.loads(line)
-      except json.JSONDecodeError as e:
-        ERROR_LOG.write(f"JSON Decode Error: {e}, line {i} in {raw_client_file}\n")
-        ERROR_LOG.write(line)
-        stats['JSON Decode Error'] += 1
-        continue
-
-      ns = list(set([q['rr'] for q in d['queries']]))
-      if len(ns) > 1: # If multiple resolvers involved, sort them by IP
-        ns = sorted(ns, key=lambda x: tuple([int(i) for i in x.split(".")]))
-      ns = ns[0]
-
-      # Check if folder exists, if not create it
-      folder = db.ns_folder(ns)
-      if not os.path.exists(folder):
-        os.makedirs(folder)
-
-      client_file = f"{folder}/{file_format.format(pattern=pattern, suffix=client_suffix)}"
-      with open(client_file, "a+") as f:
-        f.write(line)
+  # Header records of the engine are consumed, results are made self-contained (e.g. timestamp anchor)
+  for i, (line, d) in enumerate(probeout.read_probe_output(raw_client_file)):
+    stats['Measurements'] += 1
+    if d is None:
+      ERROR_LOG.write(f"JSON Decode Error: result {i} in {raw_client_file}\n")
+      ERROR_LOG.write(line)
+      stats['JSON Decode Error'] += 1
+      continue
+    if line is None: # Result was rehydrated
+      line = json.dumps(d) + "\n"
+
+    ns = list(set([q['rr'] for q in d['queries']]))
+    if len(ns) > 1: # If multiple resolvers involved, sort them by IP
+      ns = sorted(ns, key=lambda x: tuple([int(i) for i in x.split(".")]))
+    ns = ns[0]
+
+    # Check if folder exists, if not create it
+    folder = db.ns_folder(ns)
+    if not os.path.exists(folder):
+      os.makedirs(folder)
+
+    client_file = f"{folder}/{file_format.format(pattern=pattern, suffix=client_suffix)}"
+    with open(client_file, "a+") as f:
+      f.write(line)
   # Print stats
   STATS_LOG.write(f"\tMeasurements processed: {stats['Measurements']}")
   STATS_LOG.write(f"\tJSON Decode Error: {stats['JSON Decode Error']}")
@@ -5,6 +5,7 @@
 
 #from datetime import datetime
 import datetime
+import ipaddress
 from lib.ZoneConf import ZoneConf
 from statistics import median
 
@@ -20,11 +21,27 @@ def print_measurement_stats(l:list):
     d.print_measurement_stats()
 
 
+""" Return the answer of a response data entry as text.
+Compact results (schema 2) store TTL and type as numbers and the answer as raw rdata in hex, addresses are decoded."""
+def answer_text(entry:dict) -> str:
+  if isinstance(entry['type'], int):
+    if entry['type'] in [1, 28]: # A, AAAA
+      return str(ipaddress.ip_address(bytes.fromhex(entry['answer'])))
+  return entry['answer']
+
+""" Returns the times (sent, received) of a response. Kernel timestamps are preferred if the probe recorded them,
+they exclude the lag of the engine's event loop."""
+def rtt_window(r:dict) -> tuple:
+  if r.get('timestamp_sent_kernel') is not None and r.get('timestamp_kernel') is not None:
+    return (r['timestamp_sent_kernel'], r['timestamp_kernel'])
+  return (r['timestamp_sent'], r['timestamp'])
+
 
 class BasicMeasurement:
 
   def __init__(self, d:dict, zoneconf=None):
 
+    assert 'delta' not in d.keys(), "Normalized probe output, read it with common/probeout.py (e.g. via Combine.py)"
 
     def parse_ts(s:str):
       try:
@@ -32,12 +49,21 @@ class BasicMeasurement:
       except ValueError:
         return datetime.datetime.strptime(s.strip(), '%Y-%m-%d %H:%M:%S')
 
-    # Cast timestamps to datetime
+    # Monotonic timestamps are integer nanoseconds relative to the wall clock anchor of the probe output file
+    if 'timestamp_anchor_ns' in d.keys():
+      anchor = datetime.datetime.fromtimestamp(d['timestamp_anchor_ns'] // 10**9)
+      anchor_ns = d['timestamp_anchor_ns'] % 10**9
+    def mono_ts(ns:int):
+      assert 'timestamp_anchor_ns' in d.keys(), "Monotonic timestamps without timestamp_anchor_ns, read the probe output via Combine.py to resolve them"
+      return anchor + datetime.timedelta(microseconds=(anchor_ns + ns) // 1000)
+
+    # Cast timestamps to datetime, kernel timestamps (KERNEL_TIMESTAMPS of the engine) are optional
     for r in d['responses']:
-      if isinstance(r['timestamp'], str):
-        r['timestamp'] = parse_ts(r['timestamp'])
-      if isinstance(r['timestamp_sent'], str):
-        r['timestamp_sent'] = parse_ts(r['timestamp_sent'])
+      for key in ['timestamp', 'timestamp_sent', 'timestamp_kernel', 'timestamp_sent_kernel']:
+        if isinstance(r.get(key), str):
+          r[key] = parse_ts(r[key])
+        elif isinstance(r.get(key), int):
+          r[key] = mono_ts(r[key])
       assert r['timestamp_sent'] <= r['timestamp'], "Response timestamp is before sent timestamp"
     # Assert responses are sorted by timestamp
     for i in range(len(d['responses']) - 1):
@@ -121,9 +147,9 @@ class BasicMeasurement:
     assert len(vps) == 1, "Basic Measurement corrupted: a Basic Measurement should only ever have one vantage point"
     return vps[0]
 
-  """ Compute upper bound of measurement runtime in seconds"""
+  """ Compute upper bound of measurement runtime in seconds, waits and timeouts may be fractional"""
   def get_max_runtime(self):
-    return sum([(q['wait'] + q['timeout']) * q['repeat'] + q['wait_after'] for q in self.d['queries']])
+    return sum([(float(q['wait']) + float(q['timeout'])) * int(q['repeat']) + float(q['wait_after']) for q in self.d['queries']])
 
   """ Return timedelta between first sent query and first log entry. Add to log timestamps or subtract from query timestamps to align them"""
   def get_ts_delta(self):
@@ -143,22 +169,28 @@ class BasicMeasurement:
 
   """ Returns True if all responses have status code 'status'""" 
   def check_status_all(self, status:str) -> bool:
-    assert status in ["NOERROR","TIMEOUT","NXDOMAIN","NOANSWER","REFUSED","SRVFAIL"], "Invalid status code"
+    assert status in ["NOERROR","TIMEOUT","NXDOMAIN","NOANSWER","REFUSED","SRVFAIL","SKIPPED_OFFLINE"], "Invalid status code"
     return all([r['status'] == status for r in self.d['responses']])
   
   """ Returns True if any response has status code 'status'""" 
   def check_status_any(self, status:str) -> bool:
-    assert status in ["NOERROR","TIMEOUT","NXDOMAIN","NOANSWER","REFUSED","SRVFAIL"], "Invalid status code"
+    assert status in ["NOERROR","TIMEOUT","NXDOMAIN","NOANSWER","REFUSED","SRVFAIL","SKIPPED_OFFLINE"], "Invalid status code"
     return any([r['status'] == status for r in self.d['responses']])
 
   """ Returns number of responses with status code 'status'""" 
   def num_status(self, status:str) -> int:
-    assert status in ["NOERROR","TIMEOUT","NXDOMAIN","NOANSWER","REFUSED","SRVFAIL"], "Invalid status code"
+    assert status in ["NOERROR","TIMEOUT","NXDOMAIN","NOANSWER","REFUSED","SRVFAIL","SKIPPED_OFFLINE"], "Invalid status code"
     return len([r for r in self.d['responses'] if r['status'] == status])
   
-  """ Check if all client responses are timeouts"""
+  """ Returns number of TIMEOUT responses whose deadline was shortened by adaptive timeouts of the engine,
+  i.e. the resolver might have answered within the full timeout of the query"""
+  def num_adaptive_timeouts(self) -> int:
+    timeout = max([float(q['timeout']) for q in self.d['queries']])
+    return len([r for r in self.d['responses'] if r['status'] == "TIMEOUT" and r.get('deadline', timeout) < timeout])
+
+  """ Check if all client responses are timeouts, or were skipped because the engine already found the resolver offline"""
   def is_offline(self) -> bool:
-    return all([r['status'] == "TIMEOUT" for r in self.d['responses']])
+    return all([r['status'] in ["TIMEOUT", "SKIPPED_OFFLINE"] for r in self.d['responses']])
 
   """ Check that ANY responses have status other than TIMEOUT"""
   def is_online(self) -> bool:
@@ -179,9 +211,9 @@ class BasicMeasurement:
   def num_queries_planned(self) -> int:
     return sum([int(q['repeat']) for q in self.d['queries']])
     
-  """ Returns number of queries that were actually sent in this measurement"""
+  """ Returns number of queries that were actually sent in this measurement, skipped queries of offline resolvers excluded"""
   def num_queries_sent(self) -> int:
-    return len(self.d['responses'])
+    return len([r for r in self.d['responses'] if r['status'] != "SKIPPED_OFFLINE"])
 
   """ Returns True if number of actually sent queries equals number of planned queries"""
   def result_complete(self) -> bool:
@@ -208,11 +240,12 @@ class BasicMeasurement:
   
   def print_timeout_stats(self):
     loc = [i for i, r in enumerate(self.d['responses'], start=1) if r['status'] == "TIMEOUT"]
+    num_sent = max(self.num_queries_sent(), 1)
     if len(loc) > 10:
       p_loc = loc[0:20]
-      print(f"{len(loc)} timeouts, {100 * len(loc) / len(self.d['responses'])} % of {len(self.d['responses'])} total responses, Locations: {str(p_loc)[0:-1]}, ...]")
+      print(f"{len(loc)} timeouts, {100 * len(loc) / num_sent} % of {self.num_queries_sent()} queries sent, Locations: {str(p_loc)[0:-1]}, ...]")
     else:
-      print(f"Timeouts: {loc}, {100 * len(loc) / len(self.d['responses'])} %, total responses: {len(self.d['responses'])}")
+      print(f"Timeouts: {loc}, {100 * len(loc) / num_sent} %, queries sent: {self.num_queries_sent()}")
 
   def print_measurement_stats(self):
     names = set([a['name'] for a in self.d['responses'] if a['status'] != "FAIL"])
@@ -308,7 +341,7 @@ class BasicMeasurement:
     assert self.cs_maf(), "Conditions for 'maf' not satisfied"
     
     query_sent = self.d['responses'][0]['timestamp_sent']
-    timeout = self.d['queries'][0]['timeout'] # Configured timeout of the client
+    timeout = float(self.d['queries'][0]['timeout']) # Configured timeout of the client
     window = (query_sent, query_sent + datetime.timedelta(seconds=timeout))
 
     # Get log entries within the time window
@@ -320,9 +353,7 @@ class BasicMeasurement:
   def maf_within_rtt(self) -> int:
     assert self.cs_maf(), "Conditions for 'maf' not satisfied"
     
-    query_sent = self.d['responses'][0]['timestamp_sent']
-    ans_received = self.d['responses'][0]['timestamp']
-    window = (query_sent, ans_received)
+    window = rtt_window(self.d['responses'][0])
 
     # Get log entries within the time window
     entries = self.get_logentries()
@@ -336,8 +367,7 @@ class BasicMeasurement:
     assert self.cs_maf(), "Conditions for 'maf' not satisfied"
     if self.d['responses'][0]['status'] == "TIMEOUT":
       return None
-    query_sent = self.d['responses'][0]['timestamp_sent']
-    response_received = self.d['responses'][0]['timestamp']
+    query_sent, response_received = rtt_window(self.d['responses'][0])
     return (response_received - query_sent).total_seconds()
   
   """ Returns time delta between first and last log entry in seconds. Returns None if only one log entry was observed."""
@@ -732,7 +762,7 @@ class BasicMeasurement:
       deltas = [b - a for a, b in zip(timestamps[0:-1], timestamps[1:])]
       slice_ind = 0
       for i, d in enumerate(deltas):
-        if d > datetime.timedelta(seconds=gapsize):
+        if d > datetime.timedelta(seconds=float(gapsize)):
           slice_ind = i + 1
           break
       return slice_ind
@@ -1085,7 +1115,7 @@ class BasicMeasurement:
 
     print(f"Total entries: {self.num_logentries()} Status: {self.d['responses'][0]['status']}")
     if 'data' in self.d['responses'][0].keys():
-      print(f"Answer: {self.d['responses'][0]['data'][0]['answer']} from resolver {self.d['responses'][0]['resolver']}")
+      print(f"Answer: {answer_text(self.d['responses'][0]['data'][0])} from resolver {self.d['responses'][0]['resolver']}")
     print(f"Considered entries: {len(entries)}")
 
     # Grouped by unique, with count
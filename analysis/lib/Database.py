@@ -2,6 +2,7 @@
 import os
 import json
 import csv
+import common.jsonline as io
 import lib.BasicMeasurement as basic
 from lib.ZoneConf import ZoneConf
 from lib.ResolverMeasurement import ResolverMeasurement
@@ -99,7 +100,7 @@ class Database:
     """
   def process_file(self, file, process_func, filter_func, zoneconf=None, group_by_rr=False):
     try:
-      with open(file, 'r') as f:
+      with io.open_text(file) as f: # Plain or compressed
         # Load
         data = []
         for i, l in enumerate(f):
@@ -4,7 +4,7 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as pltdates
 import numpy as np
 from collections import Counter
-from lib.BasicMeasurement import BasicMeasurement
+from lib.BasicMeasurement import BasicMeasurement, rtt_window
 from lib.ResolverMeasurement import ResolverMeasurement as NameserverMeasurement
 import datetime
 
@@ -54,8 +54,9 @@ def subplot_response_latency(data:BasicMeasurement, ax):
   y = []
 
   for r in resp:
+    sent, received = rtt_window(r)
     x.append(r['timestamp'])
-    y.append((r['timestamp'] - r['timestamp_sent']).total_seconds())
+    y.append((received - sent).total_seconds())
 
   ax.scatter(x, y)
 
@@ -97,7 +98,7 @@ def subplot_order_rd0based(data:BasicMeasurement, ax):
   num_cache_filling = queryplan[0]['repeat'] # num queries in cache filling stage of ns0
   num_probing = queryplan[3]['repeat'] # num queries in probing stage of ns0
   assert len(ns0_ts) == num_cache_filling + num_probing, "Number of responses does not match number of queries"
-  wait_after_first = datetime.timedelta(seconds=queryplan[0]['wait_after']) # padding time after cache filling of ns0
+  wait_after_first = datetime.timedelta(seconds=float(queryplan[0]['wait_after'])) # padding time after cache filling of ns0
   # Cache filling stage of ns0 is from first query sent to last query sent (should be received!) plus padding time
   ax.axvspan(ns0_ts[0], ns0_ts[num_cache_filling-1]+wait_after_first, alpha=0.5, color=ns0_color, label=f"Cache filling {ns0}")
 
@@ -110,11 +111,11 @@ def subplot_order_rd0based(data:BasicMeasurement, ax):
   num_probing = queryplan[1]['repeat']
   num_cache_filling = queryplan[2]['repeat']
   assert len(ns1_ts) == num_cache_filling + num_probing, "Number of responses does not match number of queries"
-  wait_after_second = datetime.timedelta(seconds=queryplan[2]['wait_after'])
+  wait_after_second = datetime.timedelta(seconds=float(queryplan[2]['wait_after']))
   ax.axvspan(ns1_ts[num_probing], ns1_ts[-1]+wait_after_second, alpha=0.5, color=ns1_color, label=f"Cache filling {ns1}")
 
   # Plot Buffer time
-  buffer_time = datetime.timedelta(seconds=queryplan[1]['wait_after'])
+  buffer_time = datetime.timedelta(seconds=float(queryplan[1]['wait_after']))
   # Buffertime is 'buffer_time' seconds before first probing query of ns1
   ax.axvspan(ns1_ts[num_probing]-buffer_time, ns1_ts[num_probing], alpha=0.5, color='green', label="Buffer time")
 
@@ -173,7 +174,7 @@ def subplot_order_cachebased(data:BasicMeasurement, ax):
   num_cache_filling = queryplan[0]['repeat'] # num queries in cache filling stage of ns0
   num_probing = queryplan[3]['repeat'] # num queries in probing stage of ns0
   assert len(ns0_ts) == num_cache_filling + num_probing, "Number of responses does not match number of queries"
-  wait_after_first = datetime.timedelta(seconds=queryplan[0]['wait_after']) # padding time after cache filling of ns0
+  wait_after_first = datetime.timedelta(seconds=float(queryplan[0]['wait_after'])) # padding time after cache filling of ns0
   # Cache filling stage of ns0 is from first query sent to last query sent (should be received!) plus padding time
   ax.axvspan(ns0_ts[0], ns0_ts[num_cache_filling-1]+wait_after_first, alpha=0.5, color=ns0_color, label=f"Cache filling {ns0}")
 
@@ -186,11 +187,11 @@ def subplot_order_cachebased(data:BasicMeasurement, ax):
   num_probing = queryplan[1]['repeat']
   num_cache_filling = queryplan[2]['repeat']
   assert len(ns1_ts) == num_cache_filling + num_probing, "Number of responses does not match number of queries"
-  wait_after_second = datetime.timedelta(seconds=queryplan[2]['wait_after'])
+  wait_after_second = datetime.timedelta(seconds=float(queryplan[2]['wait_after']))
   ax.axvspan(ns1_ts[num_probing], ns1_ts[-1]+wait_after_second, alpha=0.5, color=ns1_color, label=f"Cache filling {ns1}")
 
   # Plot Buffer time
-  buffer_time = datetime.timedelta(seconds=queryplan[1]['wait_after'])
+  buffer_time = datetime.timedelta(seconds=float(queryplan[1]['wait_after']))
   # Buffertime is 'buffer_time' seconds before first probing query of ns1
   ax.axvspan(ns1_ts[num_probing]-buffer_time, ns1_ts[num_probing], alpha=0.5, color='green', label="Buffer time")
 
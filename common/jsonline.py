@@ -3,11 +3,54 @@
 
 import json
 import csv
+import gzip
+import io
+
+try:
+  import zstandard
+except ImportError: # Only required to read zstd compressed files
+  zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+""" Returns the compression of a file detected from its first bytes: None, "gzip" or "zstd" """
+def detect_compression(filename: str):
+  with open(filename, 'rb') as f:
+    magic = f.read(4)
+  if magic.startswith(GZIP_MAGIC):
+    return "gzip"
+  if magic == ZSTD_MAGIC:
+    return "zstd"
+  return None
+
+""" Open a plain, gzip or zstd compressed file for reading text"""
+def open_text(filename: str):
+  compression = detect_compression(filename)
+  if compression == "gzip":
+    return gzip.open(filename, 'rt')
+  if compression == "zstd":
+    assert zstandard is not None, f"Reading {filename} requires the zstandard package"
+    reader = zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), read_across_frames=True, closefd=True)
+    return io.TextIOWrapper(reader)
+  return open(filename, 'r')
+
+""" Iterate over the lines of a plain or compressed file. Compressed files written by the engine may end with an
+incomplete member (e.g. while the engine is running), lines are read up to the last complete one."""
+def read_lines(filename: str):
+  compressed = detect_compression(filename) is not None
+  truncated = (EOFError,) if zstandard is None else (EOFError, zstandard.ZstdError)
+  with open_text(filename) as f:
+    try:
+      for line in f:
+        if compressed and not line.endswith("\n"):
+          break
+        yield line
+    except truncated:
+      pass
 
 def read_jsonline(filename: str) -> list:
-  with open(filename, 'r') as f:
-    content = f.read().split('\n')
-    return [json.loads(l) for l in content if l != None and l != ""]
+  return [json.loads(l) for l in read_lines(filename) if l != None and l.strip() != ""]
 
 def write_jsonline(dictlist: list, filename: str) -> None:
   with open(filename, 'w') as f:
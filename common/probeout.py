@@ -0,0 +1,69 @@
+#! /usr/bin/env python3
+
+import json
+import common.jsonline as io
+
+# Output files of the engine may contain header records {"header": {...}} between the query task results.
+# Each header applies to all following results, until its fields are overwritten by a later header
+# (e.g. the output of a resumed engine run gets a new timestamp anchor). Configurations are collected by their ID.
+
+""" Returns True if the decoded line is a header record"""
+def is_header(d:dict) -> bool:
+  return len(d) == 1 and "header" in d
+
+""" Apply the differences of a normalized result, pairs of [path, value], to a copy of its reference configuration"""
+def patch(config:dict, delta:list) -> dict:
+  for path, value in delta:
+    if len(path) == 0:
+      return value
+    t = config
+    for k in path[:-1]:
+      t = t[k]
+    t[path[-1]] = value
+  return config
+
+class HeaderState:
+
+  """ Accumulated header records of an output file"""
+  def __init__(self):
+    self.fields = {}    # Latest value of each header field
+    self.configs = {}   # Dict of config ID -> reference configuration in JSON
+
+  """ Update the state with a header record"""
+  def update(self, header:dict):
+    for k, v in header.items():
+      if k == "config":
+        self.configs[v['id']] = json.dumps({"queries": v['queries'], "nameservers": v['nameservers']})
+      else:
+        self.fields[k] = v
+
+  """ Make a query task result self-contained by adding what it needs from the headers.
+  Monotonic timestamps (integer nanoseconds) need the wall clock anchor, normalized results their configuration."""
+  def rehydrate(self, d:dict) -> dict:
+    if self.fields.get("timestamps") == "monotonic_ns":
+      d["timestamp_anchor_ns"] = self.fields["anchor_ns"]
+    if "config" in d:
+      assert d["config"] in self.configs, f"Result references unknown configuration {d['config']}"
+      config = patch(json.loads(self.configs[d.pop("config")]), d.pop("delta"))
+      d["queries"] = config["queries"]
+      d["nameservers"] = config["nameservers"]
+    return d
+
+""" Read an engine output file and yield (line, result) for each query task result.
+Header records are consumed, results are rehydrated with the headers. If a result did not change, line is the raw line,
+otherwise None. Lines that are no valid JSON are yielded as (line, None)."""
+def read_probe_output(filename:str):
+  state = None
+  for line in io.read_lines(filename):
+    if line.strip() == "":
+      continue
+    try:
+      d = json.loads(line)
+    except json.JSONDecodeError:
+      yield line, None
+      continue
+    if is_header(d):
+      state = HeaderState() if state is None else state
+      state.update(d["header"])
+      continue
+    yield (line if state is None else None), (d if state is None else state.rehydrate(d))
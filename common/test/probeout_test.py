@@ -0,0 +1,48 @@
+#! /usr/bin/env python3
+
+import unittest
+
+import os, sys, tempfile
+current_directory = os.path.dirname(os.path.realpath(__file__))
+parent_directory = os.path.dirname(current_directory)
+sys.path.append(os.path.dirname(parent_directory))
+
+from common.probeout import *
+
+class TestProbeOutput(unittest.TestCase):
+
+  def test_read_probe_output(self):
+    with tempfile.TemporaryDirectory() as d:
+      with open(f"{d}/out", "w") as f:
+        f.write('{"id": 1}\n')
+        f.write('{"header": {"timestamps": "monotonic_ns", "anchor_ns": 100}}\n')
+        f.write('{"id": 2}\n')
+        f.write('{"id": \n')
+        f.write('{"header": {"timestamps": "monotonic_ns", "anchor_ns": 200}}\n')
+        f.write('{"id": 3}\n')
+
+      res = list(read_probe_output(f"{d}/out"))
+      self.assertEqual(res[0], ('{"id": 1}\n', {"id": 1}))
+      self.assertEqual(res[1], (None, {"id": 2, "timestamp_anchor_ns": 100}))
+      self.assertEqual(res[2], ('{"id": \n', None))
+      self.assertEqual(res[3], (None, {"id": 3, "timestamp_anchor_ns": 200}))
+      self.assertEqual(len(res), 4)
+
+  def test_config(self):
+    with tempfile.TemporaryDirectory() as d:
+      with open(f"{d}/out", "w") as f:
+        f.write('{"header": {"config": {"id": "c1", "pattern": "p", "queries": [{"rr": "1.1.1.1", "repeat": 2}], "nameservers": {"ns": [{"zone": "a"}]}}}}\n')
+        f.write('{"pattern": "p", "config": "c1", "delta": [], "responses": []}\n')
+        f.write('{"pattern": "p", "config": "c1", "delta": [[["queries", 0, "rr"], "2.2.2.2"]], "responses": []}\n')
+
+      res = [r for _, r in read_probe_output(f"{d}/out")]
+      self.assertEqual(res[0], {"pattern": "p", "responses": [], "queries": [{"rr": "1.1.1.1", "repeat": 2}], "nameservers": {"ns": [{"zone": "a"}]}})
+      self.assertEqual(res[1]['queries'], [{"rr": "2.2.2.2", "repeat": 2}])
+      self.assertEqual(res[1]['nameservers'], {"ns": [{"zone": "a"}]})
+
+  def test_patch(self):
+    self.assertEqual(patch({"a": [1, {"b": 2}]}, [[["a", 1, "b"], 3]]), {"a": [1, {"b": 3}]})
+    self.assertEqual(patch({"a": 1}, [[[], {"c": 1}]]), {"c": 1})
+
+if __name__ == '__main__':
+    unittest.main()
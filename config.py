@@ -60,6 +60,15 @@ CLIENT_HOSTS = [
   {"IP": "159.203.105.218", "user": "root", "identity": "~/.ssh/id_probe01"}
 ]
 
+"""
+CLIENT_CAPACITY
+
+Relative capacity of measurement hosts by IP, used by materialize.py --split --balance to assign each host query tasks
+in proportion to its capacity (e.g. 2 for a host that completes twice the tasks in the same time). Hosts that are not
+listed have capacity 1.
+"""
+CLIENT_CAPACITY = {}
+
 # 'measurement/'
 
 """
@@ -115,6 +124,7 @@ PATTERN_QUERY_DEFAULT = {
   "wait_after": 0,
   "random_subdomains": False,
   "concurrent": False,
+  "parallelism": 0,
   "recursion_desired": True,
   "expected_status": "NOERROR"
 }
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import gzip
+
+try:
+    import zstandard
+except ImportError: # Only required for zstd compressed output
+    zstandard = None
+
+class CompressedWriter:
+
+    """ Text file writer that compresses its output with gzip or zstd. Written data is buffered and compressed on flush()
+    into an independent gzip member / zstd frame. Concatenated members are valid files, hence the file can be read up to
+    the last flush, appended to and truncated at the sizes it had after a flush (see Journal)."""
+    def __init__(self, filename:str, mode:str, compression:str, flush_bytes:int=1<<20):
+        assert mode in ["w", "a"], f"Unsupported mode {mode}"
+        assert compression in ["gzip", "zstd"], f"Unknown compression {compression}"
+        if compression == "zstd":
+            assert zstandard is not None, "zstd compression requires the zstandard package"
+            self.compressor = zstandard.ZstdCompressor()
+
+        self.compression = compression
+        self.flush_bytes = flush_bytes  # Buffered bytes after which a member is written without an explicit flush
+
+        self.writer = open(filename, mode + "b")
+        self.buffer = []
+        self.buffered = 0
+
+    """ Buffer a string"""
+    def write(self, s:str):
+        self.buffer.append(s)
+        self.buffered += len(s)
+        if self.buffered >= self.flush_bytes:
+            self._write_member()
+
+    """ Internal function to compress the buffer into a member and write it to the file"""
+    def _write_member(self):
+        if self.buffered == 0:
+            return
+        data = "".join(self.buffer).encode()
+        if self.compression == "gzip":
+            self.writer.write(gzip.compress(data, compresslevel=6, mtime=0))
+        else:
+            self.writer.write(self.compressor.compress(data))
+        self.buffer = []
+        self.buffered = 0
+
+    """ Compress all buffered data and flush it to the file"""
+    def flush(self):
+        self._write_member()
+        self.writer.flush()
+
+    """ File descriptor of the compressed file"""
+    def fileno(self) -> int:
+        return self.writer.fileno()
+
+    """ Flush and close the file"""
+    def close(self):
+        self.flush()
+        self.writer.close()
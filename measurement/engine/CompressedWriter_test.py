@@ -0,0 +1,38 @@
+#! /usr/bin/env python3
+
+import gzip
+import os
+import tempfile
+import unittest
+
+from CompressedWriter import CompressedWriter
+class TestCompressedWriter(unittest.TestCase):
+
+  def test_members(self):
+    with tempfile.TemporaryDirectory() as d:
+      w = CompressedWriter(f"{d}/out", "w", "gzip")
+      w.write("a\n")
+      w.flush()
+      size = os.path.getsize(f"{d}/out")
+      w.write("b\n")
+      w.close()
+      with open(f"{d}/out", "rb") as f:
+        self.assertEqual(gzip.decompress(f.read()), b"a\nb\n")
+
+      # Truncating at a flush boundary and appending yields a valid file
+      os.truncate(f"{d}/out", size)
+      w = CompressedWriter(f"{d}/out", "a", "gzip")
+      w.write("c\n")
+      w.close()
+      with open(f"{d}/out", "rb") as f:
+        self.assertEqual(gzip.decompress(f.read()), b"a\nc\n")
+
+  def test_flush_bytes(self):
+    with tempfile.TemporaryDirectory() as d:
+      w = CompressedWriter(f"{d}/out", "w", "gzip", flush_bytes=4)
+      w.write("abc\n")
+      self.assertEqual(w.buffered, 0) # Member written without explicit flush
+      w.close()
+
+if __name__ == '__main__':
+    unittest.main()
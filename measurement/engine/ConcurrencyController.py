@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import asyncio
+import collections
+
+class ConcurrencyController:
+
+    MIN_RESULTS = 10    # Results of an interval required to adapt the window
+
+    """ Closed-loop control of the number of queries in flight across the whole engine (AIMD).
+    Queries acquire a slot of the window before they are sent and release it with their result. Once per interval,
+    update() compares the timeout rate and the mean RTT of the interval to their baselines. If the timeout rate exceeds
+    its baseline by more than timeout_margin or the RTT is inflated by more than rtt_inflation, the window is cut by the
+    factor decrease, otherwise it grows: doubling until the first cut (slow start), by increase afterwards.
+    The window only grows if it was used up in the interval, it always stays within min_window and max_window.
+    As in TCP, results of queries sent before the last cut are ignored, they reflect the window before the cut."""
+    def __init__(self, min_window:int, max_window:int, increase:int=10, decrease:float=0.5, timeout_margin:float=0.1,
+            rtt_inflation:float=2.0):
+        assert 0 < min_window <= max_window, "Window bounds must satisfy 0 < min_window <= max_window"
+
+        self.min_window = min_window
+        self.max_window = max_window
+        self.increase = increase
+        self.decrease = decrease
+        self.timeout_margin = timeout_margin
+        self.rtt_inflation = rtt_inflation
+
+        self.window = min_window
+        self.slow_start = True
+        self.epoch = 0                      # Number of cuts so far
+        self.in_flight = 0
+        self.waiters = collections.deque()  # Futures of queries waiting for a slot
+
+        # Statistics of the current interval
+        self.saturated = False      # Whether the window was used up
+        self.num_results = 0
+        self.num_timeouts = 0
+        self.rtt_sum = 0.0
+
+        # Baselines of uncongested intervals
+        self.base_timeout_rate = None   # Moving average of the timeout rate
+        self.base_rtt = None            # Minimum of the mean RTT
+
+        self.last = {}              # Statistics of the last interval, see status()
+
+    """ Wait for a free slot in the window. Returns the epoch to pass to release()"""
+    async def acquire(self) -> int:
+        while self.in_flight >= self.window:
+            fut = asyncio.get_running_loop().create_future()
+            self.waiters.append(fut)
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled(): # Pass on a wake up that arrived meanwhile
+                    self._wake()
+                raise
+        self.in_flight += 1
+        if self.in_flight >= self.window:
+            self.saturated = True
+        return self.epoch
+
+    """ Release the slot of a query with its result (None if it was cancelled), its RTT in seconds and its epoch"""
+    def release(self, result:dict, rtt:float, epoch:int):
+        self.in_flight -= 1
+        if result is not None and epoch == self.epoch:
+            self.num_results += 1
+            if result['status'] == "TIMEOUT":
+                self.num_timeouts += 1
+            else:
+                self.rtt_sum += rtt
+        self._wake()
+
+    """ Internal function to wake up as many waiting queries as there are free slots"""
+    def _wake(self):
+        free = self.window - self.in_flight
+        while free > 0 and len(self.waiters) > 0:
+            fut = self.waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                free -= 1
+
+    """ Evaluate the statistics of the past interval and adapt the window. Returns True if the window changed"""
+    def update(self) -> bool:
+        window = self.window
+        answered = self.num_results - self.num_timeouts
+        timeout_rate = self.num_timeouts / self.num_results if self.num_results > 0 else None
+        rtt = self.rtt_sum / answered if answered > 0 else None
+
+        congested = False
+        if self.num_results < self.MIN_RESULTS: # Too few results to judge, keep the window
+            timeout_rate, rtt = None, None
+        if timeout_rate is not None and self.base_timeout_rate is not None:
+            congested |= timeout_rate > self.base_timeout_rate + self.timeout_margin
+        if rtt is not None and self.base_rtt is not None:
+            congested |= rtt > self.base_rtt * self.rtt_inflation
+
+        if congested:
+            self.window = max(self.min_window, int(self.window * self.decrease))
+            self.slow_start = False
+            self.epoch += 1
+        else:
+            # Baselines are only learnt from uncongested intervals
+            if timeout_rate is not None:
+                self.base_timeout_rate = timeout_rate if self.base_timeout_rate is None else \
+                    0.9 * self.base_timeout_rate + 0.1 * timeout_rate
+            if rtt is not None:
+                self.base_rtt = rtt if self.base_rtt is None else min(self.base_rtt, rtt)
+            if self.saturated and timeout_rate is not None:
+                grown = self.window * 2 if self.slow_start else self.window + self.increase
+                self.window = min(self.max_window, grown)
+
+        self.last = {"timeout_rate": timeout_rate, "rtt": rtt, "congested": congested}
+        self.saturated = self.in_flight >= self.window
+        self.num_results, self.num_timeouts, self.rtt_sum = 0, 0, 0.0
+        self._wake()
+        return self.window != window
+
+    """ Returns the window and the statistics of the last interval it is based on"""
+    def status(self) -> dict:
+        return {"window": self.window, "in_flight": self.in_flight, **self.last}
@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+
+import asyncio
+import unittest
+
+from ConcurrencyController import ConcurrencyController
+class TestConcurrencyController(unittest.TestCase):
+
+  def interval(self, control:ConcurrencyController, results:int, timeouts:int=0, rtt:float=0.01) -> bool:
+    # Saturate the window and complete results queries of the current epoch
+    control.saturated = True
+    for i in range(results):
+      control.in_flight += 1
+      status = "TIMEOUT" if i < timeouts else "NOERROR"
+      control.release({"status": status}, rtt, control.epoch)
+    return control.update()
+
+  def test_slow_start(self):
+    control = ConcurrencyController(10, 100, increase=10)
+    windows = []
+    for _ in range(5):
+      self.interval(control, 20)
+      windows.append(control.window)
+    self.assertEqual(windows, [20, 40, 80, 100, 100])
+
+  def test_no_growth_unsaturated(self):
+    control = ConcurrencyController(10, 100)
+    for _ in range(20):
+      control.in_flight += 1
+      control.release({"status": "NOERROR"}, 0.01, control.epoch)
+    self.assertFalse(control.update())
+    self.assertEqual(control.window, 10)
+
+  def test_too_few_results(self):
+    control = ConcurrencyController(10, 100)
+    self.assertFalse(self.interval(control, ConcurrencyController.MIN_RESULTS - 1))
+    self.assertEqual(control.window, 10)
+
+  def test_cut_on_timeouts(self):
+    control = ConcurrencyController(10, 1000, increase=10, decrease=0.5)
+    for _ in range(3):
+      self.interval(control, 20, timeouts=2)
+    self.assertEqual(control.window, 80)
+    self.assertTrue(self.interval(control, 20, timeouts=10))
+    self.assertEqual(control.window, 40)
+    self.assertTrue(control.status()['congested'])
+    # Additive increase after the first cut
+    self.interval(control, 20, timeouts=2)
+    self.assertEqual(control.window, 50)
+
+  def test_cut_on_rtt(self):
+    control = ConcurrencyController(10, 1000, rtt_inflation=2.0)
+    self.interval(control, 20, rtt=0.01)
+    self.interval(control, 20, rtt=0.015)
+    self.assertEqual(control.window, 40)
+    self.interval(control, 20, rtt=0.05)
+    self.assertEqual(control.window, 20)
+
+  def test_min_window(self):
+    control = ConcurrencyController(10, 1000)
+    self.interval(control, 20)
+    for _ in range(5):
+      self.interval(control, 20, timeouts=20)
+    self.assertEqual(control.window, 10)
+
+  def test_stale_results_ignored(self):
+    control = ConcurrencyController(10, 1000)
+    self.interval(control, 20)
+    self.interval(control, 20, timeouts=20)
+    # Timeouts of queries sent before the cut do not count
+    for _ in range(20):
+      control.in_flight += 1
+      control.release({"status": "TIMEOUT"}, 1.0, control.epoch - 1)
+    self.assertEqual(control.num_results, 0)
+
+  def test_acquire(self):
+    async def run():
+      control = ConcurrencyController(2, 2)
+      await control.acquire()
+      epoch = await control.acquire()
+      blocked = asyncio.ensure_future(control.acquire())
+      await asyncio.sleep(0)
+      self.assertFalse(blocked.done())
+      control.release({"status": "NOERROR"}, 0.01, epoch)
+      await asyncio.wait_for(blocked, 1)
+      self.assertEqual(control.in_flight, 2)
+      # Cancelled waiters give up their place
+      cancelled = asyncio.ensure_future(control.acquire())
+      waiting = asyncio.ensure_future(control.acquire())
+      await asyncio.sleep(0)
+      cancelled.cancel()
+      control.release(None, 0.0, epoch)
+      await asyncio.wait_for(waiting, 1)
+      self.assertEqual(control.in_flight, 2)
+    asyncio.run(run())
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import asyncio
+import random
+import socket
+import struct
+
+# Address returned in the answers of A queries
+ANSWER_ADDRESS = bytes([192, 0, 2, 1])
+ANSWER_TTL = 300
+
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+
+class FakeResolver(asyncio.DatagramProtocol):
+
+    """ UDP responder that emulates a recursive resolver for benchmarks of the engine (see run_bench in engine.py).
+    Every query is answered instantly or after a random latency, dropped, or answered with NXDOMAIN or SERVFAIL with the
+    given probabilities. A queries get an answer, other types NOERROR without answer. Responses are built on the wire
+    from the query, such that the responder stays far cheaper than the engine it measures.
+    latency is "none", "fixed" (always latency_mean), "uniform" (0 to 2 * latency_mean) or "exponential"."""
+    def __init__(self, latency:str="none", latency_mean:float=0.0, nxdomain:float=0.0, servfail:float=0.0, drop:float=0.0,
+            seed:int=None):
+        assert latency in ["none", "fixed", "uniform", "exponential"], f"Unknown latency distribution {latency}"
+        assert nxdomain + servfail + drop <= 1.0, "Probabilities of NXDOMAIN, SERVFAIL and drop exceed 1"
+
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.nxdomain = nxdomain
+        self.servfail = servfail
+        self.drop = drop
+        self.random = random.Random(seed)
+
+        self.transport = None
+        self.stats = {"received": 0, "answered": 0, "dropped": 0, "malformed": 0}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.stats['received'] += 1
+        delay, response = self.respond(data)
+        if response is None:
+            return
+        self.stats['answered'] += 1
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self.transport.sendto, response, addr)
+        else:
+            self.transport.sendto(response, addr)
+
+    """ Draw the latency of a response in seconds"""
+    def draw_latency(self) -> float:
+        if self.latency == "fixed":
+            return self.latency_mean
+        if self.latency == "uniform":
+            return self.random.uniform(0, 2 * self.latency_mean)
+        if self.latency == "exponential":
+            return self.random.expovariate(1 / self.latency_mean) if self.latency_mean > 0 else 0.0
+        return 0.0
+
+    """ Decide on the response to a query in wire format. Returns (delay in seconds, response), response is None
+    if the query is dropped or malformed"""
+    def respond(self, query:bytes) -> tuple:
+        # Header and question of a standard query, the question ends after the name, type and class
+        end = 12
+        try:
+            txid, flags, qdcount = struct.unpack_from("!HHH", query)
+            while query[end] != 0:
+                end += query[end] + 1
+            end += 5
+            qtype, = struct.unpack_from("!H", query, end - 4)
+        except (struct.error, IndexError):
+            self.stats['malformed'] += 1
+            return 0.0, None
+        if flags & 0x8000 or qdcount != 1: # Responses and multiple questions are not answered
+            self.stats['malformed'] += 1
+            return 0.0, None
+
+        r = self.random.random()
+        if r < self.drop:
+            self.stats['dropped'] += 1
+            return 0.0, None
+        elif r < self.drop + self.nxdomain:
+            rcode = RCODE_NXDOMAIN
+        elif r < self.drop + self.nxdomain + self.servfail:
+            rcode = RCODE_SERVFAIL
+        else:
+            rcode = RCODE_NOERROR
+
+        answer = b""
+        if rcode == RCODE_NOERROR and qtype == 1: # Answer A queries, pointer to the name in the question
+            answer = b"\xc0\x0c" + struct.pack("!HHIH", 1, 1, ANSWER_TTL, len(ANSWER_ADDRESS)) + ANSWER_ADDRESS
+
+        # QR and RA set, RD copied from the query
+        header = struct.pack("!HHHHHH", txid, 0x8080 | (flags & 0x0100) | rcode, 1, 1 if answer else 0, 0, 0)
+        return self.draw_latency(), header + query[12:end] + answer
+
+""" Start a fake resolver on the running event loop, returns the transport and the protocol.
+The receive buffer is enlarged so that bursts of queries are not dropped by the kernel"""
+async def serve(addr:str, port:int, rcvbuf:int=4194304, **behaviour) -> tuple:
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(lambda: FakeResolver(**behaviour), local_addr=(addr, port))
+    transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    return transport, protocol
+
+""" Run a fake resolver until the process is terminated, ready (e.g. a multiprocessing.Event) is set once it listens"""
+def run_fake_resolver(addr:str, port:int, behaviour:dict, ready=None):
+    async def main():
+        await serve(addr, port, **behaviour)
+        if ready is not None:
+            ready.set()
+        await asyncio.Event().wait()
+    asyncio.run(main())
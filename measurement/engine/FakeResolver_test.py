@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+
+import unittest
+import dns.message
+import dns.rcode
+import dns.rdatatype
+
+from FakeResolver import FakeResolver
+class TestFakeResolver(unittest.TestCase):
+
+  def query(self, name="abcd.bench.test", rdtype="A") -> bytes:
+    return dns.message.make_query(name, rdtype).to_wire()
+
+  def test_answer(self):
+    fake = FakeResolver()
+    q = dns.message.make_query("abcd.bench.test", "A")
+    delay, wire = fake.respond(q.to_wire())
+    self.assertEqual(delay, 0.0)
+    r = dns.message.from_wire(wire)
+    self.assertTrue(q.is_response(r))
+    self.assertEqual(r.rcode(), dns.rcode.NOERROR)
+    self.assertEqual(r.answer[0].to_text(), "abcd.bench.test. 300 IN A 192.0.2.1")
+
+    # Other types are answered without records
+    r = dns.message.from_wire(fake.respond(self.query(rdtype="TXT"))[1])
+    self.assertEqual(r.rcode(), dns.rcode.NOERROR)
+    self.assertEqual(len(r.answer), 0)
+
+  def test_behaviour(self):
+    r = dns.message.from_wire(FakeResolver(nxdomain=1.0).respond(self.query())[1])
+    self.assertEqual(r.rcode(), dns.rcode.NXDOMAIN)
+    r = dns.message.from_wire(FakeResolver(servfail=1.0).respond(self.query())[1])
+    self.assertEqual(r.rcode(), dns.rcode.SERVFAIL)
+    fake = FakeResolver(drop=1.0)
+    self.assertIsNone(fake.respond(self.query())[1])
+    self.assertEqual(fake.stats['dropped'], 1)
+
+    # Latencies follow the distribution
+    self.assertEqual(FakeResolver(latency="fixed", latency_mean=0.1).respond(self.query())[0], 0.1)
+    fake = FakeResolver(latency="uniform", latency_mean=0.1, seed=1)
+    delays = [fake.respond(self.query())[0] for _ in range(100)]
+    self.assertTrue(all([0 <= d <= 0.2 for d in delays]))
+
+  def test_malformed(self):
+    fake = FakeResolver()
+    self.assertIsNone(fake.respond(b"\x00\x01")[1])
+    self.assertIsNone(fake.respond(self.query()[:14])[1])
+    self.assertEqual(fake.stats['malformed'], 2)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+
+""" Internal function to copy count bytes at offset of in_fd to the position of out_fd within the kernel. With
+copy_file_range, file systems that support it (e.g. XFS, Btrfs) share the data blocks instead of copying them"""
+def _copy_file_range(in_fd:int, out_fd:int, offset:int, count:int) -> int:
+    return os.copy_file_range(in_fd, out_fd, count, offset)
+
+""" Internal function to copy count bytes at offset of in_fd to the position of out_fd with sendfile"""
+def _sendfile(in_fd:int, out_fd:int, offset:int, count:int) -> int:
+    return os.sendfile(out_fd, in_fd, offset, count)
+
+""" Append the file src to the binary file object f_out without copying the data through user space, if the platform
+allows it (copy_file_range, then sendfile, otherwise a regular copy). f_out must not be opened in append mode ("ab")
+to copy within the kernel, open it with "r+b" and seek to its end instead. Returns the number of bytes appended"""
+def append_file(f_out, src:str) -> int:
+    f_out.flush()
+    out_fd = f_out.fileno()
+    with open(src, "rb") as f_in:
+        in_fd = f_in.fileno()
+        size = os.fstat(in_fd).st_size
+        offset = 0
+        for copy in [_copy_file_range, _sendfile]:
+            try:
+                while offset < size:
+                    n = copy(in_fd, out_fd, offset, size - offset)
+                    if n == 0: # src was truncated meanwhile
+                        return offset
+                    offset += n
+                return offset
+            except (AttributeError, OSError): # Not available on this platform or for these file systems
+                continue
+        f_in.seek(offset)
+        shutil.copyfileobj(f_in, f_out)
+        f_out.flush()
+        return size
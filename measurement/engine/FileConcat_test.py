@@ -0,0 +1,38 @@
+#! /usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import FileConcat
+from FileConcat import append_file
+class TestFileConcat(unittest.TestCase):
+
+  def concat(self, d:str) -> bytes:
+    parts = [b"a\n" * 1000, b"", os.urandom(100000)]
+    for i, data in enumerate(parts):
+      with open(f"{d}/part{i}", "wb") as f:
+        f.write(data)
+    with open(f"{d}/out", "wb") as f_out:
+      f_out.write(b"header\n")
+      for i, data in enumerate(parts):
+        self.assertEqual(append_file(f_out, f"{d}/part{i}"), len(data))
+      f_out.write(b"end\n")
+    with open(f"{d}/out", "rb") as f:
+      self.assertEqual(f.read(), b"header\n" + b"".join(parts) + b"end\n")
+
+  def test_append(self):
+    with tempfile.TemporaryDirectory() as d:
+      self.concat(d)
+
+  def test_fallback(self):
+    # Platforms without copy_file_range and sendfile fall back to a regular copy
+    def unsupported(*args):
+      raise OSError("not supported")
+    with mock.patch.object(FileConcat, "_copy_file_range", unsupported), mock.patch.object(FileConcat, "_sendfile", unsupported):
+      with tempfile.TemporaryDirectory() as d:
+        self.concat(d)
+
+if __name__ == '__main__':
+  unittest.main()
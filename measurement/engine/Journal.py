@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+class Journal:
+
+    """ Progress journal of the engine. For every query task whose result has been written, it records the task ID
+    (index of the task in the task file) and the size of the output file once that result has been flushed. Records are
+    only written after the output file has been flushed, hence a restarted engine can truncate the output to the last
+    journaled size and skip all journaled tasks. Sizes are taken from the file, so they also hold for compressed output."""
+    def __init__(self, filename:str, flush_interval:float, resume:bool=False):
+
+        self.filename = filename                # Journal file
+        self.flush_interval = flush_interval    # Minimum time in seconds between two flushes
+
+        self.completed = set()      # IDs of tasks completed in previous runs
+        self.out_size = 0           # Size of the output file covered by the journal
+        self.pending = []           # IDs of tasks written to the output but not yet to the journal
+        self.last_flush = time.time()
+
+        if resume and os.path.exists(filename):
+            self._load()
+            self.writer = open(filename, "a")
+        else:
+            self.writer = open(filename, "w")
+
+    """ Internal function to read an existing journal. Drops a partially written last record."""
+    def _load(self):
+        valid = 0 # Number of bytes of complete records
+        with open(self.filename, "r") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                task_id, out_size = line.split()
+                self.completed.add(int(task_id))
+                self.out_size = int(out_size)
+                valid += len(line)
+        os.truncate(self.filename, valid)
+
+    """ Returns True if the task was completed in a previous run"""
+    def is_completed(self, task_id:int) -> bool:
+        return task_id in self.completed
+
+    """ Prepare the output file for appending: remove results that were written after the last journal record"""
+    def truncate_output(self, out_file:str):
+        if os.path.exists(out_file):
+            os.truncate(out_file, self.out_size)
+        else:
+            assert self.out_size == 0, f"Journal {self.filename} refers to missing output file {out_file}"
+
+    """ Record that the result of a task has been written to the output"""
+    def record(self, task_id:int):
+        self.pending.append(task_id)
+
+    """ Flush output and journal if the flush interval has passed"""
+    def maybe_flush(self, out_writer):
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush(out_writer)
+
+    """ Flush the output to disk first, then the journal records referring to it"""
+    def flush(self, out_writer):
+        out_writer.flush()
+        os.fsync(out_writer.fileno())
+        self.out_size = os.fstat(out_writer.fileno()).st_size
+        self.writer.write("".join([f"{task_id} {self.out_size}\n" for task_id in self.pending]))
+        self.writer.flush()
+        os.fsync(self.writer.fileno())
+        self.pending = []
+        self.last_flush = time.time()
+
+    """ Close the journal file"""
+    def close(self):
+        self.writer.close()
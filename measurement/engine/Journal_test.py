@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from Journal import Journal
+class TestJournal(unittest.TestCase):
+
+  def test_resume(self):
+    with tempfile.TemporaryDirectory() as d:
+      out_file, jnl_file = f"{d}/out", f"{d}/jnl"
+
+      # First run: two results journaled, a third one written but not journaled
+      out = open(out_file, "w")
+      journal = Journal(jnl_file, 10)
+      out.write("h\n") # Header, not a task
+      for task_id, line in [(0, "a\n"), (3, "bb\n")]:
+        out.write(line)
+        journal.record(task_id)
+        journal.flush(out)
+      out.write("ccc\n")
+      out.close()
+      journal.close()
+
+      # Simulate a crash while writing a journal record
+      with open(jnl_file, "a") as f:
+        f.write("7 1")
+
+      journal = Journal(jnl_file, 10, resume=True)
+      self.assertTrue(journal.is_completed(0))
+      self.assertTrue(journal.is_completed(3))
+      self.assertFalse(journal.is_completed(7))
+      journal.truncate_output(out_file)
+      with open(out_file) as f:
+        self.assertEqual(f.read(), "h\na\nbb\n")
+      journal.close()
+      with open(jnl_file) as f:
+        self.assertEqual(f.read(), "0 4\n3 7\n")
+
+  def test_no_resume(self):
+    with tempfile.TemporaryDirectory() as d:
+      with open(f"{d}/jnl", "w") as f:
+        f.write("0 2\n")
+      journal = Journal(f"{d}/jnl", 10)
+      self.assertFalse(journal.is_completed(0))
+      journal.close()
+      self.assertEqual(os.path.getsize(f"{d}/jnl"), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+
+try:
+    import prometheus_client as prom
+except ImportError: # Only required if the metrics endpoint is enabled
+    prom = None
+
+# Buckets of the RTT histogram in seconds
+RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metrics:
+
+    """ Live metrics of the engine, served over HTTP in the Prometheus text format by a background thread.
+    Counters are updated by the engine, gauges of queue depths and queries in flight are read on every scrape."""
+    def __init__(self, port:int, addr:str="127.0.0.1"):
+        assert prom is not None, "The metrics endpoint requires the prometheus_client package"
+
+        self.port = port
+        self.addr = addr
+        self.registry = prom.CollectorRegistry()
+
+        self.queries_sent = prom.Counter("engine_queries_sent", "Queries sent", registry=self.registry)
+        self.responses = prom.Counter("engine_responses", "Query results by status", ["status"], registry=self.registry)
+        self.rtt = prom.Histogram("engine_rtt_seconds", "Time from sending a query to its result",
+            buckets=RTT_BUCKETS, registry=self.registry)
+        self.aborts = prom.Counter("engine_aborts", "Query entries aborted, by abort policy", ["policy"], registry=self.registry)
+        self.tasks_done = prom.Counter("engine_tasks_done", "Query tasks written to the output", registry=self.registry)
+        self.in_flight = prom.Gauge("engine_queries_in_flight", "Queries awaiting a result", registry=self.registry)
+        self.queue_depth = prom.Gauge("engine_queue_depth", "Items in the queues of the engine", ["queue"], registry=self.registry)
+        self.loop_lag = prom.Gauge("engine_event_loop_lag_seconds", "Delay of the event loop in scheduling a timer",
+            registry=self.registry)
+
+    """ Start serving the metrics"""
+    def start(self):
+        prom.start_http_server(self.port, self.addr, registry=self.registry)
+
+    """ Report the depth of a queue (any object with qsize() or len()) under the given name"""
+    def watch_queue(self, name:str, queue):
+        size = queue.qsize if hasattr(queue, "qsize") else queue.__len__
+        self.queue_depth.labels(queue=name).set_function(size)
+
+    """ Record a query that is about to be sent, returns the start time to pass to query_done"""
+    def query_sent(self) -> float:
+        self.queries_sent.inc()
+        self.in_flight.inc()
+        return time.monotonic()
+
+    """ Record the result of a query, None if the query was cancelled"""
+    def query_done(self, t_sent:float, result:dict):
+        self.in_flight.dec()
+        if result is None:
+            return
+        self.responses.labels(status=result['status']).inc()
+        self.rtt.observe(time.monotonic() - t_sent)
+
+    """ Record an aborted query entry"""
+    def abort(self, policy:str):
+        self.aborts.labels(policy=policy).inc()
+
+    """ Coroutine that measures how late the event loop runs a timer, i.e. how saturated the engine is"""
+    async def measure_loop_lag(self, interval:float=0.5):
+        loop = asyncio.get_running_loop()
+        while True:
+            t = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag.set(max(0.0, loop.time() - t - interval))
@@ -0,0 +1,26 @@
+#! /usr/bin/env python3
+
+import unittest
+
+from Metrics import Metrics, prom
+@unittest.skipIf(prom is None, "prometheus_client is not installed")
+class TestMetrics(unittest.TestCase):
+
+  def test_queries(self):
+    m = Metrics(0)
+    t = m.query_sent()
+    m.query_done(t, {"status": "TIMEOUT"})
+    m.query_done(m.query_sent(), None) # Cancelled query
+    self.assertEqual(m.registry.get_sample_value("engine_queries_sent_total"), 2)
+    self.assertEqual(m.registry.get_sample_value("engine_queries_in_flight"), 0)
+    self.assertEqual(m.registry.get_sample_value("engine_responses_total", {"status": "TIMEOUT"}), 1)
+    self.assertEqual(m.registry.get_sample_value("engine_rtt_seconds_count"), 1)
+
+  def test_queue(self):
+    m = Metrics(0)
+    q = [1, 2, 3]
+    m.watch_queue("list", q)
+    self.assertEqual(m.registry.get_sample_value("engine_queue_depth", {"queue": "list"}), 3)
+
+if __name__ == '__main__':
+    unittest.main()
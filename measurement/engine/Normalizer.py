@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+
+""" Compute the differences of value to base as a list of [path, value] pairs, where path is a list of keys / indices.
+Subtrees are only descended into if they differ and have the same shape (same keys or same length)."""
+def diff(base, value, path:list=None, delta:list=None) -> list:
+    path = [] if path is None else path
+    delta = [] if delta is None else delta
+    if base == value:
+        return delta
+    if isinstance(base, dict) and isinstance(value, dict) and base.keys() == value.keys():
+        for k in value:
+            diff(base[k], value[k], path + [k], delta)
+    elif isinstance(base, list) and isinstance(value, list) and len(base) == len(value):
+        for i in range(len(value)):
+            diff(base[i], value[i], path + [i], delta)
+    else:
+        delta.append([path, value])
+    return delta
+
+
+class Normalizer:
+
+    """ Writes the configuration of query tasks (queries and nameservers) only once per pattern. The first query task of
+    a pattern becomes the reference configuration, emitted in a header record and identified by its content hash.
+    Results only carry the ID of the reference and the differences to it, e.g. resolver, vantage point and encoded labels.
+    Rehydration on read is done by common/probeout.py."""
+    def __init__(self):
+        self.configs = {}   # Dict of pattern -> (config ID, reference configuration)
+
+    """ Return the list of header records to write before the result, and the normalized result"""
+    def normalize(self, result:dict) -> tuple:
+        headers = []
+        config = {"queries": result['queries'], "nameservers": result['nameservers']}
+
+        if result['pattern'] not in self.configs:
+            config_id = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[0:16]
+            self.configs[result['pattern']] = (config_id, config)
+            headers.append({"header": {"config": {"id": config_id, "pattern": result['pattern'], **config}}})
+        config_id, reference = self.configs[result['pattern']]
+
+        normalized = {k: v for k, v in result.items() if k not in config}
+        normalized['config'] = config_id
+        normalized['delta'] = diff(reference, config)
+        return headers, normalized
@@ -0,0 +1,28 @@
+#! /usr/bin/env python3
+
+import unittest
+
+from Normalizer import diff, Normalizer
+class TestNormalizer(unittest.TestCase):
+
+  def test_diff(self):
+    base = {"queries": [{"rr": "1.1.1.1", "wait": 1}], "nameservers": {"ns": [{"zone": "a"}]}}
+    self.assertEqual(diff(base, base), [])
+    value = {"queries": [{"rr": "2.2.2.2", "wait": 1}], "nameservers": {"ns": [{"zone": "a"}, {"zone": "b"}]}}
+    self.assertEqual(diff(base, value), [[["queries", 0, "rr"], "2.2.2.2"], [["nameservers", "ns"], [{"zone": "a"}, {"zone": "b"}]]])
+
+  def test_normalize(self):
+    n = Normalizer()
+    result = {"pattern": "p", "queries": [{"rr": "1.1.1.1"}], "nameservers": {}, "responses": [1]}
+    headers, r1 = n.normalize(result)
+    self.assertEqual(len(headers), 1)
+    self.assertEqual(headers[0]['header']['config']['id'], r1['config'])
+    self.assertEqual(r1, {"pattern": "p", "responses": [1], "config": r1['config'], "delta": []})
+
+    # Reference configuration is only written once per pattern
+    headers, r2 = n.normalize(dict(result, queries=[{"rr": "2.2.2.2"}]))
+    self.assertEqual(headers, [])
+    self.assertEqual(r2['delta'], [[["queries", 0, "rr"], "2.2.2.2"]])
+
+if __name__ == '__main__':
+    unittest.main()
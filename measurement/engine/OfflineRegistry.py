@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+import time
+
+class OfflineRegistry:
+
+    """ Resolvers declared offline by an abort policy, shared by all query tasks of the engine. Entries expire after ttl
+    seconds, such that a resolver that was only temporarily unreachable is measured again later."""
+    def __init__(self, ttl:float, clock=time.monotonic):
+
+        self.ttl = ttl          # Seconds a resolver stays offline
+        self.clock = clock
+        self.offline = {}       # Dict of resolver -> expiry time
+
+    """ Declare a resolver offline"""
+    def mark(self, resolver:str):
+        self.offline[resolver] = self.clock() + self.ttl
+
+    """ Returns True if the resolver has been declared offline within the last ttl seconds"""
+    def is_offline(self, resolver:str) -> bool:
+        expiry = self.offline.get(resolver)
+        if expiry is None:
+            return False
+        if expiry <= self.clock():
+            del self.offline[resolver]
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.offline)
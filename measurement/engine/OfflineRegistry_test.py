@@ -0,0 +1,31 @@
+#! /usr/bin/env python3
+
+import unittest
+
+from OfflineRegistry import OfflineRegistry
+class TestOfflineRegistry(unittest.TestCase):
+
+  def test_ttl(self):
+    now = [0.0]
+    registry = OfflineRegistry(60, clock=lambda: now[0])
+    self.assertFalse(registry.is_offline("1.2.3.4"))
+    registry.mark("1.2.3.4")
+    self.assertTrue(registry.is_offline("1.2.3.4"))
+    self.assertFalse(registry.is_offline("5.6.7.8"))
+    now[0] = 59.0
+    self.assertTrue(registry.is_offline("1.2.3.4"))
+    now[0] = 60.0
+    self.assertFalse(registry.is_offline("1.2.3.4"))
+    self.assertEqual(len(registry), 0)
+
+  def test_mark_again(self):
+    now = [0.0]
+    registry = OfflineRegistry(60, clock=lambda: now[0])
+    registry.mark("1.2.3.4")
+    now[0] = 50.0
+    registry.mark("1.2.3.4") # Declared offline again, e.g. by a query entry that started before the first mark
+    now[0] = 100.0
+    self.assertTrue(registry.is_offline("1.2.3.4"))
+
+if __name__ == '__main__':
+  unittest.main()
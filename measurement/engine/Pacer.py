@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import time
+
+class Pacer:
+
+    """ Compensates the drift of consecutive waits, e.g. of a query task. Sleeps end late by the timer resolution,
+    the lag of the event loop or the tick of the timer wheel. The lateness accumulates into a debt that is deducted
+    from the next waits, such that sub-second waits keep their pace over many repetitions."""
+    def __init__(self, clock=time.monotonic):
+
+        self.clock = clock      # Function returning the current time in seconds
+        self.wake_at = None     # Time the current wait ends at, None while not waiting
+        self.debt = 0.0         # Accumulated lateness in seconds not yet deducted from a wait
+
+    """ Returns the compensated duration of a wait of 'wait' seconds that starts now"""
+    def delay(self, wait:float) -> float:
+        d = max(0.0, wait - self.debt)
+        self.debt -= wait - d
+        self.wake_at = self.clock() + d
+        return d
+
+    """ Record the end of the current wait, i.e. its lateness. Does nothing if there is no current wait"""
+    def resumed(self):
+        if self.wake_at is not None:
+            self.debt += max(0.0, self.clock() - self.wake_at)
+            self.wake_at = None
@@ -0,0 +1,49 @@
+#! /usr/bin/env python3
+
+import unittest
+
+from Pacer import Pacer
+class TestPacer(unittest.TestCase):
+
+  def test_on_time(self):
+    now = [0.0]
+    pacer = Pacer(clock=lambda: now[0])
+    pacer.resumed() # No wait yet
+    for _ in range(10):
+      self.assertAlmostEqual(pacer.delay(0.05), 0.05)
+      now[0] += 0.05
+      pacer.resumed()
+    self.assertAlmostEqual(pacer.debt, 0.0)
+
+  def test_compensation(self):
+    now = [0.0]
+    pacer = Pacer(clock=lambda: now[0])
+    d = pacer.delay(0.1)
+    now[0] += d + 0.03 # Woke up late
+    pacer.resumed()
+    self.assertAlmostEqual(pacer.delay(0.1), 0.07)
+    now[0] += 0.07
+    pacer.resumed()
+    self.assertAlmostEqual(pacer.delay(0.1), 0.1)
+
+  def test_debt_exceeds_wait(self):
+    now = [0.0]
+    pacer = Pacer(clock=lambda: now[0])
+    pacer.delay(0.01)
+    now[0] += 0.05
+    pacer.resumed()
+    self.assertEqual(pacer.delay(0.01), 0.0)
+    pacer.resumed()
+    self.assertAlmostEqual(pacer.debt, 0.03)
+
+  def test_pace(self):
+    # Waits that end 4ms late on average keep their pace over many repetitions
+    now = [0.0]
+    pacer = Pacer(clock=lambda: now[0])
+    for i in range(100):
+      now[0] += pacer.delay(0.02) + (0.008 if i % 2 == 0 else 0.0)
+      pacer.resumed()
+    self.assertLess(now[0] - 100 * 0.02, 0.01)
+
+if __name__ == '__main__':
+  unittest.main()
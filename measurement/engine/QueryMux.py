@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+import asyncio
+import heapq
+import random
+import socket
+import string
+import struct
+import sys
+import time
+
+
+""" Encode a domain name (e.g. a.example.com) into DNS wire format without compression"""
+def encode_name(name:str) -> bytes:
+    wire = b""
+    for label in name.strip(".").split("."):
+        if label == "":
+            continue
+        l = label.encode("ascii")
+        assert len(l) < 64, f"Label '{label}' of '{name}' is too long"
+        wire += bytes([len(l)]) + l
+    return wire + b"\x00"
+
+""" Build a DNS query message in wire format. Mirrors the dnspython stub: single question, class IN, no EDNS."""
+def build_query(txid:int, name:str, rdtype:int, flags:int) -> bytes:
+    header = struct.pack("!HHHHHH", txid, flags, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack("!HH", rdtype, 1)
+
+""" Return the question section of a wire format message (name, type and class) or None if it is malformed"""
+def question_of(wire:bytes):
+    i = 12
+    try:
+        while wire[i] != 0:
+            if wire[i] & 0xC0: # Compression is not expected in the question of a response
+                return None
+            i += wire[i] + 1
+    except IndexError:
+        return None
+    if len(wire) < i + 5:
+        return None
+    return wire[12:i+5].lower()
+
+""" Characters of random subdomains, same as the ones chosen by get_query_domain of the engine"""
+RANDOM_LABEL_CHARSET = (string.ascii_lowercase + string.digits).encode("ascii")
+RANDOM_LABEL_LENGTH = 4
+
+# Linux socket options and control messages of kernel timestamps (not all are exported by the socket module)
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35)      # Receive timestamps as struct timespec
+SO_TIMESTAMPING = getattr(socket, "SO_TIMESTAMPING", 37)    # Send timestamps, reported on the error queue
+SOF_TIMESTAMPING_TX_SOFTWARE = 1 << 1   # Take a timestamp when the packet leaves the network stack
+SOF_TIMESTAMPING_SOFTWARE = 1 << 4      # Report software timestamps
+SOF_TIMESTAMPING_OPT_ID = 1 << 7        # Number the sent packets of a socket, the number identifies the timestamp
+SOF_TIMESTAMPING_OPT_TSONLY = 1 << 11   # Report the timestamp only, without the packet
+IP_RECVERR = 11
+SO_EE_ORIGIN_TIMESTAMPING = 4
+
+""" Internal function to read the first struct timespec of a control message as nanoseconds"""
+def _timespec_ns(data:bytes) -> int:
+    sec, nsec = struct.unpack_from("qq", data)
+    return sec * 10**9 + nsec
+
+
+class QueryTemplate:
+
+    """ Query of a query entry compiled once into wire format. If random_label is set, the query name is prefixed
+    with a random label of RANDOM_LABEL_LENGTH characters that fill() patches in place before each query."""
+    def __init__(self, name:str, rdtype:int, flags:int, random_label:bool=False):
+
+        self.name = name
+        self.random_label = random_label
+
+        prefix = bytes([RANDOM_LABEL_LENGTH]) + b"a" * RANDOM_LABEL_LENGTH if random_label else b""
+        self.wire = bytearray(build_query(0, "", rdtype, flags))
+        self.wire[12:13] = prefix + encode_name(self.name) # Replace the root name of the empty query
+
+    """ Draw a new random label (if any) and return the query name. The wire is updated in place"""
+    def fill(self) -> str:
+        if not self.random_label:
+            return self.name
+        label = bytes(random.choices(RANDOM_LABEL_CHARSET, k=RANDOM_LABEL_LENGTH))
+        self.wire[13:13+RANDOM_LABEL_LENGTH] = label
+        return label.decode("ascii") + "." + self.name
+
+
+class QueryMux:
+
+    """ Multiplexes the queries of all query tasks over a small pool of long-lived UDP sockets.
+    Responses are matched to pending queries by (transaction ID, source, question), timeouts are enforced centrally.
+    With kernel_timestamps (Linux only), queries are additionally stamped by the kernel when they leave the network
+    stack (SO_TIMESTAMPING) and when their response arrives (SO_TIMESTAMPNS), unaffected by the lag of the event loop.
+    The kernel timestamps (wall clock ns) are converted with kernel_clock."""
+    def __init__(self, num_sockets:int, port:int=53, resolution:float=0.1, rcvbuf:int=None, clock=time.time,
+            kernel_timestamps:bool=False, kernel_clock=None):
+
+        self.num_sockets = num_sockets  # Number of UDP sockets shared by all queries
+        self.port = port                # Destination port of the resolvers
+        self.resolution = resolution    # Granularity in seconds at which timeouts are checked
+        self.rcvbuf = rcvbuf            # Receive buffer size of the sockets, None keeps the system default
+        self.clock = clock              # Function returning the timestamps of sent and received queries
+        self.kernel_timestamps = kernel_timestamps
+        self.kernel_clock = kernel_clock if kernel_clock is not None else (lambda ns: ns)
+
+        self.loop = None
+        self.sockets = []
+        self.next_socket = 0            # Round robin index into sockets
+        self.pending = {}               # Dict of (txid, (ip, port), question) -> future
+        self.deadlines = []             # Heap of (deadline, key, future)
+        self.reaper = None              # Task enforcing the timeouts
+        self.tx_ids = {}                # Dict of socket fileno -> number of its next packet (SOF_TIMESTAMPING_OPT_ID)
+        self.tx_retrying = {}           # Dict of socket fileno -> number of queries waiting to resend on it
+        self.tx_pending = {}            # Dict of (socket fileno, packet number) -> kernel timestamps of the query
+
+        # Statistics
+        self.num_sent = 0
+        self.num_received = 0
+        self.num_unmatched = 0
+        self.num_timeouts = 0
+
+    """ Open the sockets and start the timeout reaper. Must be called from within the event loop"""
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        assert not self.kernel_timestamps or sys.platform.startswith("linux"), "Kernel timestamps require Linux"
+        for _ in range(self.num_sockets):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.rcvbuf is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            if self.kernel_timestamps:
+                sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+                self._reset_tx_ids(sock)
+            sock.setblocking(False)
+            sock.bind(("0.0.0.0", 0))
+            self.loop.add_reader(sock.fileno(), self._on_readable, sock)
+            self.sockets.append(sock)
+        self.reaper = asyncio.create_task(self._reap())
+
+    """ Stop the reaper, fail all pending queries and close the sockets"""
+    def close(self):
+        if self.reaper is not None:
+            self.reaper.cancel()
+        for fut in self.pending.values():
+            if not fut.done():
+                fut.set_result(None)
+        self.pending.clear()
+        self.tx_pending.clear()
+        for sock in self.sockets:
+            self.loop.remove_reader(sock.fileno())
+            sock.close()
+        self.sockets = []
+
+    """ Return the number of queries currently awaiting a response"""
+    def in_flight(self) -> int:
+        return len(self.pending)
+
+    """ Send a query to the resolver at ip and wait for the response.
+    Returns a tuple (response wire, time sent, time received, kernel time sent, kernel time received) or
+    (None, time sent, None, kernel time sent, None) on timeout. Kernel times are None unless kernel_timestamps is set,
+    the kernel time sent is also None if the kernel did not report it."""
+    async def query(self, ip:str, name:str, rdtype:int, flags:int, timeout:float):
+        wire = build_query(0, name, rdtype, flags)
+        return await self.query_wire(ip, bytearray(wire), timeout)
+
+    """ Send a prebuilt query in wire format, the transaction ID (first two bytes) is overwritten.
+    The wire is only used until the query is sent, hence a QueryTemplate may be reused right after the call."""
+    async def query_wire(self, ip:str, wire:bytearray, timeout:float):
+        question = bytes(wire[12:]).lower()
+        addr = (ip, self.port)
+
+        # Draw a transaction ID that is not in use for this resolver and question
+        while True:
+            txid = random.getrandbits(16)
+            key = (txid, addr, question)
+            if key not in self.pending:
+                break
+        wire[0:2] = struct.pack("!H", txid)
+
+        fut = self.loop.create_future()
+        self.pending[key] = fut
+
+        sock = self.sockets[self.next_socket]
+        self.next_socket = (self.next_socket + 1) % len(self.sockets)
+
+        # The kernel numbers the packets sent on the socket, its send timestamp is reported under this number.
+        # Timestamps before the query was handed to the kernel belong to another packet and are ignored
+        fd = sock.fileno()
+        tx_key = None
+        stamps = {"sent": None}
+        if self.kernel_timestamps and self.tx_retrying.get(fd, 0) == 0:
+            stamps['not_before'] = time.time_ns()
+            tx_key = (fd, self.tx_ids[fd])
+            self.tx_ids[fd] = (self.tx_ids[fd] + 1) & 0xFFFFFFFF
+            self.tx_pending[tx_key] = stamps
+
+        ts_sent = self.clock()
+        try:
+            try:
+                sock.sendto(wire, addr)
+            except (BlockingIOError, InterruptedError):
+                # Socket buffer is full, send a copy once writable since the wire may be patched in the meantime.
+                # Packets of the socket are not numbered reliably until all resends are done, see _reset_tx_ids
+                self.tx_retrying[fd] = self.tx_retrying.get(fd, 0) + 1
+                try:
+                    await self.loop.sock_sendto(sock, bytes(wire), addr)
+                finally:
+                    self.tx_retrying[fd] -= 1
+                    if self.kernel_timestamps and self.tx_retrying[fd] == 0:
+                        self._reset_tx_ids(sock)
+        except OSError:
+            # Treat unsendable queries (e.g. unreachable network) like lost ones
+            if self.kernel_timestamps and self.tx_retrying.get(fd, 0) == 0:
+                self._reset_tx_ids(sock)
+        self.num_sent += 1
+        heapq.heappush(self.deadlines, (self.loop.time() + timeout, id(fut), key, fut))
+
+        try:
+            r = await fut
+        finally:
+            if self.pending.get(key) is fut:
+                del self.pending[key]
+            if self.tx_pending.get(tx_key) is stamps:
+                del self.tx_pending[tx_key]
+
+        kts_sent = self.kernel_clock(stamps['sent']) if stamps['sent'] is not None else None
+        if r is None:
+            return (None, ts_sent, None, kts_sent, None)
+        kts_recv = self.kernel_clock(r[2]) if r[2] is not None else None
+        return (r[0], ts_sent, r[1], kts_sent, kts_recv)
+
+    """ Reader callback, drains the socket and resolves the matching futures"""
+    def _on_readable(self, sock):
+        if self.kernel_timestamps:
+            self._drain_errqueue(sock)
+        while True:
+            kts = None
+            try:
+                if self.kernel_timestamps:
+                    data, ancdata, _, addr = sock.recvmsg(65535, 256)
+                    for level, ctype, cdata in ancdata:
+                        if level == socket.SOL_SOCKET and ctype == SO_TIMESTAMPNS:
+                            kts = _timespec_ns(cdata)
+                else:
+                    data, addr = sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError: # e.g. ICMP port unreachable reported on the socket
+                continue
+            ts = self.clock()
+            if len(data) < 12:
+                self.num_unmatched += 1
+                continue
+            txid = struct.unpack_from("!H", data)[0]
+            fut = self.pending.pop((txid, addr[0:2], question_of(data)), None)
+            if fut is None or fut.done():
+                self.num_unmatched += 1 # Late, spoofed or duplicate response
+                continue
+            self.num_received += 1
+            fut.set_result((data, ts, kts))
+
+    """ Internal function to read the send timestamps of the socket from its error queue and attribute them to the
+    queries by the packet number the kernel reports with them"""
+    def _drain_errqueue(self, sock):
+        fd = sock.fileno()
+        while True:
+            try:
+                _, ancdata, _, _ = sock.recvmsg(0, 512, socket.MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            kts, tx_id = None, None
+            for level, ctype, cdata in ancdata:
+                if level == socket.SOL_SOCKET and ctype == SO_TIMESTAMPING:
+                    kts = _timespec_ns(cdata) # Software timestamp, the others are hardware timestamps
+                elif level == socket.IPPROTO_IP and ctype == IP_RECVERR:
+                    _, origin, _, _, _, _, data = struct.unpack_from("=IBBBBII", cdata)
+                    if origin == SO_EE_ORIGIN_TIMESTAMPING:
+                        tx_id = data
+            stamps = self.tx_pending.pop((fd, tx_id), None)
+            if kts is not None and stamps is not None and kts >= stamps['not_before']:
+                stamps['sent'] = kts
+
+    """ Internal function to (re)enable send timestamps of the socket, which restarts the numbering of its packets.
+    Called whenever a failed send may have been numbered by the kernel or not. Queries sent before lose their send
+    timestamps, they can no longer be attributed"""
+    def _reset_tx_ids(self, sock):
+        flags = SOF_TIMESTAMPING_TX_SOFTWARE | SOF_TIMESTAMPING_SOFTWARE | SOF_TIMESTAMPING_OPT_TSONLY
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPING, flags)
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPING, flags | SOF_TIMESTAMPING_OPT_ID)
+        fd = sock.fileno()
+        self.tx_ids[fd] = 0
+        self.tx_pending = {k: v for k, v in self.tx_pending.items() if k[0] != fd}
+
+    """ Coroutine that periodically expires all queries whose deadline has passed"""
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(self.resolution)
+            now = self.loop.time()
+            while len(self.deadlines) > 0 and self.deadlines[0][0] <= now:
+                _, _, key, fut = heapq.heappop(self.deadlines)
+                if fut.done():
+                    continue
+                if self.pending.get(key) is fut:
+                    del self.pending[key]
+                self.num_timeouts += 1
+                fut.set_result(None)
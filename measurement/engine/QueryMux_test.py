@@ -0,0 +1,88 @@
+#! /usr/bin/env python3
+
+import asyncio
+import socket
+import sys
+import time
+import unittest
+
+import dns.message
+import dns.flags
+import dns.rdatatype
+
+from QueryMux import build_query, encode_name, question_of, QueryMux, QueryTemplate
+class TestQueryMux(unittest.TestCase):
+
+  def test_encode_name(self):
+    self.assertEqual(encode_name("a.bc"), b"\x01a\x02bc\x00")
+    self.assertEqual(encode_name("a.bc."), b"\x01a\x02bc\x00")
+
+  def test_build_query(self):
+    # Hand-built query must be parseable and equal to what dnspython would send
+    wire = build_query(4711, "q.01020304-05060708.ta6.ch", dns.rdatatype.A, dns.flags.RD)
+    msg = dns.message.from_wire(wire)
+    self.assertEqual(msg.id, 4711)
+    self.assertEqual(msg.flags, dns.flags.RD)
+    self.assertEqual(msg.question[0].name.to_text(), "q.01020304-05060708.ta6.ch.")
+    self.assertEqual(msg.question[0].rdtype, dns.rdatatype.A)
+    self.assertEqual(msg.edns, -1)
+
+  def test_question_of(self):
+    query = build_query(1, "WwW.Example.com", dns.rdatatype.A, 0)
+    response = dns.message.make_response(dns.message.from_wire(query)).to_wire()
+    self.assertEqual(question_of(response), query[12:].lower())
+    self.assertIsNone(question_of(response[:15]))
+
+  def test_template(self):
+    # Static names equal the hand-built query
+    t = QueryTemplate("a.example.com", dns.rdatatype.AAAA, 0)
+    self.assertEqual(t.fill(), "a.example.com")
+    self.assertEqual(bytes(t.wire), build_query(0, "a.example.com", dns.rdatatype.AAAA, 0))
+
+    # Random labels are patched in place
+    t = QueryTemplate("a.example.com", dns.rdatatype.A, dns.flags.RD, random_label=True)
+    names = set()
+    for _ in range(20):
+      name = t.fill()
+      self.assertEqual(bytes(t.wire), build_query(0, name, dns.rdatatype.A, dns.flags.RD))
+      self.assertRegex(name, r"^[a-z0-9]{4}\.a\.example\.com$")
+      names.add(name)
+    self.assertGreater(len(names), 1)
+
+  @unittest.skipUnless(sys.platform.startswith("linux"), "Kernel timestamps require Linux")
+  def test_kernel_timestamps(self):
+    # Local resolver that answers each query after a delay
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.setblocking(False)
+
+    async def run():
+      loop = asyncio.get_running_loop()
+      def respond():
+        wire, addr = server.recvfrom(512)
+        response = dns.message.make_response(dns.message.from_wire(wire)).to_wire()
+        loop.call_later(0.05, server.sendto, response, addr)
+      loop.add_reader(server.fileno(), respond)
+
+      mux = QueryMux(2, port=server.getsockname()[1], clock=time.time_ns, kernel_timestamps=True)
+      await mux.start()
+      try:
+        results = await asyncio.gather(*[mux.query("127.0.0.1", f"q{i}.example.com", dns.rdatatype.A, 0, 1) for i in range(10)])
+      finally:
+        mux.close()
+        loop.remove_reader(server.fileno())
+      return results
+
+    results = asyncio.run(run())
+    server.close()
+    for wire, ts_sent, ts_recv, kts_sent, kts_recv in results:
+      self.assertIsNotNone(wire)
+      self.assertIsNotNone(kts_sent)
+      self.assertIsNotNone(kts_recv)
+      # The kernel stamps the query after the engine and the response before the engine
+      self.assertLessEqual(ts_sent, kts_sent)
+      self.assertLessEqual(kts_recv, ts_recv)
+      self.assertGreaterEqual((kts_recv - kts_sent) / 1e9, 0.05)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+
+class TokenBucket:
+
+    """ Token bucket filling at 'rate' tokens per second up to 'burst' tokens.
+    Tokens are reserved immediately, the bucket may go into debt and reports how long the caller has to wait."""
+    def __init__(self, rate:float, burst:float):
+        assert rate > 0, "Rate of a token bucket must be positive"
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+
+    """ Internal function to add the tokens accumulated since the last update"""
+    def _refill(self, now:float):
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    """ Reserve n tokens and return the number of seconds to wait until they are available"""
+    def reserve(self, n:float=1, now:float=None) -> float:
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= n
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    """ Returns True if the bucket is full, i.e. it behaves exactly like a newly created one"""
+    def is_idle(self, now:float) -> bool:
+        return self.tokens + (now - self.last) * self.rate >= self.burst
+
+
+class RateLimiter:
+
+    """ Paces queries with token buckets on three levels: the whole probe, each target resolver (rr), and each
+    authoritative nameserver of the query task. A rate of None disables the respective level.
+    Bursts are given in seconds worth of tokens at the configured rate."""
+    def __init__(self, probe_qps:float=None, rr_qps:float=None, ns_qps:float=None, burst:float=1.0):
+
+        self.rr_qps = rr_qps
+        self.ns_qps = ns_qps
+        self.burst = burst
+
+        self.probe_bucket = TokenBucket(probe_qps, probe_qps * burst) if probe_qps is not None else None
+        self.rr_buckets = {}    # Dict of rr -> TokenBucket
+        self.ns_buckets = {}    # Dict of nameserver -> TokenBucket
+
+        self.num_acquired = 0
+        self.PRUNE_EVERY = 10000  # Number of acquisitions after which idle buckets are dropped
+
+    """ Internal function to get the bucket of key, create it if necessary"""
+    def _bucket(self, buckets:dict, key:str, rate:float) -> TokenBucket:
+        b = buckets.get(key)
+        if b is None:
+            b = TokenBucket(rate, rate * self.burst)
+            buckets[key] = b
+        return b
+
+    """ Internal function to drop idle buckets, keeps memory bounded with many distinct resolvers"""
+    def _prune(self, now:float):
+        for buckets in [self.rr_buckets, self.ns_buckets]:
+            idle = [k for k, b in buckets.items() if b.is_idle(now)]
+            for k in idle:
+                del buckets[k]
+
+    """ Wait until a query to resolver rr may be sent.
+    ns_costs is a dict of nameserver -> number of queries the resolution is expected to cause at that nameserver.
+    The resolver and nameserver buckets are waited out first, the probe token is only reserved once the query is
+    about to be sent, such that queries held back by their resolver do not use up probe tokens of earlier queries."""
+    async def acquire(self, rr:str, ns_costs:dict=None):
+        now = time.monotonic()
+        delay = 0.0
+        if self.rr_qps is not None:
+            delay = max(delay, self._bucket(self.rr_buckets, rr, self.rr_qps).reserve(1, now))
+        if self.ns_qps is not None and ns_costs is not None:
+            for ns, cost in ns_costs.items():
+                delay = max(delay, self._bucket(self.ns_buckets, ns, self.ns_qps).reserve(cost, now))
+
+        self.num_acquired += 1
+        if self.num_acquired % self.PRUNE_EVERY == 0:
+            self._prune(now)
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.probe_bucket is not None:
+            delay = self.probe_bucket.reserve(1)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+""" Estimate the number of queries a single resolution of the query task causes at each of its nameservers.
+Upper bound: every record the task installed on a nameserver is fetched once, at least one query per nameserver."""
+def expected_ns_queries(querytask:dict) -> dict:
+    costs = {}
+    for ns, zones in querytask.get('nameservers', {}).items():
+        costs[ns] = max(1, sum([len(z['records']) for z in zones]))
+    return costs
@@ -0,0 +1,51 @@
+#! /usr/bin/env python3
+
+import asyncio
+import time
+import unittest
+
+from RateLimiter import RateLimiter, TokenBucket, expected_ns_queries
+class TestRateLimiter(unittest.TestCase):
+
+  def test_token_bucket(self):
+    b = TokenBucket(10, 2)
+    now = b.last
+    self.assertEqual(b.reserve(1, now), 0.0)
+    self.assertEqual(b.reserve(1, now), 0.0)
+    self.assertAlmostEqual(b.reserve(1, now), 0.1)  # In debt by one token
+    self.assertAlmostEqual(b.reserve(1, now), 0.2)
+    self.assertEqual(b.reserve(1, now + 1.0), 0.0)  # Refilled
+    self.assertFalse(b.is_idle(now + 1.0))
+    self.assertTrue(b.is_idle(now + 2.0))
+
+  def test_mixed_limits(self):
+    # Queries held back by their resolver must not be sent together with new queries beyond the probe burst.
+    # Probe: 200 qps with a burst of 10 queries, resolvers: 10 qps with a burst of 1 query
+    limiter = RateLimiter(probe_qps=200, rr_qps=10, burst=0.05)
+    sent = []
+
+    async def query(rr:str):
+      await limiter.acquire(rr)
+      sent.append(time.monotonic())
+
+    async def run():
+      first = [query(f"10.0.0.{i}") for i in range(10) for _ in range(2)] # Second query of each resolver waits 0.1s
+      later = asyncio.sleep(0.1)
+      await asyncio.gather(*first, later)
+      await asyncio.gather(*[query(f"10.0.1.{i}") for i in range(10)])
+    asyncio.run(run())
+
+    self.assertEqual(len(sent), 30)
+    window = 0.005
+    most = max([len([t for t in sent if t0 <= t < t0 + window]) for t0 in sent])
+    self.assertLessEqual(most, 10 + 200 * window + 1)
+
+  def test_expected_ns_queries(self):
+    task = {"nameservers": {
+      "1.2.3.4": [{"zone": "a", "records": [{}, {}]}, {"zone": "b", "records": [{}]}],
+      "5.6.7.8": [{"zone": "c", "records": []}],
+    }}
+    self.assertEqual(expected_ns_queries(task), {"1.2.3.4": 3, "5.6.7.8": 1})
+
+if __name__ == '__main__':
+    unittest.main()
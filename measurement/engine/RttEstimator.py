@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+# Gains and variance factor of the estimator as in RFC 6298
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+
+class RttEstimator:
+
+    """ Smoothed round trip time (SRTT) and its variation (RTTVAR) per resolver, kept across all query tasks of the engine.
+    The deadline of a query is SRTT + K * RTTVAR as in RFC 6298, bounded below by min_timeout and above by the timeout
+    of the query entry. A timeout doubles the deadline of the resolver (backoff) until it answers again. Resolvers with
+    fewer than min_samples answers get the full timeout."""
+    def __init__(self, min_timeout:float=1.0, min_samples:int=3):
+
+        self.min_timeout = min_timeout  # Lower bound of the deadline in seconds
+        self.min_samples = min_samples  # Answers required before the deadline is adapted
+        self.resolvers = {}             # Dict of resolver -> [srtt, rttvar, samples, backoff]
+
+    """ Record the round trip time of an answered query in seconds"""
+    def sample(self, resolver:str, rtt:float):
+        if resolver not in self.resolvers:
+            self.resolvers[resolver] = [rtt, rtt / 2, 1, 1]
+            return
+        e = self.resolvers[resolver]
+        e[1] = (1 - BETA) * e[1] + BETA * abs(e[0] - rtt)
+        e[0] = (1 - ALPHA) * e[0] + ALPHA * rtt
+        e[2] += 1
+        e[3] = 1
+
+    """ Record a query that timed out"""
+    def timeout(self, resolver:str):
+        if resolver in self.resolvers:
+            self.resolvers[resolver][3] *= 2
+
+    """ Return the deadline in seconds for a query to the resolver, at most timeout"""
+    def deadline(self, resolver:str, timeout:float) -> float:
+        e = self.resolvers.get(resolver)
+        if e is None or e[2] < self.min_samples:
+            return timeout
+        return min(timeout, max(self.min_timeout, (e[0] + K * e[1]) * e[3]))
@@ -0,0 +1,42 @@
+#! /usr/bin/env python3
+
+import unittest
+
+from RttEstimator import RttEstimator
+class TestRttEstimator(unittest.TestCase):
+
+  def test_deadline(self):
+    rtt = RttEstimator(min_timeout=0.1, min_samples=3)
+    # Unknown resolvers and resolvers with too few samples get the full timeout
+    self.assertEqual(rtt.deadline("1.2.3.4", 15), 15)
+    rtt.sample("1.2.3.4", 0.2)
+    rtt.sample("1.2.3.4", 0.2)
+    self.assertEqual(rtt.deadline("1.2.3.4", 15), 15)
+    rtt.sample("1.2.3.4", 0.2)
+    # SRTT 0.2, RTTVAR 0.1 * (3/4)^2
+    self.assertAlmostEqual(rtt.deadline("1.2.3.4", 15), 0.2 + 4 * 0.1 * 0.75**2)
+    self.assertEqual(rtt.deadline("5.6.7.8", 15), 15)
+
+  def test_bounds(self):
+    rtt = RttEstimator(min_timeout=1.0, min_samples=1)
+    rtt.sample("1.2.3.4", 0.01)
+    self.assertEqual(rtt.deadline("1.2.3.4", 15), 1.0)
+    rtt.sample("5.6.7.8", 10)
+    self.assertEqual(rtt.deadline("5.6.7.8", 15), 15)
+
+  def test_backoff(self):
+    rtt = RttEstimator(min_timeout=0.1, min_samples=1)
+    rtt.sample("1.2.3.4", 1.0)
+    self.assertEqual(rtt.deadline("1.2.3.4", 15), 3.0)
+    rtt.timeout("1.2.3.4")
+    self.assertEqual(rtt.deadline("1.2.3.4", 15), 6.0)
+    rtt.timeout("1.2.3.4")
+    self.assertEqual(rtt.deadline("1.2.3.4", 15), 12.0)
+    rtt.timeout("1.2.3.4")
+    self.assertEqual(rtt.deadline("1.2.3.4", 15), 15)
+    # An answer resets the backoff
+    rtt.sample("1.2.3.4", 1.0)
+    self.assertLess(rtt.deadline("1.2.3.4", 15), 3.0)
+
+if __name__ == '__main__':
+  unittest.main()
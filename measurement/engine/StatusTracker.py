@@ -1,47 +1,82 @@
 #!/usr/bin/env python3
 
+import types
+from statistics import NormalDist
+
+# Registries of wait and abort policies: name -> function(tracker, response) -> bool
+WAIT_POLICIES = {}
+ABORT_POLICIES = {}
+
+# Default parameters of the policies, query entries may override them with "policy_params" in the pattern
+DEFAULT_POLICY_PARAMS = {
+    "max_timeout_percent": 50,  # abort_policy_timeout_percent: tolerated timeouts in percent of the planned queries
+    "stable_window": 5,         # abort_policy_stable: number of identical consecutive responses to stop after
+    "timeout_rate": 0.5,        # abort_policy_timeout_rate: timeout rate considered too high
+    "confidence": 0.95,         # abort_policy_timeout_rate: confidence that the timeout rate exceeds timeout_rate
+}
+
+""" Register a function as wait policy under its name, usable as decorator. Returns the function"""
+def register_wait_policy(f, name:str=None):
+    WAIT_POLICIES[f.__name__ if name is None else name] = f
+    return f
+
+""" Register a function as abort policy under its name, usable as decorator. Returns the function"""
+def register_abort_policy(f, name:str=None):
+    ABORT_POLICIES[f.__name__ if name is None else name] = f
+    return f
+
 class StatusTracker:
 
-    """ Tracks the status of a measurement run. Decides whether to wait or abort based on the supplied policies."""
-    def __init__(self, querytask, n, wait_policy:str, abort_policy:str):
+    """ Tracks the status of a measurement run. Decides whether to wait or abort based on the supplied policies.
+    Policies are given by their name in the registries (or as function) and may use the parameters in policy_params."""
+    def __init__(self, querytask, n, wait_policy, abort_policy, policy_params:dict=None):
 
-        # Retrieve expected status 
+        # Retrieve expected status and planned number of queries
         self.expected_status = querytask['expected_status']
+        self.planned = int(querytask.get('repeat', 1))
 
         # Check that the supplied policies actually exist
-        assert hasattr(self, wait_policy), f"Wait policy {wait_policy} is not implemented"
-        assert hasattr(self, abort_policy), f"Abort policy {abort_policy} is not implemented"
-        assert callable(getattr(self, wait_policy)), "Wait policy must be a function"
-        assert callable(getattr(self, abort_policy)), "Abort policy must be a function"
-        
-        #self.abort_policy = getattr(self, abort_policy)
-        self.abort_policy = self.__getattribute__(abort_policy)
-        #self.wait_policy = getattr(self, wait_policy)
-        self.wait_policy = self.__getattribute__(wait_policy)
+        self.wait_policy_name = wait_policy if isinstance(wait_policy, str) else wait_policy.__name__
+        self.abort_policy_name = abort_policy if isinstance(abort_policy, str) else abort_policy.__name__
+        assert self.wait_policy_name in WAIT_POLICIES, f"Wait policy {self.wait_policy_name} is not implemented"
+        assert self.abort_policy_name in ABORT_POLICIES, f"Abort policy {self.abort_policy_name} is not implemented"
+
+        self.wait_policy = types.MethodType(WAIT_POLICIES[self.wait_policy_name], self)
+        self.abort_policy = types.MethodType(ABORT_POLICIES[self.abort_policy_name], self)
+        self.params = dict(DEFAULT_POLICY_PARAMS)
+        if policy_params is not None:
+            self.params.update(policy_params)
 
         # Set thresholds
         self.MAX_FAILS = n
-        
-        # Initialize counters 
+
+        # Initialize counters
         self.num_successes = 0
         self.num_fails = 0
+        self.recent = []    # Recent responses, kept by abort_policy_stable
 
-    # TODO: percentage based abort policies (e.g. based on planned number of queries)
+        # Set by abort policies that abort because the resolver does not respond at all
+        self.offline = False
+        # Set by stopping rules once enough responses were collected, the query entry ends without an abort
+        self.stopped = False
 
     """ Function that takes the response of a query and decides whether to wait based on internal status"""
     def should_wait(self, response):
         return self.wait_policy(response)
 
-    """ Wait policy function that returns true if the resolver is considered online""" 
+    """ Wait policy function that returns true if the resolver is considered online"""
+    @register_wait_policy
     def wait_policy_if_online(self, response):
         considered_online = ["NOERROR", "NXDOMAIN", "SRVFAIL", "NOANSWER", "REFUSED"]
         return response['status'] in considered_online
-    
-    """ Wait policy function that returns true if the response status matches the expected one""" 
+
+    """ Wait policy function that returns true if the response status matches the expected one"""
+    @register_wait_policy
     def wait_policy_if_expected(self, response):
         return response['status'] == self.expected_status
-    
+
     """ Wait policy function that always says to wait"""
+    @register_wait_policy
     def wait_policy_always_wait(self, response):
         return True
 
@@ -49,38 +84,49 @@ class StatusTracker:
     def should_abort(self, response):
         return self.abort_policy(response)
 
+    """ Returns True if a stopping rule ended the query entry with the last response. Unlike an abort, the response
+    is kept and queries still in flight are not cancelled"""
+    def should_stop(self):
+        return self.stopped
+
     """ Polciy function that aborts if n timeouts are encountered without every having a success. """
+    @register_abort_policy
     def abort_policy_n_timeout_no_success(self, response):
         if response['status'] == "TIMEOUT":
             self.num_fails += 1
         else:
             self.num_successes += 1
 
-        return self.num_successes == 0 and self.num_fails >= self.MAX_FAILS 
-    
-    """ Polciy function that never aborts.""""" 
+        self.offline = self.num_successes == 0 and self.num_fails >= self.MAX_FAILS
+        return self.offline
+
+    """ Polciy function that never aborts."""""
+    @register_abort_policy
     def abort_policy_never_abort(self, response):
         return False
-        
+
     """ Polciy function that aborts if n timeouts are encountered."""
+    @register_abort_policy
     def policy_n_timeout(self, response):
         if response['status'] == "TIMEOUT":
             self.num_fails += 1
         else:
             self.num_successes += 1
-        
+
         return self.num_fails >= self.MAX_FAILS
-    
+
     """ Policy function that aborts if n *consecutive* timeouts are encountered."""
+    @register_abort_policy
     def policy_n_timeout_consecutive(self, response):
         if response['status'] == "TIMEOUT":
-            self.num_timeouts += 1
+            self.num_fails += 1
         else:
             self.num_fails = 0
             self.num_successes += 1
         return self.num_fails >= self.MAX_FAILS
-    
+
     """ Policy function that aborts if n *consecutive* status codes that don't match the expected one are encountered."""
+    @register_abort_policy
     def abort_policy_n_not_expected(self, response):
         if response['status'] != self.expected_status:
             self.num_fails += 1
@@ -89,10 +135,48 @@ class StatusTracker:
         return self.num_fails >= self.MAX_FAILS
 
     """ Policy function that aborts if n *consecutive* status codes that don't match the expected one are encountered, but only if no success has been encountered."""
+    @register_abort_policy
     def abort_policy_n_not_expected_no_success(self, response):
         if response['status'] != self.expected_status:
             self.num_fails += 1
         else:
             self.num_successes += 1
         return self.num_fails >= self.MAX_FAILS and self.num_successes == 0
-        
\ No newline at end of file
+
+    """ Policy function that aborts once the timeouts exceed max_timeout_percent of the planned queries (repeat)."""
+    @register_abort_policy
+    def abort_policy_timeout_percent(self, response):
+        if response['status'] == "TIMEOUT":
+            self.num_fails += 1
+        else:
+            self.num_successes += 1
+        aborted = 100 * self.num_fails > self.params['max_timeout_percent'] * self.planned
+        self.offline = aborted and self.num_successes == 0
+        return aborted
+
+    """ Sequential stopping rule that stops once the last stable_window responses are identical (status and answers),
+    e.g. to end an enumeration early once the resolver behaves stable. It never aborts, see should_stop."""
+    @register_abort_policy
+    def abort_policy_stable(self, response):
+        answers = sorted([str(d.get('answer')) for d in response.get('data', [])])
+        self.recent = (self.recent + [(response['status'], answers)])[-self.params['stable_window']:]
+        self.stopped = len(self.recent) == self.params['stable_window'] and all([r == self.recent[0] for r in self.recent])
+        return False
+
+    """ Sequential policy function that aborts once the timeout rate exceeds timeout_rate with the given confidence,
+    i.e. the lower bound of the one-sided Wilson score interval of the observed timeout rate is above timeout_rate."""
+    @register_abort_policy
+    def abort_policy_timeout_rate(self, response):
+        if response['status'] == "TIMEOUT":
+            self.num_fails += 1
+        else:
+            self.num_successes += 1
+        n = self.num_fails + self.num_successes
+        p = self.num_fails / n
+        z = NormalDist().inv_cdf(self.params['confidence'])
+        center = p + z * z / (2 * n)
+        spread = z * (p * (1 - p) / n + z * z / (4 * n * n)) ** 0.5
+        lower = (center - spread) / (1 + z * z / n)
+        aborted = lower > self.params['timeout_rate']
+        self.offline = aborted and self.num_successes == 0
+        return aborted
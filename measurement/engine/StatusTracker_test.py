@@ -2,7 +2,7 @@
 
 import unittest
 
-from StatusTracker import StatusTracker
+from StatusTracker import StatusTracker, ABORT_POLICIES, register_abort_policy
 class TestStatusTracker(unittest.TestCase):
 
   def test1(self):
@@ -63,7 +63,64 @@ class TestStatusTracker(unittest.TestCase):
       
       self.assertFalse(tracker.should_wait({"status": "TIMEOUT"}))
       self.assertTrue(tracker.should_wait({"status": "NXDOMAIN"}))
-        
+
+  def test_timeout_percent(self):
+      tracker = StatusTracker(
+          {"expected_status": "NOERROR", "repeat": 10},
+          3,
+          "wait_policy_if_online",
+          "abort_policy_timeout_percent",
+          {"max_timeout_percent": 20})
+
+      self.assertFalse(tracker.should_abort({"status": "NOERROR"}))
+      self.assertFalse(tracker.should_abort({"status": "TIMEOUT"}))
+      self.assertFalse(tracker.should_abort({"status": "TIMEOUT"}))
+      self.assertTrue(tracker.should_abort({"status": "TIMEOUT"}))
+      self.assertFalse(tracker.offline)
+
+  def test_stable(self):
+      tracker = StatusTracker(
+          {"expected_status": "NOERROR", "repeat": 100},
+          3,
+          "wait_policy_if_online",
+          "abort_policy_stable",
+          {"stable_window": 3})
+
+      a = {"status": "NOERROR", "data": [{"answer": "1.2.3.4"}]}
+      b = {"status": "NOERROR", "data": [{"answer": "5.6.7.8"}]}
+      # Stopping is not an abort
+      for response, stopped in [(a, False), (a, False), (b, False), (b, False), (b, True)]:
+        self.assertFalse(tracker.should_abort(response))
+        self.assertEqual(tracker.should_stop(), stopped)
+
+  def test_timeout_rate(self):
+      tracker = StatusTracker(
+          {"expected_status": "NOERROR", "repeat": 100},
+          3,
+          "wait_policy_if_online",
+          "abort_policy_timeout_rate",
+          {"timeout_rate": 0.5, "confidence": 0.95})
+
+      # Three timeouts in a row are enough evidence for a timeout rate above 50 %
+      self.assertFalse(tracker.should_abort({"status": "TIMEOUT"}))
+      self.assertFalse(tracker.should_abort({"status": "TIMEOUT"}))
+      self.assertTrue(tracker.should_abort({"status": "TIMEOUT"}))
+      self.assertTrue(tracker.offline)
+
+      # Alternating responses never are
+      tracker = StatusTracker({"expected_status": "NOERROR"}, 3, "wait_policy_if_online", "abort_policy_timeout_rate")
+      for i in range(50):
+        self.assertFalse(tracker.should_abort({"status": "TIMEOUT" if i % 2 else "NOERROR"}))
+
+  def test_registry(self):
+      register_abort_policy(lambda tracker, response: response['status'] == "REFUSED", "abort_policy_refused")
+      tracker = StatusTracker({"expected_status": "NOERROR"}, 3, "wait_policy_if_online", "abort_policy_refused")
+      self.assertFalse(tracker.should_abort({"status": "NOERROR"}))
+      self.assertTrue(tracker.should_abort({"status": "REFUSED"}))
+      self.assertTrue("abort_policy_refused" in ABORT_POLICIES)
+      with self.assertRaises(AssertionError):
+        StatusTracker({"expected_status": "NOERROR"}, 3, "wait_policy_if_online", "abort_policy_unknown")
+
 if __name__ == '__main__':
     unittest.main()
 
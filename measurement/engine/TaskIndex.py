@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import json
+import math
+import os
+import queue
+import threading
+
+# Suffix of the index file next to a task file
+INDEX_SUFFIX = ".idx"
+
+""" Load the index of a task file, i.e. a dict with the number of tasks ('count'), the byte offset of each task in the file
+('offsets') and optionally the estimated runtime of each task in seconds ('runtimes', may be None).
+Returns None if the task file has no index."""
+def load_index(task_file:str):
+    if not os.path.exists(task_file + INDEX_SUFFIX):
+        return None
+    with open(task_file + INDEX_SUFFIX, "r") as f:
+        index = json.load(f)
+    assert index['count'] == len(index['offsets']), f"Index of {task_file} is inconsistent"
+    return index
+
+""" Write the index of a task file given the byte offsets of its tasks and optionally their estimated runtimes"""
+def write_index(task_file:str, offsets:list, runtimes:list=None):
+    if runtimes is not None and all([r is None for r in runtimes]):
+        runtimes = None
+    with open(task_file + INDEX_SUFFIX, "w") as f:
+        json.dump({"count": len(offsets), "offsets": offsets, "runtimes": runtimes}, f)
+
+""" Estimate the runtime of a query task in seconds as the upper bound (wait + timeout) * repeat + wait_after of its
+query entries (as BasicMeasurement.get_max_runtime). Concurrent entries run their repeats in 'parallelism' slots"""
+def estimate_runtime(task:dict) -> float:
+    runtime = 0.0
+    for q in task['queries']:
+        repeat = int(q.get('repeat', 1))
+        if q.get('concurrent', False):
+            parallelism = int(q.get('parallelism', 0))
+            if parallelism > 0:
+                repeat = math.ceil(repeat / parallelism)
+            else:
+                repeat = min(repeat, 1)
+        runtime += (float(q.get('wait', 0)) + float(q.get('timeout', 0))) * repeat + float(q.get('wait_after', 0))
+    return runtime
+
+""" Order task IDs longest expected runtime first (LPT), which lets the shortest tasks fill the gaps at the end of a run
+instead of a long task starting last. With lookahead, only consecutive windows of that many tasks are reordered,
+otherwise all of them. Tasks of equal or unknown runtime (None) keep their order, unknown ones go last in their window"""
+def lpt_order(task_ids:list, runtimes:list, lookahead:int=None) -> list:
+    if lookahead is None:
+        lookahead = max(1, len(task_ids))
+    key = lambda i: -runtimes[i] if runtimes[i] is not None else math.inf
+    ordered = []
+    for start in range(0, len(task_ids), lookahead):
+        ordered += sorted(task_ids[start:start+lookahead], key=key)
+    return ordered
+
+
+class TaskReader:
+
+    """ Reads and decodes the tasks with the given IDs from an indexed task file in a background thread.
+    Tasks are handed over in batches of (task ID, task) through a bounded queue, get() returns None after the last batch.
+    If reading fails (e.g. a malformed task or a stale index), get() raises the exception of the thread instead."""
+    def __init__(self, task_file:str, index:dict, task_ids:list, batch_size:int=256, prefetch:int=16):
+
+        self.task_file = task_file
+        self.offsets = index['offsets']
+        self.task_ids = task_ids            # IDs of the tasks to read, in order
+        self.batch_size = batch_size        # Number of tasks per batch
+        self.batches = queue.Queue(maxsize=prefetch)   # Decoded batches not yet taken
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    """ Internal function run by the thread. Seeks only where tasks are skipped (e.g. on resume).
+    An exception is handed over in place of the next batch, such that the reader of the batches does not wait forever"""
+    def _run(self):
+        batch = []
+        try:
+            with open(self.task_file, "rb") as f:
+                for task_id in self.task_ids:
+                    offset = self.offsets[task_id]
+                    if f.tell() != offset:
+                        f.seek(offset)
+                    batch.append((task_id, json.loads(f.readline())))
+                    if len(batch) == self.batch_size:
+                        self.batches.put(batch)
+                        batch = []
+        except Exception as e:
+            self.batches.put(e)
+            return
+        if len(batch) > 0:
+            self.batches.put(batch)
+        self.batches.put(None)
+
+    """ Return the next batch of tasks, blocks until it is available. None once all tasks have been read.
+    Raises the exception of the thread if reading failed"""
+    def get(self):
+        batch = self.batches.get()
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
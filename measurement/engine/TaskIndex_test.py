@@ -0,0 +1,71 @@
+#! /usr/bin/env python3
+
+import json
+import tempfile
+import unittest
+
+from TaskIndex import TaskReader, estimate_runtime, load_index, lpt_order, write_index
+class TestTaskIndex(unittest.TestCase):
+
+  def write_tasks(self, task_file:str, n:int) -> list:
+    offsets = []
+    with open(task_file, "w") as f:
+      for i in range(n):
+        offsets.append(f.tell())
+        f.write(json.dumps({"id": i, "pad": "x" * i}) + "\n")
+    return offsets
+
+  def test_index(self):
+    with tempfile.TemporaryDirectory() as d:
+      self.assertIsNone(load_index(f"{d}/tsk"))
+      offsets = self.write_tasks(f"{d}/tsk", 5)
+      write_index(f"{d}/tsk", offsets, [None] * 5)
+      index = load_index(f"{d}/tsk")
+      self.assertEqual(index['count'], 5)
+      self.assertEqual(index['offsets'], offsets)
+      self.assertIsNone(index['runtimes'])
+      write_index(f"{d}/tsk", offsets, [1.0, 2.0, None, 0.5, 3.0])
+      self.assertEqual(load_index(f"{d}/tsk")['runtimes'][1], 2.0)
+
+  def test_reader(self):
+    with tempfile.TemporaryDirectory() as d:
+      offsets = self.write_tasks(f"{d}/tsk", 50)
+      write_index(f"{d}/tsk", offsets)
+      task_ids = [i for i in range(50) if i % 3 != 1] # Skip some tasks, e.g. completed ones
+      reader = TaskReader(f"{d}/tsk", load_index(f"{d}/tsk"), task_ids, batch_size=4, prefetch=2)
+      tasks = []
+      while True:
+        batch = reader.get()
+        if batch is None:
+          break
+        self.assertLessEqual(len(batch), 4)
+        tasks += batch
+      self.assertEqual([t[0] for t in tasks], task_ids)
+      self.assertTrue(all([t[0] == t[1]['id'] for t in tasks]))
+
+  def test_reader_error(self):
+    with tempfile.TemporaryDirectory() as d:
+      offsets = self.write_tasks(f"{d}/tsk", 50)
+      write_index(f"{d}/tsk", [o + 1 for o in offsets]) # Stale index, offsets point into the lines
+      reader = TaskReader(f"{d}/tsk", load_index(f"{d}/tsk"), list(range(50)), batch_size=4, prefetch=2)
+      with self.assertRaises(json.JSONDecodeError):
+        while reader.get() is not None:
+          pass
+
+  def test_estimate_runtime(self):
+    task = {"queries": [
+      {"wait": 0.5, "timeout": 2, "repeat": 4, "wait_after": 10},
+      {"wait": 0, "timeout": 5, "repeat": 10, "wait_after": 0, "concurrent": True, "parallelism": 3},
+      {"wait": "1", "timeout": "1", "repeat": "2", "wait_after": "0.5", "concurrent": True},
+    ]}
+    self.assertAlmostEqual(estimate_runtime(task), (2.5 * 4 + 10) + 5 * 4 + (2 + 0.5))
+
+  def test_lpt_order(self):
+    runtimes = [1.0, 5.0, None, 5.0, 3.0, 0.0]
+    self.assertEqual(lpt_order(list(range(6)), runtimes), [1, 3, 4, 0, 5, 2])
+    self.assertEqual(lpt_order(list(range(6)), runtimes, lookahead=3), [1, 0, 2, 3, 4, 5])
+    self.assertEqual(lpt_order([5, 4, 0], runtimes), [4, 0, 5])
+    self.assertEqual(lpt_order([], runtimes), [])
+
+if __name__ == '__main__':
+  unittest.main()
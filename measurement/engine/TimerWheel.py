@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import math
+
+class TimerWheel:
+
+    """ Hierarchical timer wheel. Items are scheduled at a deadline (in seconds) and returned by advance() once the
+    deadline has passed, with a precision of one tick. Level l has 'slots' slots of slots**l ticks each,
+    items are cascaded to lower levels as their deadline approaches. Scheduling and expiring are O(1)."""
+    def __init__(self, tick:float, now:float, slots:int=256, levels:int=4):
+
+        self.tick = tick            # Duration of a tick in seconds
+        self.slots = slots          # Number of slots per level
+        self.levels = levels        # Number of levels
+
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []          # Items beyond the range of the highest level
+        self.current = int(now / tick)  # Next tick to be processed
+        self.size = 0               # Number of scheduled items
+
+    """ Return the number of scheduled items"""
+    def __len__(self):
+        return self.size
+
+    """ Schedule item to be returned once 'deadline' has passed. Deadlines in the past expire with the next tick"""
+    def schedule(self, deadline:float, item):
+        t = max(int(math.ceil(deadline / self.tick)), self.current)
+        self._insert(t, item)
+        self.size += 1
+
+    """ Internal function to place an item due at tick t into the lowest level covering it"""
+    def _insert(self, t:int, item):
+        delta = t - self.current
+        span = 1
+        for level in range(self.levels):
+            if delta < span * self.slots:
+                self.wheels[level][(t // span) % self.slots].append((t, item))
+                return
+            span *= self.slots
+        self.overflow.append((t, item))
+
+    """ Process all ticks up to 'now' and return the list of expired items, ordered by tick"""
+    def advance(self, now:float) -> list:
+        target = int(now / self.tick + 1e-9) # Tolerate rounding errors of the division
+        expired = []
+
+        while self.current <= target:
+            if self.size == 0: # Nothing scheduled, skip idle ticks
+                self.current = target + 1
+                break
+
+            # Cascade higher levels whose slot boundary is reached
+            span = self.slots
+            for level in range(1, self.levels):
+                if self.current % span != 0:
+                    break
+                idx = (self.current // span) % self.slots
+                bucket, self.wheels[level][idx] = self.wheels[level][idx], []
+                for t, item in bucket:
+                    self._insert(t, item)
+                if level == self.levels - 1: # Top level wrapped, retry overflowing items
+                    overflow, self.overflow = self.overflow, []
+                    for t, item in overflow:
+                        self._insert(t, item)
+                span *= self.slots
+
+            # Expire items of the current tick
+            idx = self.current % self.slots
+            if len(self.wheels[0][idx]) > 0:
+                bucket, self.wheels[0][idx] = self.wheels[0][idx], []
+                expired += [item for _, item in bucket]
+                self.size -= len(bucket)
+            self.current += 1
+
+        return expired
@@ -0,0 +1,40 @@
+#! /usr/bin/env python3
+
+import random
+import unittest
+
+from TimerWheel import TimerWheel
+class TestTimerWheel(unittest.TestCase):
+
+  def test_expiry(self):
+    wheel = TimerWheel(0.1, 0.0, slots=4, levels=2)
+    wheel.schedule(0.25, "a")
+    wheel.schedule(0.0, "b")
+    wheel.schedule(5.0, "c") # beyond the range of both levels
+    self.assertEqual(wheel.advance(0.05), ["b"])
+    self.assertEqual(wheel.advance(0.2), [])
+    self.assertEqual(wheel.advance(0.3), ["a"])
+    self.assertEqual(wheel.advance(4.95), [])
+    self.assertEqual(wheel.advance(5.0), ["c"])
+    self.assertEqual(len(wheel), 0)
+
+  def test_random(self):
+    # Compare against sorting deadlines, items must expire in the first advance past their (rounded) deadline
+    rnd = random.Random(1)
+    wheel = TimerWheel(1.0, 0.0, slots=8, levels=3)
+    deadlines = {}
+    now = 0
+    for step in range(3000):
+      for i in range(rnd.randint(0, 3)):
+        d = now + rnd.choice([rnd.randint(0, 10), rnd.randint(0, 1000)])
+        deadlines[(step, i)] = max(d, wheel.current) # Past deadlines expire with the next tick
+        wheel.schedule(d, (step, i))
+      now += rnd.randint(0, 3)
+      for item in wheel.advance(now):
+        self.assertLessEqual(deadlines.pop(item), now)
+      for item, d in deadlines.items():
+        self.assertGreater(d, now, f"item {item} did not expire")
+    self.assertEqual(len(wheel), len(deadlines))
+
+if __name__ == '__main__':
+    unittest.main()
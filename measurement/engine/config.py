@@ -16,6 +16,24 @@ Example: "vantagepoint:latest"
 """
 IMAGE_NAME = "vantagepoint:latest"
 
+"""
+How manager.py runs the engine of each vantage point:
+- "docker": in a privileged container of the engine image. The image is tagged with the content hash of the Dockerfile
+  and engine.py and only rebuilt if they changed.
+- "native": as a subprocess on the host (Linux, requires curl), without VPN support. Starts within seconds.
+
+Example: "native"
+"""
+EXECUTION_MODE = "docker"
+
+"""
+Native mode: directory of the venv to run the engine in, created with the packages in requirements.txt on the first run.
+None runs the engine with the interpreter of manager.py.
+
+Example: "venv"
+"""
+NATIVE_VENV = "venv"
+
 """
 Maximum number of subprocesses to use for running the vantage point containers
 
@@ -55,6 +73,7 @@ MAX_FAILS = 3
 
 """
 Wait policy used by the Status Tracker. Check StatusTracker.py for available policies.
+Query entries of a pattern may select their own policy with "wait_policy".
 
 Example: "wait_policy_if_online"
 """
@@ -62,6 +81,8 @@ WAIT_POLICY = "wait_policy_if_online"
 
 """
 Abort policy used by the Status Tracker. Check StatusTracker.py for available policies.
+Query entries of a pattern may select their own policy with "abort_policy" and set its parameters with "policy_params"
+(see DEFAULT_POLICY_PARAMS in StatusTracker.py), e.g. "abort_policy_timeout_rate" or "abort_policy_stable".
 
 Example: "abort_policy_n_timeout_no_success"
 """
@@ -72,4 +93,316 @@ Debug flag. If set to True, the engine will periodically check the status of the
 
 Example: False
 """
-DEBUG = False
\ No newline at end of file
+DEBUG = False
+
+"""
+Query engine used to send the queries. "resolver" creates a dnspython stub resolver (and thus a socket) per query,
+"mux" sends all queries over a small pool of long-lived UDP sockets shared by all workers.
+
+Example: "resolver"
+"""
+QUERY_ENGINE = "resolver"
+
+"""
+Number of UDP sockets shared by all queries if QUERY_ENGINE is "mux".
+
+Example: 16
+"""
+MUX_NUM_SOCKETS = 16
+
+"""
+Granularity in seconds at which query timeouts are enforced if QUERY_ENGINE is "mux".
+
+Example: 0.1
+"""
+MUX_TIMEOUT_RESOLUTION = 0.1
+
+"""
+Receive buffer size in bytes of each shared socket if QUERY_ENGINE is "mux". None keeps the system default.
+
+Example: 4194304
+"""
+MUX_RCVBUF = 4194304
+
+"""
+Kernel timestamps (Linux only, requires QUERY_ENGINE "mux"): if True, the kernel stamps each query when it leaves the
+network stack (SO_TIMESTAMPING) and its response when it arrives (SO_TIMESTAMPNS). Results record them as
+"timestamp_sent_kernel" and "timestamp_kernel" (same format as "timestamp") alongside the timestamps taken by the engine,
+which include the lag of the event loop. The analysis prefers them for RTTs.
+
+Example: True
+"""
+KERNEL_TIMESTAMPS = False
+
+"""
+Interval in seconds at which the engine writes its progress to the log file.
+
+Example: 10
+"""
+STATUS_INTERVAL = 10
+
+"""
+Interval in seconds at which the output file and the progress journal are flushed to disk.
+After a crash, the engine can be restarted with --resume and only repeats tasks completed within the last interval.
+
+Example: 10
+"""
+JOURNAL_FLUSH_INTERVAL = 10
+
+"""
+Maximum number of queries per second sent by the whole probe. None disables the limit.
+
+Example: 5000
+"""
+RATE_LIMIT_PROBE_QPS = None
+
+"""
+Maximum number of queries per second sent to a single target resolver (rr). None disables the limit.
+
+Example: 10
+"""
+RATE_LIMIT_RR_QPS = None
+
+"""
+Maximum number of queries per second the probe is expected to cause at a single authoritative nameserver.
+Each query is charged with the number of records its query task installed on the nameserver. None disables the limit.
+
+Example: 2000
+"""
+RATE_LIMIT_NS_QPS = None
+
+"""
+Burst size of the rate limits in seconds, i.e. a bucket holds RATE * RATE_LIMIT_BURST tokens.
+
+Example: 1.0
+"""
+RATE_LIMIT_BURST = 1.0
+
+"""
+Scheduling of query tasks onto the workers:
+- "worker": each worker runs one query task at a time and sleeps with it during waits.
+- "timerwheel": sleeping tasks are parked in a timer wheel, the workers only run tasks that are ready.
+  Allows many more tasks in progress than NUM_WORKERS, e.g. for measurements with long waits. Concurrent query entries
+  run in the background, the waits of their slots are parked in the timer wheel as well.
+
+Example: "worker"
+"""
+TASK_SCHEDULER = "worker"
+
+"""
+Order in which query tasks are started:
+- "file": in the order of the task file.
+- "lpt": longest estimated runtime first ((wait + timeout) * repeat + wait_after of the query entries), such that
+  long tasks (e.g. with a long wait_after) do not start last and keep the probe busy after all others finished.
+  Estimates are taken from the task index written by materialize.py (tasks of an index without estimates keep their
+  order), or computed while reading a task file without index.
+
+Example: "lpt"
+"""
+TASK_ORDER = "file"
+
+"""
+Number of consecutive tasks reordered at once with TASK_ORDER "lpt", None reorders all tasks of the task file.
+Without a task index, this many tasks are buffered in memory.
+
+Example: 10000
+"""
+TASK_ORDER_LOOKAHEAD = 10000
+
+"""
+Maximum number of query tasks in progress at once with TASK_SCHEDULER "timerwheel".
+
+Example: 100000
+"""
+MAX_LIVE_TASKS = 100000
+
+"""
+Tick of the timer wheel in seconds, i.e. the precision of waits with TASK_SCHEDULER "timerwheel".
+
+Example: 0.01
+"""
+TIMER_WHEEL_TICK = 0.01
+
+"""
+Format of the query results written by the engine:
+- 1: all values as strings, as parsed from the presentation format of the response.
+- 2: compact records with numeric TTL, type, flags and rcode, answers as raw rdata in hex.
+     Query task results carry "schema": 2, the analysis reads both formats.
+
+Example: 1
+"""
+RESULT_SCHEMA = 1
+
+"""
+Format of the timestamps of sent and received queries:
+- "datetime": wall clock time as string, e.g. "2024-01-01 12:00:00.123456".
+- "monotonic": integer nanoseconds of the monotonic clock, relative to the wall clock anchor in the header record
+  at the start of the output file. Unaffected by NTP steps during long runs, the analysis reads both formats.
+
+Example: "datetime"
+"""
+TIMESTAMP_FORMAT = "datetime"
+
+"""
+Format of the output file:
+- "full": every result contains the full configuration of its query task (queries and nameservers).
+- "normalized": the configuration of the first query task of a pattern is written once in a header record,
+  results only reference it by ID and contain the differences (e.g. resolver, vantage point, encoded labels).
+  Combine.py restores the full results.
+
+Example: "full"
+"""
+OUTPUT_FORMAT = "full"
+
+"""
+Compression of the output file: None, "gzip" or "zstd" (requires the zstandard package).
+Output is compressed in independent members, written at least every JOURNAL_FLUSH_INTERVAL seconds, such that
+partial files stay readable. The file name is unchanged, readers in common/jsonline.py detect the compression.
+
+Example: "gzip"
+"""
+OUTPUT_COMPRESSION = None
+
+"""
+Number of engine processes per vantage point. With more than one, the task file is dealt round robin to the processes,
+each runs its own event loop with NUM_WORKERS workers and writes its own output, which are merged at the end.
+Rate limits are split evenly between the processes. Resuming requires the same number of processes.
+
+Example: 4
+"""
+ENGINE_PROCESSES = 1
+
+"""
+Port of the live metrics endpoint (Prometheus text format at http://<addr>:<port>/metrics), None disables it.
+Requires the prometheus_client package. Engine process i (see ENGINE_PROCESSES) serves on METRICS_PORT + i.
+manager.py publishes the ports of vantage point v on the host at METRICS_PORT + v * ENGINE_PROCESSES + i.
+
+Example: 9100
+"""
+METRICS_PORT = None
+
+"""
+Address the metrics endpoint binds to within the container, where the ports are published on 127.0.0.1 of the host only.
+With EXECUTION_MODE "native", manager.py binds the engines to 127.0.0.1 instead.
+
+Example: "0.0.0.0"
+"""
+METRICS_ADDR = "0.0.0.0"
+
+"""
+Adaptive timeouts: if True, the engine keeps a smoothed RTT estimate per resolver (SRTT / RTTVAR as in RFC 6298) across
+all query tasks and a query times out at SRTT + 4 * RTTVAR instead of the timeout of its query entry, which remains the
+upper bound. Each timeout doubles the deadline of the resolver until it answers again. Results carry the deadline in
+seconds ("deadline"). Engine processes (see ENGINE_PROCESSES) keep separate estimates.
+
+Example: True
+"""
+ADAPTIVE_TIMEOUT = False
+
+"""
+Adaptive timeouts: lower bound of the deadline in seconds.
+
+Example: 1.0
+"""
+ADAPTIVE_TIMEOUT_MIN = 1.0
+
+"""
+Adaptive timeouts: number of answers from a resolver before its deadline is adapted, until then the timeout of the
+query entry applies.
+
+Example: 3
+"""
+ADAPTIVE_TIMEOUT_SAMPLES = 3
+
+"""
+Seconds a resolver is considered offline once the abort policy aborted a query entry because the resolver never
+responded (abort_policy_n_timeout_no_success), None disables it. Within this time, query entries of other query tasks
+for the same resolver are not run, their result is a single response with status SKIPPED_OFFLINE.
+Engine processes (see ENGINE_PROCESSES) keep separate registries.
+
+Example: 600
+"""
+OFFLINE_TTL = None
+
+"""
+Concurrency control: if True, the number of queries in flight is adapted to the capacity of the probe (AIMD).
+Every AIMD_INTERVAL seconds, the window is cut by AIMD_DECREASE if the timeout rate rose by more than
+AIMD_TIMEOUT_MARGIN above its baseline or the mean RTT exceeds AIMD_RTT_INFLATION times its baseline, otherwise it
+grows (doubling until the first cut, then by AIMD_INCREASE). NUM_WORKERS remains the upper bound of concurrent tasks.
+Changes of the window are logged into the output as header records {"header": {"window": {...}}}.
+
+Example: True
+"""
+CONCURRENCY_CONTROL = False
+
+"""
+Concurrency control: bounds of the window of queries in flight, the window starts at the lower bound.
+Engine processes (see ENGINE_PROCESSES) share the bounds evenly.
+
+Example: 10, 1000
+"""
+AIMD_MIN_WINDOW = 10
+AIMD_MAX_WINDOW = 1000
+
+"""
+Concurrency control: additive increase of the window per interval, and multiplicative decrease on congestion.
+
+Example: 10, 0.5
+"""
+AIMD_INCREASE = 10
+AIMD_DECREASE = 0.5
+
+"""
+Concurrency control: interval in seconds at which the window is adapted.
+
+Example: 1.0
+"""
+AIMD_INTERVAL = 1.0
+
+"""
+Concurrency control: congestion thresholds, the increase of the timeout rate over its baseline (absolute)
+and the factor by which the mean RTT may exceed its baseline.
+
+Example: 0.1, 2.0
+"""
+AIMD_TIMEOUT_MARGIN = 0.1
+AIMD_RTT_INFLATION = 2.0
+
+"""
+Benchmark mode (engine.py --bench): number of synthetic query tasks per run. Each task is a single A query
+with a random label, sent to a fake resolver on localhost.
+
+Example: 10000
+"""
+BENCH_TASKS = 10000
+
+"""
+Benchmark mode: numbers of workers (NUM_WORKERS) to run the benchmark tasks with, one run each.
+
+Example: [10, 100, 1000]
+"""
+BENCH_CONCURRENCY = [10, 100, 1000]
+
+"""
+Benchmark mode: UDP port of the fake resolver on 127.0.0.1.
+
+Example: 5353
+"""
+BENCH_PORT = 5353
+
+"""
+Benchmark mode: timeout in seconds of the benchmark queries, i.e. the cost of a dropped query.
+
+Example: 1
+"""
+BENCH_TIMEOUT = 1
+
+"""
+Benchmark mode: behaviour of the fake resolver (see FakeResolver.py).
+- latency: distribution of the response latency, "none", "fixed", "uniform" or "exponential"
+- latency_mean: mean latency in seconds
+- nxdomain, servfail, drop: probability of answering NXDOMAIN or SERVFAIL, or of not answering at all
+
+Example: {"latency": "exponential", "latency_mean": 0.02, "nxdomain": 0.1, "servfail": 0.01, "drop": 0.001}
+"""
+BENCH_RESOLVER = {"latency": "exponential", "latency_mean": 0.01, "nxdomain": 0.1, "servfail": 0.01, "drop": 0.0}
@@ -7,37 +7,120 @@ import subprocess
 import json
 import time
 import subprocess
+import multiprocessing
 import time
 import datetime
 import string
 import random
+import resource
+import tempfile
 import dns.resolver
 import dns.asyncresolver
+import dns.message
 from StatusTracker import StatusTracker
+from QueryMux import QueryMux, QueryTemplate
+from Journal import Journal
+from Metrics import Metrics
+from CompressedWriter import CompressedWriter
+from ConcurrencyController import ConcurrencyController
+from Normalizer import Normalizer
+from TimerWheel import TimerWheel
+from OfflineRegistry import OfflineRegistry
+from RttEstimator import RttEstimator
+from Pacer import Pacer
+from TaskIndex import INDEX_SUFFIX, TaskReader, estimate_runtime, load_index, lpt_order
+from FakeResolver import run_fake_resolver
+from FileConcat import append_file
+from RateLimiter import RateLimiter, expected_ns_queries
 import config as c
 
 
+""" Current time as written to the results: a datetime string, or with TIMESTAMP_FORMAT "monotonic" the nanoseconds
+since the anchor of the output file (see write_header)"""
+def timestamp():
+  if ANCHOR_NS is None:
+    return str(datetime.datetime.now())
+  return time.monotonic_ns() - ANCHOR_NS
+
+""" Convert a kernel timestamp (wall clock ns, see KERNEL_TIMESTAMPS) into the format of timestamp()"""
+def kernel_timestamp(ns:int):
+  if ANCHOR_NS is None:
+    return str(datetime.datetime.fromtimestamp(ns // 10**9) + datetime.timedelta(microseconds=ns % 10**9 // 1000))
+  return ns - time.time_ns() + time.monotonic_ns() - ANCHOR_NS
+
 """ Parse an Answer object from the DNS stub resolver """
 def parse_answer(ans:dns.resolver.Answer, ts_sent) -> dict:
+  ts_recv = timestamp()
+  name = ans.qname.to_text(omit_final_dot=True)
+  return answer_record(name, ans.rdtype, str(ans.nameserver), ans.response, ans.rrset, ts_sent, ts_recv)
+
+
+""" Parse a response message received over the QueryMux into the same format as parse_answer """
+def parse_response(response:dns.message.Message, name, qt, ts_sent, ts_recv) -> dict:
+  rcode = response.rcode()
+  if rcode == dns.rcode.NXDOMAIN:
+    return error_record(name, qt, "NXDOMAIN", ts_sent, ts_recv, rcode)
+  if rcode != dns.rcode.NOERROR: # the stub reports any other rcode as SRVFAIL
+    return error_record(name, qt, "SRVFAIL", ts_sent, ts_recv, rcode)
+
+  # Follow CNAMEs like the stub does, NOERROR without an answer for the (canonical) name is NOANSWER
+  rrset = response.resolve_chaining().answer
+  if rrset is None:
+    return error_record(name, qt, "NOANSWER", ts_sent, ts_recv, rcode)
+
+  return answer_record(name, response.question[0].rdtype, qt['rr'], response, rrset, ts_sent, ts_recv)
+
+""" Compose the result of a query that returned an answer, values are taken directly from the rdata objects.
+With RESULT_SCHEMA 2, TTL, type, flags and rcode are numeric and answers are the raw rdata in hex"""
+def answer_record(name, rdtype, resolver, response:dns.message.Message, rrset, ts_sent, ts_recv) -> dict:
+  if c.RESULT_SCHEMA == 2:
+    return {
+      "name": name,
+      "type": rdtype,
+      "resolver": resolver,
+      "flags": response.flags,
+      "data": [{"ttl": rrset.ttl, "type": rrset.rdtype, "answer": rd.to_wire().hex()} for rd in rrset],
+      "status": "NOERROR",
+      "rcode": response.rcode(),
+      "timestamp": ts_recv,
+      "timestamp_sent": ts_sent,
+    }
+
+  # Same strings as the presentation format of the rrset (name, ttl, class, type, first token of the answer)
+  owner = rrset.name.to_text()
+  ttl = str(rrset.ttl)
+  rdclass = dns.rdataclass.to_text(rrset.rdclass)
+  rrtype = dns.rdatatype.to_text(rrset.rdtype)
   return {
-    "class": dns.rdataclass.to_text(ans.rdclass),
-    "name": str(ans.qname)[0:-1],
-    "type": dns.rdatatype.to_text(ans.rdtype),
-    "resolver": str(ans.nameserver),
+    "class": "IN",
+    "name": name,
+    "type": dns.rdatatype.to_text(rdtype),
+    "resolver": resolver,
     "protocol": "udp", # the resolver uses udp only by default
-    "flags": dns.flags.to_text(ans.response.flags).split(' '),
+    "flags": dns.flags.to_text(response.flags).split(' '),
     "data": [{
-      "name":   a.split(' ')[0],
-      "ttl":    a.split(' ')[1],
-      "class":  a.split(' ')[2],
-      "type":   a.split(' ')[3],
-      "answer": a.split(' ')[4],
-    } for a in ans.rrset.to_text().split('\n')],
-    "status": dns.rcode.to_text(ans.response.rcode()),
-    "timestamp": str(datetime.datetime.now()),
-    "timestamp_sent": str(ts_sent),
+      "name":   owner,
+      "ttl":    ttl,
+      "class":  rdclass,
+      "type":   rrtype,
+      "answer": rd.to_text().split(' ', 1)[0],
+    } for rd in rrset],
+    "status": dns.rcode.to_text(response.rcode()),
+    "timestamp": ts_recv,
+    "timestamp_sent": ts_sent,
   }
 
+""" Compose the result of a query that did not return an answer (e.g. NXDOMAIN or TIMEOUT).
+The rcode of the response, if any, is only recorded with RESULT_SCHEMA 2"""
+def error_record(name, qt, status, ts_sent, ts_recv=None, rcode=None) -> dict:
+  if ts_recv is None:
+    ts_recv = timestamp()
+  if c.RESULT_SCHEMA == 2:
+    return {"name": name, "type": dns.rdatatype.from_text(qt['type']), "resolver": qt['rr'],
+      "status": status, "rcode": rcode, "timestamp": ts_recv, "timestamp_sent": ts_sent}
+  return {"name": name,"type": qt['type'],"resolver": qt['rr'],"protocol": "udp",
+    "status": status, "timestamp": ts_recv, "timestamp_sent": ts_sent}
+
 
 """ Return the static QNAME of the querytask, or if required, a randomly generated subdomain"""
 def get_query_domain(qt) -> str:
@@ -56,98 +139,310 @@ async def resolve_single(stub, qt, TIMEOUT):
 
   # Resolve 
   try:
-    ts_sent = datetime.datetime.now()
+    ts_sent = timestamp()
     ans = await stub.resolve(name, qt['type'], tcp=False, raise_on_no_answer=True, lifetime=TIMEOUT)
     return parse_answer(ans, ts_sent)
   
   # Resolver returned NXDOMAIN
   except dns.resolver.NXDOMAIN:
-    return {"name": name,"type": qt['type'],"resolver": qt['rr'],"protocol": "udp",
-      "status": "NXDOMAIN", "timestamp": str(datetime.datetime.now()), "timestamp_sent": str(ts_sent)}
+    return error_record(name, qt, "NXDOMAIN", ts_sent, rcode=dns.rcode.NXDOMAIN)
   
   # Query timed out
   except dns.resolver.LifetimeTimeout:
-    return {"name": name,"type": qt['type'],"resolver": qt['rr'],"protocol": "udp",
-      "status": "TIMEOUT", "timestamp": str(datetime.datetime.now()), "timestamp_sent": str(ts_sent)}
+    return error_record(name, qt, "TIMEOUT", ts_sent)
   
   # Resolver returns NOERROR but does not provide an answer
   except dns.resolver.NoAnswer:
-    return {"name": name,"type": qt['type'],"resolver": qt['rr'],"protocol": "udp",
-      "status": "NOANSWER", "timestamp": str(datetime.datetime.now()), "timestamp_sent": str(ts_sent)}
+    return error_record(name, qt, "NOANSWER", ts_sent, rcode=dns.rcode.NOERROR)
   
   # Resolver returned SRVFAIL
   except dns.resolver.NoNameservers:
-    return {"name": name,"type": qt['type'],"resolver": qt['rr'],"protocol": "udp",
-      "status": "SRVFAIL", "timestamp": str(datetime.datetime.now()), "timestamp_sent": str(ts_sent)}
+    return error_record(name, qt, "SRVFAIL", ts_sent)
 
 
-""" Run one querytask / measurement """
-async def run_querytask(querytask:dict) -> list:
-  assert('queries' in querytask.keys())
+""" Issue a single query over the shared sockets of the QueryMux instead of a per-query stub resolver.
+The query is sent from the precompiled template of the query entry, only the random subdomain and ID are patched.
+With KERNEL_TIMESTAMPS, the kernel timestamps of the query are recorded alongside the timestamps of the engine"""
+async def resolve_single_mux(mux:QueryMux, template:QueryTemplate, qt, TIMEOUT):
+  # Generate random subdomain if necessary
+  name = template.fill()
+
+  wire, ts_sent, ts_recv, kts_sent, kts_recv = await mux.query_wire(qt['rr'], template.wire, TIMEOUT)
+
+  # Query timed out
+  if wire is None:
+    res = error_record(name, qt, "TIMEOUT", ts_sent)
+  else:
+    try:
+      response = dns.message.from_wire(wire)
+    except dns.exception.DNSException: # Malformed responses are discarded by the stub as well
+      response = None
+    if response is None:
+      res = error_record(name, qt, "SRVFAIL", ts_sent, ts_recv)
+    else:
+      res = parse_response(response, name, qt, ts_sent, ts_recv)
+
+  if kts_sent is not None:
+    res['timestamp_sent_kernel'] = kts_sent
+  if kts_recv is not None:
+    res['timestamp_kernel'] = kts_recv
+  return res
+
+
+""" Await a query with an adaptive deadline, update the RTT estimate of its resolver and record the deadline"""
+async def resolve_adaptive(query, resolver:str, deadline:float) -> dict:
+  t_sent = time.monotonic()
+  res = await query
+  if res['status'] == "TIMEOUT":
+    RTT.timeout(resolver)
+  else:
+    RTT.sample(resolver, time.monotonic() - t_sent)
+  res['deadline'] = round(deadline, 3)
+  return res
+
+""" Await a query that holds a slot of the concurrency controller, release it with the result and RTT"""
+async def resolve_controlled(query, epoch:int) -> dict:
+  t_sent = time.monotonic()
+  res = None
+  try:
+    res = await query
+    return res
+  finally:
+    CONTROL.release(res, time.monotonic() - t_sent, epoch)
+
+""" Issue a single query of the query entry, either over the QueryMux or with the stub resolver.
+With the QueryMux, stub is the query template of the entry (see create_template).
+If rate limiting is enabled, wait for the probe, resolver and nameserver (ns_costs) token buckets first.
+With adaptive timeouts, the query times out at the deadline estimated for its resolver instead of its timeout.
+With concurrency control, the query waits for a slot in the window of queries in flight."""
+async def resolve(stub, qt, ns_costs:dict=None):
+  if LIMITER is not None:
+    await LIMITER.acquire(qt['rr'], ns_costs)
+  if CONTROL is not None:
+    epoch = await CONTROL.acquire()
+  timeout = float(qt['timeout'])
+  if RTT is not None:
+    timeout = RTT.deadline(qt['rr'], timeout)
+  if MUX is not None:
+    query = resolve_single_mux(MUX, stub, qt, timeout)
+  else:
+    query = resolve_single(stub, qt, timeout)
+  if RTT is not None:
+    query = resolve_adaptive(query, qt['rr'], timeout)
+  if CONTROL is not None:
+    query = resolve_controlled(query, epoch)
+  if METRICS is None:
+    return await query
+
+  t_sent = METRICS.query_sent()
+  res = None
+  try:
+    res = await query
+  finally:
+    METRICS.query_done(t_sent, res)
+  return res
+
+""" Issue the repeated queries of a query entry concurrently with at most 'parallelism' queries in flight (0 means all at once).
+Each parallel slot follows the wait policy before issuing its next query, an abort cancels all outstanding queries."""
+async def run_concurrent(stub, qt, tracker:StatusTracker, ns_costs:dict=None) -> list:
+  repeat = int(qt['repeat'])
+  parallelism = int(qt.get('parallelism', 0))
+  if parallelism <= 0 or parallelism > repeat:
+    parallelism = repeat
 
   results = []
+  remaining = repeat
+  slots = []
+  sleep = asyncio.sleep if WHEEL is None else wheel_sleep # Waits of the slots are parked in the timer wheel
 
-  for qt in querytask['queries']:
+  async def slot():
+    nonlocal remaining
+    pacer = Pacer()
+    while remaining > 0:
+      remaining -= 1
+      res = await resolve(stub, qt, ns_costs)
 
-    assert qt['vp'] == LOCALHOST, f"FATAL: Query task for vantage point {qt['vp']} is being run on {LOCALHOST}"
+      if tracker.should_abort(res): # Check whether to abort, cancel all other slots
+        if METRICS is not None:
+          METRICS.abort(tracker.abort_policy_name)
+        if OFFLINE is not None and tracker.offline:
+          OFFLINE.mark(qt['rr'])
+        remaining = 0
+        for s in slots:
+          if s is not asyncio.current_task():
+            s.cancel()
+        return
 
-    if qt['concurrent']:
-      # Run asynchronously
-      assert False, "Concurrent execution not tested"
-      results = asyncio.run(run_async(qt, TIMEOUT))
-      num_queries_sent = len(results)
-      
-    else:
-      # Create and configure stub resolver
-      stub = dns.asyncresolver.Resolver()
-      stub.nameservers = [qt['rr']]
-      stub.cache = None
-      stub.retry_servfail = False # whether to retry on SRVFAIL
-      stub.timeout = int(qt['timeout']) # seconds to wait on server
-      stub.lifetime = int(qt['timeout']) # seconds for stub to try
-      stub.use_search_by_default = False # make sure stub does not use system resolver
-
-      if not qt['recursion_desired']:
-        # default is None, which uses Message constructor default, which is only RD, QR bit needs to be 0 (query)
-        stub.flags = 0
-        #stub.flags ^= dns.flags.RD # flip recursion desired bit
-
-      # Perform timed queries
-      num_queries_sent = 0
-        
-      tracker = StatusTracker(qt, c.MAX_FAILS, c.WAIT_POLICY, c.ABORT_POLICY)
-
-      for _ in range(int(qt['repeat'])):
+      # Save result, in the order responses were received
+      results.append(res)
+
+      if tracker.should_stop(): # Stopping rule met, queries in flight of the other slots are completed
+        remaining = 0
+        return
+
+      if remaining > 0 and tracker.should_wait(res): # Check whether to wait
+        await sleep(pacer.delay(float(qt['wait'])))
+        pacer.resumed()
+
+  slots += [asyncio.create_task(slot()) for _ in range(parallelism)]
+  await asyncio.gather(*slots, return_exceptions=True)
+  return results
+
+""" Create the StatusTracker of a query entry. The entry may select its own policies and their parameters in the pattern
+("wait_policy", "abort_policy", "policy_params"), otherwise the policies of the engine config apply"""
+def create_tracker(qt) -> StatusTracker:
+  return StatusTracker(qt, c.MAX_FAILS, qt.get('wait_policy', c.WAIT_POLICY), qt.get('abort_policy', c.ABORT_POLICY),
+    qt.get('policy_params'))
+
+""" Create and configure a stub resolver for the queries of a single query entry"""
+def create_stub(qt) -> dns.asyncresolver.Resolver:
+  stub = dns.asyncresolver.Resolver()
+  stub.nameservers = [qt['rr']]
+  stub.cache = None
+  stub.retry_servfail = False # whether to retry on SRVFAIL
+  stub.timeout = float(qt['timeout']) # seconds to wait on server
+  stub.lifetime = float(qt['timeout']) # seconds for stub to try
+  stub.use_search_by_default = False # make sure stub does not use system resolver
+  stub.port = DNS_PORT
+
+  if not qt['recursion_desired']:
+    # default is None, which uses Message constructor default, which is only RD, QR bit needs to be 0 (query)
+    stub.flags = 0
+    #stub.flags ^= dns.flags.RD # flip recursion desired bit
+  return stub
+
+""" Compile the query of a single query entry into a wire template for the QueryMux"""
+def create_template(qt) -> QueryTemplate:
+  # RD is the only flag set by the stub, unless recursion is explicitly not desired
+  flags = dns.flags.RD if qt['recursion_desired'] else 0
+  return QueryTemplate(qt['query'], dns.rdatatype.from_text(qt['type']), flags, qt['random_subdomains'])
+
+""" Sleep in the timer wheel of the "timerwheel" scheduler instead of a timer of the event loop"""
+async def wheel_sleep(delay:float):
+  if delay <= 0:
+    return await asyncio.sleep(0)
+  loop = asyncio.get_running_loop()
+  wake = loop.create_future()
+  WHEEL.schedule(loop.time() + delay, wake)
+  await wake
+
+""" Resumable execution state of one query task / measurement.
+Each call to step() issues the next query (or all queries of a concurrent query entry) and returns the number of
+seconds to sleep before the next step, or None once the task is finished. The caller decides how to sleep, the
+returned durations are compensated for the lateness of previous sleeps (see Pacer).
+With the "timerwheel" scheduler, a concurrent query entry runs in the background and step() returns its future instead,
+the task is continued once the entry finished."""
+class QueryTaskRun:
+
+  def __init__(self, querytask:dict, task_id:int=None):
+    assert('queries' in querytask.keys())
+
+    self.querytask = querytask
+    self.task_id = task_id
+    self.results = []
+
+    # Expected load on the nameservers per query, used for rate limiting
+    self.ns_costs = expected_ns_queries(querytask) if LIMITER is not None else None
+
+    self.entry = 0        # Index of the current query entry
+    self.stub = None      # Stub resolver (or QueryMux template) of the current query entry
+    self.tracker = None   # StatusTracker of the current query entry, None if the entry has not been started
+    self.num_sent = 0     # Number of queries sent for the current query entry
+    self.entry_done = False
+    self.pacer = Pacer()  # Waits of the task
+    self.concurrent = None  # Future of the concurrent query entry running in the background
+
+  """ Run the task until it has to sleep. Returns the sleep duration in seconds or None if the task is finished"""
+  async def step(self):
+    self.pacer.resumed()
+    queries = self.querytask['queries']
+    while self.entry < len(queries):
+      qt = queries[self.entry]
+
+      if self.tracker is None: # Start query entry
+        assert qt['vp'] == LOCALHOST, f"FATAL: Query task for vantage point {qt['vp']} is being run on {LOCALHOST}"
+
+        # Skip query entries for resolvers that were recently declared offline by another query entry
+        if OFFLINE is not None and OFFLINE.is_offline(qt['rr']):
+          ts = timestamp()
+          self.results.append(error_record(qt['query'], qt, "SKIPPED_OFFLINE", ts, ts))
+          if METRICS is not None:
+            METRICS.responses.labels(status="SKIPPED_OFFLINE").inc()
+          self.entry += 1
+          continue
+
+        # Create and configure stub resolver, or compile the query once if queries share the sockets of the QueryMux
+        self.stub = create_stub(qt) if MUX is None else create_template(qt)
+        self.tracker = create_tracker(qt)
+        self.num_sent = 0
+        self.entry_done = False
+
+      if not self.entry_done:
+        if qt['concurrent']:
+          # Run repeated queries in parallel, in the background if the caller continues with other tasks meanwhile
+          if WHEEL is not None and self.concurrent is None:
+            self.concurrent = asyncio.ensure_future(run_concurrent(self.stub, qt, self.tracker, self.ns_costs))
+            return self.concurrent
+          if self.concurrent is not None:
+            self.results += self.concurrent.result()
+            self.concurrent = None
+          else:
+            self.results += await run_concurrent(self.stub, qt, self.tracker, self.ns_costs)
+          self.entry_done = True
+          continue
 
         # Resolve single query
-        res = await resolve_single(stub, qt, int(qt['timeout']))
+        res = await resolve(self.stub, qt, self.ns_costs)
+        self.num_sent += 1
 
         # TODO: assert timedelta between sent and received is more than sleep
-        
-        if tracker.should_abort(res): # Check whether to abort
-          break
 
-        if tracker.should_wait(res): # Check whether to wait
-          await asyncio.sleep(int(qt['wait']))
-        
-        # Save result
-        results.append(res)
-        num_queries_sent += 1 # TODO: obsolete?
-      
-      if int(qt['wait_after']) > 0:
-        await asyncio.sleep(int(qt['wait_after']))
+        if self.tracker.should_abort(res): # Check whether to abort
+          if METRICS is not None:
+            METRICS.abort(self.tracker.abort_policy_name)
+          if OFFLINE is not None and self.tracker.offline:
+            OFFLINE.mark(qt['rr'])
+          self.entry_done = True
+          continue
+
+        # Save result, a stopping rule ends the entry with it
+        self.results.append(res)
+        self.entry_done = self.num_sent >= int(qt['repeat']) or self.tracker.should_stop()
+
+        if self.tracker.should_wait(res) and float(qt['wait']) > 0: # Check whether to wait
+          return self.pacer.delay(float(qt['wait']))
+        continue
 
+      # Query entry finished, continue with the next one
+      self.entry += 1
+      self.tracker = None
+      self.stub = None
+      if float(qt['wait_after']) > 0:
+        return self.pacer.delay(float(qt['wait_after']))
 
+    return None
 
-    # Compile full task results
+  """ Compile full task results"""
+  def result(self) -> dict:
     task_results = {
-      "pattern": querytask['pattern'],
-      "queries": querytask['queries'],
-      "nameservers": querytask['nameservers'],
-      "responses": results,
+      "pattern": self.querytask['pattern'],
+      "queries": self.querytask['queries'],
+      "nameservers": self.querytask['nameservers'],
+      "responses": self.results,
     }
-    
-  return task_results
+    if c.RESULT_SCHEMA != 1: # Results without schema version are in the original format
+      task_results["schema"] = c.RESULT_SCHEMA
+    return task_results
+
+""" Run one querytask / measurement """
+async def run_querytask(querytask:dict) -> dict:
+  run = QueryTaskRun(querytask)
+  while True:
+    delay = await run.step()
+    if delay is None:
+      break
+    await asyncio.sleep(delay)
+  return run.result()
 
 """ Get the public IP of the container using an EchoIP service"""
 def get_public_ip() -> str:
@@ -181,11 +476,12 @@ def check_public_ip(public_ip: str) -> None:
     print(f"VPN for vantage point {public_ip} does not seem to work..")
     exit(1)
 
-""" Takes a filename with a three letter prefix followed by an IP with dashes instead of dots (i.e. 1-2-3-4).
+""" Takes a filename with a three letter prefix followed by an IP with dashes instead of dots (i.e. 1-2-3-4),
+optionally followed by a suffix starting with a dot (i.e. .p0 for the files of engine process 0).
 Returns the IP address (i.e. 1.2.3.4)
 """
 def fn_to_ip(fn:str) -> str:
-  octets = fn[3:].split("-")
+  octets = fn[3:].split(".")[0].split("-")
   assert len(octets) == 4, f"Filename of file '{fn}' is not of the expect form."
   return ".".join(octets)
 
@@ -196,6 +492,15 @@ def ip_to_fn(pre:str, ip:str) -> str:
   assert len(octets) == 4, f"IP address {ip} must contain 4 octets"
   return pre+"-".join(octets)
 
+""" Filename of a file of this vantage point, with a suffix for the engine process if the task file is sharded"""
+def local_fn(pre:str, shard:tuple=None) -> str:
+  fn = ip_to_fn(pre, LOCALHOST)
+  return fn if shard is None else f"{fn}.p{shard[0]}"
+
+""" Returns True if the task belongs to the shard (index, count) of this engine process, tasks are dealt round robin"""
+def in_shard(task_id:int, shard:tuple=None) -> bool:
+  return shard is None or task_id % shard[1] == shard[0]
+
 """ Check if all workers are still running, if not, exit with error"""
 def check_workers(workers:list, log_writer) -> None:
   for w in workers:
@@ -217,146 +522,449 @@ def check_workers(workers:list, log_writer) -> None:
       continue
 
 """ Print status to log file"""
-def print_status(t_start, tasks_done, num_tasks, log_writer):
+def print_status(t_start, tasks_done, num_tasks, log_writer, rate_now=None, tasks_resumed=0):
   time_since_start = time.time() - t_start
-  rate = tasks_done / (time_since_start)
+  rate = (tasks_done - tasks_resumed) / (time_since_start)
   if rate > 0:
     time_left = (num_tasks - tasks_done) / rate
   else:
     time_left = 0
   time_format = lambda x: time.strftime('%H:%M:%S', time.gmtime(x))
-  status = f"{time_format(time_since_start)}: {tasks_done} out of {num_tasks}, {tasks_done / num_tasks * 100} % done, left: {time_format(time_left)}\n"
-  log_writer.write(status)
+  status = f"{time_format(time_since_start)}: {tasks_done} out of {num_tasks}, {tasks_done / num_tasks * 100} % done, left: {time_format(time_left)}"
+  if rate_now is not None:
+    status += f", {rate_now:.2f} tasks/s"
+  log_writer.write(status + "\n")
   log_writer.flush()
 
 """ Coroutine worker that repeatedly takes a query task from the queue and runs it"""
 async def querytask_worker(task_queue:asyncio.Queue, result_queue:asyncio.Queue):
   while True:
-    task = await task_queue.get()
+    task_id, task = await task_queue.get()
 
     # Process task
     result = await run_querytask(task)
 
-    await result_queue.put(result)
+    await result_queue.put((task_id, result))
     # Confirm task is done
     task_queue.task_done()
 
+""" Coroutine that admits query tasks from the queue as live runs, at most max_live tasks are in progress at once"""
+async def task_admitter(task_queue:asyncio.Queue, ready_queue:asyncio.Queue, live:asyncio.Semaphore):
+  while True:
+    await live.acquire()
+    task_id, task = await task_queue.get()
+    ready_queue.put_nowait(QueryTaskRun(task, task_id))
 
-""" Coroutine manager that puts all query tasks in a queue and runs them concurrently"""
-async def execute_tasks(task_file:str, outfile:str):
-  
-  task_queue = asyncio.Queue(maxsize=2*c.NUM_WORKERS)
-  result_queue = asyncio.Queue(maxsize=2*c.NUM_WORKERS)
-  tasks_issued = 0
-  tasks_done = 0
+""" Coroutine worker that runs one step of a ready query task at a time.
+Instead of sleeping, the task is parked in the timer wheel and the worker continues with the next ready task."""
+async def step_worker(ready_queue:asyncio.Queue, wheel:TimerWheel, task_queue:asyncio.Queue, result_queue:asyncio.Queue, live:asyncio.Semaphore):
+  loop = asyncio.get_running_loop()
+  while True:
+    run = await ready_queue.get()
 
-  # Count tasks beforehand, used to terminate loop
-  num_tasks = 0
-  with open(f"{c.QUERY_TASK_DIR}/{args.infile}", 'r') as f:
-    while True:
-      line = f.readline()
-      if line == "\n": # empty line
-        continue
-      if line == "": # end of file
-        break
-      num_tasks += 1
-  
-  
-  log_file = ip_to_fn('log', LOCALHOST) 
-  log_writer = open(f"{c.QUERY_TASK_DIR}/{log_file}", "w")
-  out_writer = open(f"{c.QUERY_TASK_DIR}/{outfile}", "w")
-  task_reader = open(f"{c.QUERY_TASK_DIR}/{task_file}", "r")
+    delay = await run.step()
 
-  
-  while True: # Fill queue initially
-    if not task_queue.full(): # Check for space before reading task from file
-      line = task_reader.readline()
-      if line == "\n": # empty line
-        continue
-      if line == "": # end of file
-        break
-      qt = json.loads(line)
-      
-      try: # Put new task in queue
-        task_queue.put_nowait(qt)
-        tasks_issued += 1
-        # Go to top of loop
-      except asyncio.QueueFull: # Should never happen
-        log_writer.write(f"Something is messed up with queuing\n")
-        exit(1)
+    if delay is None: # Task finished
+      await result_queue.put((run.task_id, run.result()))
+      live.release()
+      task_queue.task_done()
+    elif isinstance(delay, asyncio.Future): # Concurrent query entry in the background, ready once it finished
+      delay.add_done_callback(lambda _, run=run: ready_queue.put_nowait(run))
+    else:
+      wheel.schedule(loop.time() + delay, run)
+
+""" Coroutine that advances the timer wheel every tick and hands expired tasks back to the workers.
+Expired waits of concurrent query entries (see wheel_sleep) are woken up, unless they were cancelled meanwhile"""
+async def wheel_ticker(wheel:TimerWheel, ready_queue:asyncio.Queue):
+  loop = asyncio.get_running_loop()
+  while True:
+    await asyncio.sleep(wheel.tick)
+    for item in wheel.advance(loop.time()):
+      if isinstance(item, asyncio.Future):
+        if not item.done():
+          item.set_result(None)
+      else:
+        ready_queue.put_nowait(item)
+
+""" Coroutine producer that reads query tasks from the task file into the queue, blocks while the queue is full.
+Tasks are identified by their index in the task file, tasks completed according to the journal or belonging to
+another engine process are skipped. With TASK_ORDER "lpt", tasks are buffered in windows of TASK_ORDER_LOOKAHEAD tasks
+(the whole file if None) and each window is issued longest estimated runtime first."""
+async def task_producer(task_reader, task_queue:asyncio.Queue, journal:Journal, progress:dict, shard:tuple=None):
+  buffer = {} # Dict of task ID -> task not yet issued, with TASK_ORDER "lpt"
+
+  async def issue():
+    runtimes = {task_id: estimate_runtime(task) for task_id, task in buffer.items()}
+    for task_id in lpt_order(list(buffer.keys()), runtimes):
+      await task_queue.put((task_id, buffer[task_id]))
+      progress['tasks_issued'] += 1
+    buffer.clear()
 
-    else: # Task queue full
+  task_id = -1
+  while True:
+    line = task_reader.readline()
+    if line == "\n": # empty line
+      continue
+    if line == "": # end of file
       break
+    task_id += 1
+    if not in_shard(task_id, shard) or journal.is_completed(task_id):
+      continue
+    if c.TASK_ORDER != "lpt":
+      await task_queue.put((task_id, json.loads(line)))
+      progress['tasks_issued'] += 1
+      continue
+    buffer[task_id] = json.loads(line)
+    if c.TASK_ORDER_LOOKAHEAD is not None and len(buffer) >= c.TASK_ORDER_LOOKAHEAD:
+      await issue()
+  await issue()
 
-  # Start timer
-  t_start = time.time()
+""" Coroutine producer that puts the query tasks decoded by a TaskReader into the queue, blocks while the queue is full.
+Reading and decoding happens in the thread of the reader, the event loop only waits for complete batches."""
+async def indexed_task_producer(task_reader:TaskReader, task_queue:asyncio.Queue, progress:dict):
+  loop = asyncio.get_running_loop()
+  while True:
+    batch = await loop.run_in_executor(None, task_reader.get)
+    if batch is None: # all tasks read
+      break
+    for task_id, task in batch:
+      await task_queue.put((task_id, task))
+      progress['tasks_issued'] += 1
 
-  # Start workers
-  workers = []
-  for _ in range(c.NUM_WORKERS):
-    workers.append(asyncio.create_task(querytask_worker(task_queue, result_queue)))
+""" Coroutine writer that writes results to the output file as soon as workers hand them over and journals them"""
+async def result_writer(result_queue:asyncio.Queue, out_writer, journal:Journal, progress:dict, normalizer:Normalizer=None):
+  while True:
+    task_id, result = await result_queue.get()
+    if normalizer is not None: # Write configuration once per pattern, only differences per result
+      headers, result = normalizer.normalize(result)
+      for h in headers:
+        out_writer.write(json.dumps(h) + '\n')
+    line = json.dumps(result) + '\n'
+    out_writer.write(line)
+    journal.record(task_id)
+    journal.maybe_flush(out_writer)
+    progress['tasks_done'] += 1
+    if METRICS is not None:
+      METRICS.tasks_done.inc()
+    result_queue.task_done()
 
-  # Periodically check status, retrieve results, issue new tasks
-  while tasks_done < num_tasks:
+""" Coroutine that periodically prints the status, including the task rate since the last report"""
+async def status_reporter(t_start, num_tasks, progress:dict, workers:list, log_writer):
+  last_done, last_time = progress['tasks_done'], time.time()
+  while True:
+    await asyncio.sleep(c.STATUS_INTERVAL)
 
-    await asyncio.sleep(10)
-    
     if c.DEBUG:
       check_workers(workers, log_writer) # Check if workers are still running
 
-    print_status(t_start, tasks_done, num_tasks, log_writer) # Compute metadata, print status
-    
-    while True: # Retrieve finished tasks
-      try:
-        # Check if any tasks are done
-        result = result_queue.get_nowait()
-        tasks_done += 1
-        # Write result to output file
-        out_writer.write(json.dumps(result) + '\n')
-      except asyncio.QueueEmpty:
-        # If no tasks are done, break out of this loop
-        break
-    
-    while True: # Issue as many new tasks as possible
-      if tasks_issued == num_tasks: # If all tasks have been issued, break out of this loop
-        break
-      
-      if not task_queue.full(): # Check for space before reading task from file
-        line = task_reader.readline()
+    now = time.time()
+    rate_now = (progress['tasks_done'] - last_done) / (now - last_time)
+    last_done, last_time = progress['tasks_done'], now
+    print_status(t_start, progress['tasks_done'], num_tasks, log_writer, rate_now, progress['tasks_resumed']) # Compute metadata, print status
+
+
+""" Coroutine that adapts the window of the concurrency controller every interval and logs changes of the window
+into the output file as header records {"header": {"window": {"timestamp", "window", "in_flight", "timeout_rate", "rtt", "congested"}}}"""
+async def concurrency_controller(control:ConcurrencyController, out_writer):
+  while True:
+    await asyncio.sleep(c.AIMD_INTERVAL)
+    if control.update():
+      out_writer.write(json.dumps({"header": {"window": {"timestamp": timestamp(), **control.status()}}}) + '\n')
+
+""" Write the header record of the output file, it applies to all results up to the next header.
+With TIMESTAMP_FORMAT "monotonic", it anchors the timestamps: wall clock time in ns = anchor_ns + timestamp"""
+def write_header(out_writer):
+  global ANCHOR_NS
+  if c.TIMESTAMP_FORMAT == "datetime": # Results are self-contained, no header
+    return
+  assert c.TIMESTAMP_FORMAT == "monotonic", f"Unknown timestamp format {c.TIMESTAMP_FORMAT}"
+  ANCHOR_NS = time.monotonic_ns()
+  header = {"timestamps": "monotonic_ns", "anchor_ns": time.time_ns()}
+
+  out_writer.write(json.dumps({"header": header}) + '\n')
+
+""" Coroutine manager that runs a pipeline of task producer, query task workers and result writer.
+If resume is set, tasks completed according to the journal of a previous run are skipped and results are appended.
+If shard (index, count) is set, only the tasks of this engine process are run, see run_processes."""
+async def execute_tasks(task_file:str, outfile:str, resume:bool=False, shard:tuple=None):
+  
+  task_queue = asyncio.Queue(maxsize=2*c.NUM_WORKERS)
+  result_queue = asyncio.Queue(maxsize=2*c.NUM_WORKERS)
+
+  # Count tasks beforehand, used to report progress. With an index, the task file is read only once
+  index = load_index(f"{c.QUERY_TASK_DIR}/{task_file}")
+  num_tasks = 0
+  if index is not None:
+    num_tasks = len([i for i in range(index['count']) if in_shard(i, shard)])
+  else:
+    task_id = -1
+    with open(f"{c.QUERY_TASK_DIR}/{task_file}", 'r') as f:
+      while True:
+        line = f.readline()
         if line == "\n": # empty line
           continue
         if line == "": # end of file
           break
-        qt = json.loads(line)
+        task_id += 1
+        if in_shard(task_id, shard):
+          num_tasks += 1
+  
+  
+  # Load the journal of a previous run, drop results written after its last record
+  journal_file = local_fn('jnl', shard)
+  journal = Journal(f"{c.QUERY_TASK_DIR}/{journal_file}", c.JOURNAL_FLUSH_INTERVAL, resume)
+  if resume:
+    journal.truncate_output(f"{c.QUERY_TASK_DIR}/{outfile}")
+  progress = {"tasks_issued": 0, "tasks_done": len(journal.completed), "tasks_resumed": len(journal.completed)}
 
-        try: # Put new task in queue
-          task_queue.put_nowait(qt)
-          tasks_issued += 1
-        except asyncio.QueueFull: # Should not happen due to check above
-          log_writer.write(f"Something is messed up with queuing\n")
-          exit(1)
+  log_file = local_fn('log', shard)
+  log_writer = open(f"{c.QUERY_TASK_DIR}/{log_file}", "a" if resume else "w")
+  if c.OUTPUT_COMPRESSION is None:
+    out_writer = open(f"{c.QUERY_TASK_DIR}/{outfile}", "a" if resume else "w")
+  else: # Compressed in members that are complete after every flush of the journal
+    out_writer = CompressedWriter(f"{c.QUERY_TASK_DIR}/{outfile}", "a" if resume else "w", c.OUTPUT_COMPRESSION)
+  assert c.TASK_ORDER in ["file", "lpt"], f"Unknown task order {c.TASK_ORDER}"
+  if index is not None: # Read and decode only the remaining tasks of this process, ahead of the workers
+    task_ids = [i for i in range(index['count']) if in_shard(i, shard) and not journal.is_completed(i)]
+    if c.TASK_ORDER == "lpt" and index['runtimes'] is not None: # Longest estimated runtime first
+      task_ids = lpt_order(task_ids, index['runtimes'], c.TASK_ORDER_LOOKAHEAD)
+    task_reader = TaskReader(f"{c.QUERY_TASK_DIR}/{task_file}", index, task_ids)
+  else:
+    task_reader = open(f"{c.QUERY_TASK_DIR}/{task_file}", "r")
+  if resume:
+    log_writer.write(f"Resuming, skipping {len(journal.completed)} completed tasks\n")
+  # A resumed run gets a header of its own, its clocks are unrelated to the previous run
+  write_header(out_writer)
 
-      else: # Task queue full
-        break
+  # Open the shared sockets if queries are multiplexed
+  global MUX
+  if c.QUERY_ENGINE == "mux":
+    MUX = QueryMux(c.MUX_NUM_SOCKETS, port=DNS_PORT, resolution=c.MUX_TIMEOUT_RESOLUTION, rcvbuf=c.MUX_RCVBUF, clock=timestamp,
+      kernel_timestamps=c.KERNEL_TIMESTAMPS, kernel_clock=kernel_timestamp)
+    await MUX.start()
+  else:
+    assert c.QUERY_ENGINE == "resolver", f"Unknown query engine {c.QUERY_ENGINE}"
+    assert not c.KERNEL_TIMESTAMPS, "Kernel timestamps require QUERY_ENGINE \"mux\""
+
+  # Pace queries if any rate limit is configured
+  global LIMITER
+  rates = [c.RATE_LIMIT_PROBE_QPS, c.RATE_LIMIT_RR_QPS, c.RATE_LIMIT_NS_QPS]
+  if any([r is not None for r in rates]):
+    if shard is not None: # Engine processes share the limits evenly, tasks of a resolver may run in any process
+      rates = [r / shard[1] if r is not None else None for r in rates]
+    LIMITER = RateLimiter(*rates, c.RATE_LIMIT_BURST)
+
+  # Estimate the round trip time of each resolver to shorten the timeouts of its queries
+  global RTT
+  if c.ADAPTIVE_TIMEOUT:
+    RTT = RttEstimator(c.ADAPTIVE_TIMEOUT_MIN, c.ADAPTIVE_TIMEOUT_SAMPLES)
+
+  # Adapt the number of queries in flight, engine processes share the bounds evenly
+  global CONTROL
+  if c.CONCURRENCY_CONTROL:
+    n = shard[1] if shard is not None else 1
+    CONTROL = ConcurrencyController(max(1, c.AIMD_MIN_WINDOW // n), max(1, c.AIMD_MAX_WINDOW // n), c.AIMD_INCREASE,
+      c.AIMD_DECREASE, c.AIMD_TIMEOUT_MARGIN, c.AIMD_RTT_INFLATION)
+
+  # Share resolvers declared offline between query tasks
+  global OFFLINE
+  if c.OFFLINE_TTL is not None:
+    OFFLINE = OfflineRegistry(c.OFFLINE_TTL)
+
+  # Serve live metrics, each engine process on its own port
+  global METRICS
+  if c.METRICS_PORT is not None:
+    port = c.METRICS_PORT + (shard[0] if shard is not None else 0)
+    METRICS = Metrics(port, c.METRICS_ADDR)
+    METRICS.watch_queue("tasks", task_queue)
+    METRICS.watch_queue("results", result_queue)
+    METRICS.start()
+    log_writer.write(f"Serving metrics on {c.METRICS_ADDR}:{port}\n")
+
+  # Start timer
+  t_start = time.time()
+
+  # Start pipeline: the bounded queues provide backpressure between producer, workers and writer
+  if index is not None:
+    producer = asyncio.create_task(indexed_task_producer(task_reader, task_queue, progress))
+  else:
+    producer = asyncio.create_task(task_producer(task_reader, task_queue, journal, progress, shard))
+  workers = []
+  global WHEEL
+  WHEEL = None
+  if c.TASK_SCHEDULER == "timerwheel":
+    # Workers only run tasks that are ready, sleeping tasks wait in the timer wheel
+    ready_queue = asyncio.Queue()
+    live = asyncio.Semaphore(c.MAX_LIVE_TASKS)
+    wheel = TimerWheel(c.TIMER_WHEEL_TICK, asyncio.get_running_loop().time())
+    WHEEL = wheel
+    workers.append(asyncio.create_task(task_admitter(task_queue, ready_queue, live)))
+    workers.append(asyncio.create_task(wheel_ticker(wheel, ready_queue)))
+    for _ in range(c.NUM_WORKERS):
+      workers.append(asyncio.create_task(step_worker(ready_queue, wheel, task_queue, result_queue, live)))
+    if METRICS is not None:
+      METRICS.watch_queue("ready", ready_queue)
+      METRICS.watch_queue("timer_wheel", wheel)
+  else:
+    assert c.TASK_SCHEDULER == "worker", f"Unknown task scheduler {c.TASK_SCHEDULER}"
+    for _ in range(c.NUM_WORKERS):
+      workers.append(asyncio.create_task(querytask_worker(task_queue, result_queue)))
+  if c.OUTPUT_FORMAT == "normalized":
+    normalizer = Normalizer()
+  else:
+    assert c.OUTPUT_FORMAT == "full", f"Unknown output format {c.OUTPUT_FORMAT}"
+    normalizer = None
+  if METRICS is not None:
+    workers.append(asyncio.create_task(METRICS.measure_loop_lag()))
+  if CONTROL is not None:
+    workers.append(asyncio.create_task(concurrency_controller(CONTROL, out_writer)))
+  writer = asyncio.create_task(result_writer(result_queue, out_writer, journal, progress, normalizer))
+  reporter = asyncio.create_task(status_reporter(t_start, num_tasks, progress, workers, log_writer))
+
+  # Wait until all tasks have been read, processed and written
+  await producer
+  await task_queue.join()
+  await result_queue.join()
+  journal.flush(out_writer)
+  if num_tasks > 0:
+    print_status(t_start, progress['tasks_done'], num_tasks, log_writer, tasks_resumed=progress['tasks_resumed'])
 
   # All tasks are done, cancel workers
   log_writer.write("All tasks done, cancelling workers\n")
   log_writer.flush()
-  for w in workers:
+  for w in workers + [writer, reporter]:
     w.cancel()
 
   # Wait for workers to finish
   log_writer.write("Waiting for workers to finish\n")
   log_writer.flush()
-  await asyncio.gather(*workers, return_exceptions=True)
+  await asyncio.gather(*workers, writer, reporter, return_exceptions=True)
   log_writer.write("Done\n")
   log_writer.flush()
 
+  if MUX is not None:
+    MUX.close()
+
   log_writer.close()
   out_writer.close()
-  task_reader.close()
+  journal.close()
+  if index is None:
+    task_reader.close()
   
+""" Entry point of an engine process, runs its shard of the task file in an event loop of its own"""
+def run_process(task_file:str, outfile:str, resume:bool, shard:tuple):
+  asyncio.run(execute_tasks(task_file, outfile, resume, shard))
+
+""" Run the task file in n engine processes, each with its own event loop and a disjoint shard of the tasks.
+Every process writes its own output, log and journal (suffix .p<index>). Once all processes finished, the outputs are
+merged into outfile in the order of the processes. Returns False if any process failed, its files are kept for resume."""
+def run_processes(task_file:str, outfile:str, resume:bool, n:int) -> bool:
+  ctx = multiprocessing.get_context("fork")
+  processes = []
+  for i in range(n):
+    shard = (i, n)
+    p = ctx.Process(target=run_process, args=(task_file, f"{outfile}.p{i}", resume, shard))
+    p.start()
+    processes.append(p)
+  for p in processes:
+    p.join()
+  if any([p.exitcode != 0 for p in processes]):
+    return False
+
+  # Merge outputs, concatenated compressed files remain valid. The merged file replaces the output only once it is
+  # complete on disk, the files of the processes are removed last, such that an interrupted merge can be resumed
+  tmp_file = f"{c.QUERY_TASK_DIR}/{outfile}.tmp"
+  with open(tmp_file, "wb") as f_out:
+    for i in range(n):
+      append_file(f_out, f"{c.QUERY_TASK_DIR}/{outfile}.p{i}")
+    f_out.flush()
+    os.fsync(f_out.fileno())
+  os.replace(tmp_file, f"{c.QUERY_TASK_DIR}/{outfile}")
+  # Journals first, a process output without journal is merely run again on resume
+  for i in range(n):
+    os.remove(f"{c.QUERY_TASK_DIR}/{local_fn('jnl', (i, n))}")
+  for i in range(n):
+    os.remove(f"{c.QUERY_TASK_DIR}/{outfile}.p{i}")
+  return True
+
+""" Write a task file of n synthetic query tasks for the benchmark, each a single A query with a random label"""
+def write_bench_tasks(task_file:str, n:int):
+  with open(task_file, "w") as f:
+    for _ in range(n):
+      query = {"rr": "127.0.0.1", "vp": LOCALHOST, "type": "A", "recursion_desired": True, "random_subdomains": True,
+        "query": "bench.test", "concurrent": False, "repeat": 1, "wait": 0, "timeout": c.BENCH_TIMEOUT, "wait_after": 0,
+        "expected_status": "NOERROR"}
+      f.write(json.dumps({"pattern": "bench", "nameservers": {}, "queries": [query]}) + "\n")
+
+""" Return the number of queries, their latencies in seconds (excluding timeouts) and the count of each status"""
+def read_bench_output(out_file:str) -> tuple:
+  latencies, statuses = [], {}
+  with open(out_file, "r") as f:
+    for line in f:
+      d = json.loads(line)
+      if "header" in d:
+        continue
+      for r in d['responses']:
+        statuses[r['status']] = statuses.get(r['status'], 0) + 1
+        if r['status'] != "TIMEOUT":
+          latencies.append((r['timestamp'] - r['timestamp_sent']) / 1e9)
+  return sum(statuses.values()), latencies, statuses
+
+""" Benchmark the engine against a local fake resolver (FakeResolver.py), without any network access.
+Runs BENCH_TASKS synthetic query tasks at each number of workers in BENCH_CONCURRENCY with the configured engine
+and prints the query rate, p50 / p99 latency and CPU time per query. The fake resolver runs in a process of its own,
+such that the CPU time is that of the engine only."""
+def run_bench():
+  global LOCALHOST, DNS_PORT
+  LOCALHOST = "127.0.0.1"
+  DNS_PORT = c.BENCH_PORT
+  c.TIMESTAMP_FORMAT = "monotonic" # Latencies are computed from the timestamps in the output
+  c.OUTPUT_FORMAT = "full"
+  c.OUTPUT_COMPRESSION = None
+  c.METRICS_PORT = None
+
+  ctx = multiprocessing.get_context("fork")
+  ready = ctx.Event()
+  fake = ctx.Process(target=run_fake_resolver, args=("127.0.0.1", c.BENCH_PORT, c.BENCH_RESOLVER, ready), daemon=True)
+  fake.start()
+  assert ready.wait(10), "Fake resolver did not start"
+
+  print(f"Benchmark: {c.BENCH_TASKS} tasks per run, engine {c.QUERY_ENGINE}, scheduler {c.TASK_SCHEDULER}, resolver {c.BENCH_RESOLVER}")
+  print(f"{'workers':>8} {'queries':>8} {'qps':>10} {'p50 ms':>8} {'p99 ms':>8} {'cpu us/q':>9}  statuses")
+  try:
+    with tempfile.TemporaryDirectory() as d:
+      c.QUERY_TASK_DIR = d
+      write_bench_tasks(f"{d}/tsk", c.BENCH_TASKS)
+      for workers in c.BENCH_CONCURRENCY:
+        c.NUM_WORKERS = workers
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        t_start = time.time()
+        asyncio.run(execute_tasks("tsk", "out"))
+        t_total = time.time() - t_start
+        usage_end = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = (usage_end.ru_utime - usage.ru_utime) + (usage_end.ru_stime - usage.ru_stime)
+
+        num_queries, latencies, statuses = read_bench_output(f"{d}/out")
+        latencies.sort()
+        p50 = latencies[int(0.50 * (len(latencies) - 1))] * 1000 if len(latencies) > 0 else float("nan")
+        p99 = latencies[int(0.99 * (len(latencies) - 1))] * 1000 if len(latencies) > 0 else float("nan")
+        print(f"{workers:>8} {num_queries:>8} {num_queries / t_total:>10.1f} {p50:>8.2f} {p99:>8.2f} "
+          f"{cpu / max(num_queries, 1) * 1e6:>9.1f}  {json.dumps(statuses)}")
+  finally:
+    fake.terminate()
+    fake.join()
+
 LOCALHOST = None
+DNS_PORT = 53
+METRICS = None
+ANCHOR_NS = None
+MUX = None
+LIMITER = None
+RTT = None
+OFFLINE = None
+CONTROL = None
+WHEEL = None
 
 if __name__ == "__main__":
   
@@ -373,22 +981,44 @@ if __name__ == "__main__":
   # Parse arguments
   import argparse
   parser = argparse.ArgumentParser(description="Run single vantage point in docker container and store result to file")
-  parser.add_argument("infile", 
+  parser.add_argument("infile", nargs="?",
     help="json file containing a list of query tasks")
-  parser.add_argument("outfile", 
+  parser.add_argument("outfile", nargs="?",
     help="json file containing client responses")
+  parser.add_argument("--resume", required=False, default=False, action="store_true",
+    help="skip query tasks completed by a previous run according to its journal and append to outfile")
+  parser.add_argument("--native", required=False, default=False, action="store_true",
+    help="run directly on the host instead of in the container (started by manager.py with EXECUTION_MODE native)")
+  parser.add_argument("--metrics-port", required=False, default=None, type=int,
+    help="port of the metrics endpoint of the first engine process, overrides METRICS_PORT")
+  parser.add_argument("--metrics-addr", required=False, default=None,
+    help="address the metrics endpoint binds to, overrides METRICS_ADDR")
+  parser.add_argument("--bench", required=False, default=False, action="store_true",
+    help="benchmark the engine against a local fake resolver (see BENCH_* in config.py), no task files required")
   args = parser.parse_args()
 
+  # Benchmark runs anywhere, outside of the container
+  if args.bench:
+    run_bench()
+    exit(0)
+  if args.infile is None or args.outfile is None:
+    parser.error("infile and outfile are required")
+  if args.metrics_port is not None:
+    c.METRICS_PORT = args.metrics_port
+  if args.metrics_addr is not None:
+    c.METRICS_ADDR = args.metrics_addr
+
   
   # Check dependencies
   from shutil import which
-  for p in ["openvpn", "curl"]:
+  for p in ["curl"] if args.native else ["openvpn", "curl"]:
     if which(p) is None:
       print(f"{p} is not installed in the container, has the Dockerfile been modified?")
 
-  # Check container environment is correct
-  assert os.getcwd() == "/measurement", "cwd in the container is wrong, has the Dockerfile been modified?"
-  assert c.VPN_CONFIG_DIR in os.listdir(os.getcwd()), f"{c.VPN_CONFIG_DIR} has not been found. Is the directory mounted correctly?"
+  # Check container environment is correct, natively the engine runs in the engine directory
+  if not args.native:
+    assert os.getcwd() == "/measurement", "cwd in the container is wrong, has the Dockerfile been modified?"
+    assert c.VPN_CONFIG_DIR in os.listdir(os.getcwd()), f"{c.VPN_CONFIG_DIR} has not been found. Is the directory mounted correctly?"
   assert c.QUERY_TASK_DIR in os.listdir(os.getcwd()), f"{c.QUERY_TASK_DIR} has not been found. Is the directory mounted correctly?"
 
   LOCALHOST = get_public_ip()
@@ -428,7 +1058,15 @@ if __name__ == "__main__":
   #check_public_ip(vp)
   
   # Perform query tasks
-  results = asyncio.run(execute_tasks(args.infile, args.outfile))
-  
-  # Remove task file if finished successfully
+  if c.ENGINE_PROCESSES > 1:
+    if not run_processes(args.infile, args.outfile, args.resume, c.ENGINE_PROCESSES):
+      print("Engine process failed, run again with --resume to continue")
+      exit(1)
+  else:
+    results = asyncio.run(execute_tasks(args.infile, args.outfile, args.resume))
+    os.remove(f"{c.QUERY_TASK_DIR}/{ip_to_fn('jnl', LOCALHOST)}")
+
+  # Remove task file and its index if finished successfully
   os.remove(f"{c.QUERY_TASK_DIR}/{args.infile}")
+  if os.path.exists(f"{c.QUERY_TASK_DIR}/{args.infile}{INDEX_SUFFIX}"):
+    os.remove(f"{c.QUERY_TASK_DIR}/{args.infile}{INDEX_SUFFIX}")
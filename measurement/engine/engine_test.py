@@ -0,0 +1,230 @@
+#! /usr/bin/env python3
+
+import asyncio
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+import config as c
+import engine
+from FakeResolver import run_fake_resolver
+
+try:
+  import zstandard
+except ImportError: # Only required to test zstd compressed output
+  zstandard = None
+
+# Fake resolvers on the loopback: one answers after a fixed latency, the other drops all queries
+RESOLVER = "127.0.0.1"
+RESOLVER_DROP = "127.0.0.2"
+LATENCY = 0.02
+
+""" Return a free UDP port on the loopback"""
+def free_port() -> int:
+  with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+    s.bind(("127.0.0.1", 0))
+    return s.getsockname()[1]
+
+""" Return a query task with a single query entry"""
+def querytask(name:str, rr:str=RESOLVER, concurrent:bool=False, repeat:int=1, wait:float=0, timeout:float=1,
+    wait_after:float=0, parallelism:int=None) -> dict:
+  query = {"rr": rr, "vp": RESOLVER, "type": "A", "recursion_desired": True, "random_subdomains": False, "query": name,
+    "concurrent": concurrent, "repeat": repeat, "wait": wait, "timeout": timeout, "wait_after": wait_after,
+    "expected_status": "NOERROR"}
+  if parallelism is not None:
+    query['parallelism'] = parallelism
+  return {"pattern": "test", "nameservers": {}, "queries": [query]}
+
+""" Returns the maximum number of queries in flight at the same time, from (sent, received) timestamps"""
+def max_in_flight(responses:list) -> int:
+  return max([len([r for r in responses if r['timestamp_sent'] <= s['timestamp_sent'] < r['timestamp']]) for s in responses])
+
+class TestEngine(unittest.TestCase):
+
+  CONFIG = ["QUERY_TASK_DIR", "TASK_SCHEDULER", "NUM_WORKERS", "TIMESTAMP_FORMAT", "OUTPUT_FORMAT", "OUTPUT_COMPRESSION",
+    "METRICS_PORT", "MAX_FAILS", "JOURNAL_FLUSH_INTERVAL"]
+
+  @classmethod
+  def setUpClass(cls):
+    port = free_port()
+    ctx = multiprocessing.get_context("fork")
+    cls.fakes = []
+    for addr, behaviour in [(RESOLVER, {"latency": "fixed", "latency_mean": LATENCY}), (RESOLVER_DROP, {"drop": 1.0})]:
+      ready = ctx.Event()
+      fake = ctx.Process(target=run_fake_resolver, args=(addr, port, behaviour, ready), daemon=True)
+      fake.start()
+      assert ready.wait(10), "Fake resolver did not start"
+      cls.fakes.append(fake)
+    cls.localhost, cls.dns_port = engine.LOCALHOST, engine.DNS_PORT
+    engine.LOCALHOST = RESOLVER
+    engine.DNS_PORT = port
+
+  @classmethod
+  def tearDownClass(cls):
+    for fake in cls.fakes:
+      fake.terminate()
+      fake.join()
+    engine.LOCALHOST, engine.DNS_PORT = cls.localhost, cls.dns_port
+
+  def setUp(self):
+    self.config = {k: getattr(c, k) for k in self.CONFIG}
+    self.dir = tempfile.TemporaryDirectory()
+    c.QUERY_TASK_DIR = self.dir.name
+    c.NUM_WORKERS = 10
+    c.TIMESTAMP_FORMAT = "monotonic" # Integer nanoseconds, compared below
+    c.METRICS_PORT = None
+    c.MAX_FAILS = 3
+
+  def tearDown(self):
+    for k, v in self.config.items():
+      setattr(c, k, v)
+    self.dir.cleanup()
+
+  """ Write the task file"""
+  def write_tasks(self, tasks:list):
+    with open(f"{c.QUERY_TASK_DIR}/tsk", "w") as f:
+      for task in tasks:
+        f.write(json.dumps(task) + "\n")
+
+  """ Return the query task results of the output file. Header records are skipped, normalized results must follow the
+  header of their configuration"""
+  def read_results(self) -> list:
+    filename = f"{c.QUERY_TASK_DIR}/out"
+    if c.OUTPUT_COMPRESSION == "gzip":
+      f = gzip.open(filename, "rt")
+    elif c.OUTPUT_COMPRESSION == "zstd":
+      f = io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"), read_across_frames=True, closefd=True))
+    else:
+      f = open(filename, "r")
+    results, configs = [], set()
+    with f:
+      for line in f:
+        d = json.loads(line)
+        if "header" in d:
+          if "config" in d['header']:
+            configs.add(d['header']['config']['id'])
+          continue
+        self.assertIn(d.get('config'), configs if "config" in d else [None])
+        results.append(d)
+    return results
+
+  """ Run the query tasks and return the results by query name"""
+  def run_tasks(self, tasks:list) -> dict:
+    self.write_tasks(tasks)
+    asyncio.run(engine.execute_tasks("tsk", "out"))
+    results = {d['queries'][0]['query']: d for d in self.read_results()}
+    self.assertEqual(len(results), len(tasks))
+    return results
+
+  def test_sequential(self):
+    for scheduler in ["worker", "timerwheel"]:
+      with self.subTest(scheduler=scheduler):
+        c.TASK_SCHEDULER = scheduler
+        tasks = [querytask(f"seq{i}.test", repeat=3, wait=0.05) for i in range(4)]
+        for name, result in self.run_tasks(tasks).items():
+          responses = result['responses']
+          self.assertEqual([r['status'] for r in responses], ["NOERROR"] * 3)
+          self.assertEqual(max_in_flight(responses), 1)
+          # Each query is sent after the response to the previous one and the wait. A late wake-up shortens the next
+          # wait by the lateness (at most a tick of the timer wheel), waits are exact on average
+          gaps = [r1['timestamp_sent'] - r0['timestamp'] for r0, r1 in zip(responses, responses[1:])]
+          self.assertGreaterEqual(min(gaps), (0.05 - c.TIMER_WHEEL_TICK) * 1e9 - 0.005e9)
+          self.assertGreaterEqual(sum(gaps) / len(gaps), 0.049e9)
+
+  def test_wait_after(self):
+    for scheduler in ["worker", "timerwheel"]:
+      with self.subTest(scheduler=scheduler):
+        c.TASK_SCHEDULER = scheduler
+        task = querytask("first.test", wait_after=0.1)
+        task['queries'] += querytask("second.test")['queries']
+        responses = self.run_tasks([task])["first.test"]['responses']
+        self.assertEqual([r['name'] for r in responses], ["first.test", "second.test"])
+        self.assertGreaterEqual(responses[1]['timestamp_sent'] - responses[0]['timestamp'], 0.095e9)
+
+  def test_concurrent(self):
+    for scheduler in ["worker", "timerwheel"]:
+      with self.subTest(scheduler=scheduler):
+        c.TASK_SCHEDULER = scheduler
+        tasks = [querytask("slots.test", concurrent=True, repeat=8, parallelism=2),
+          querytask("all.test", concurrent=True, repeat=8)]
+        results = self.run_tasks(tasks)
+        for name, in_flight in [("slots.test", 2), ("all.test", 8)]:
+          responses = results[name]['responses']
+          self.assertEqual([r['status'] for r in responses], ["NOERROR"] * 8)
+          self.assertEqual(max_in_flight(responses), in_flight)
+
+  def test_concurrent_wheel(self):
+    # Waits of concurrent entries are parked in the timer wheel, a single step worker continues with other tasks meanwhile
+    c.TASK_SCHEDULER = "timerwheel"
+    c.NUM_WORKERS = 1
+    tasks = [querytask("slots.test", concurrent=True, repeat=4, wait=0.1, parallelism=2), querytask("other.test")]
+    results = self.run_tasks(tasks)
+    slots = results["slots.test"]['responses']
+    self.assertEqual([r['status'] for r in slots], ["NOERROR"] * 4)
+    self.assertLess(results["other.test"]['responses'][0]['timestamp'], slots[-1]['timestamp_sent'])
+    # Each slot waits before its second query
+    self.assertGreaterEqual(slots[2]['timestamp_sent'] - slots[0]['timestamp'], (0.1 - c.TIMER_WHEEL_TICK) * 1e9)
+
+  def test_abort(self):
+    for scheduler in ["worker", "timerwheel"]:
+      with self.subTest(scheduler=scheduler):
+        c.TASK_SCHEDULER = scheduler
+        tasks = [querytask("concurrent.test", rr=RESOLVER_DROP, concurrent=True, repeat=20, timeout=0.2, parallelism=4),
+          querytask("sequential.test", rr=RESOLVER_DROP, repeat=20, timeout=0.2)]
+        t_start = time.time()
+        results = self.run_tasks(tasks)
+        # The abort after MAX_FAILS timeouts cancels the queries of the other slots, instead of running all 5 rounds
+        self.assertLess(time.time() - t_start, 1.0)
+        for name in ["concurrent.test", "sequential.test"]:
+          responses = results[name]['responses']
+          self.assertLess(len(responses), c.MAX_FAILS)
+          self.assertTrue(all([r['status'] == "TIMEOUT" for r in responses]))
+
+  def test_stop(self):
+    for scheduler in ["worker", "timerwheel"]:
+      with self.subTest(scheduler=scheduler):
+        c.TASK_SCHEDULER = scheduler
+        tasks = [querytask("sequential.test", repeat=10), querytask("concurrent.test", concurrent=True, repeat=10, parallelism=2)]
+        for task in tasks:
+          task['queries'][0].update({"abort_policy": "abort_policy_stable", "policy_params": {"stable_window": 3}})
+        results = self.run_tasks(tasks)
+        # The response that meets the stopping rule is kept, queries in flight of the other slot complete
+        self.assertEqual(len(results["sequential.test"]['responses']), 3)
+        self.assertIn(len(results["concurrent.test"]['responses']), [3, 4])
+
+  def test_resume(self):
+    c.JOURNAL_FLUSH_INTERVAL = 0 # Journal every result
+    tasks = [querytask(f"resume{i}.test", repeat=2) for i in range(20)]
+    names = sorted([task['queries'][0]['query'] for task in tasks])
+    for output_format, compression in [("full", None), ("full", "gzip"), ("full", "zstd"), ("normalized", None)]:
+      with self.subTest(output_format=output_format, compression=compression):
+        if compression == "zstd" and zstandard is None:
+          self.skipTest("zstd compression requires the zstandard package")
+        c.OUTPUT_FORMAT = output_format
+        c.OUTPUT_COMPRESSION = compression
+        self.write_tasks(tasks)
+        asyncio.run(engine.execute_tasks("tsk", "out"))
+
+        # Interrupt the run after 8 journaled results, while the 9th result was partially written
+        journal = f"{c.QUERY_TASK_DIR}/{engine.local_fn('jnl', None)}"
+        with open(journal, "r") as f:
+          records = f.readlines()
+        with open(journal, "w") as f:
+          f.writelines(records[0:8])
+        out_size, next_size = int(records[7].split()[1]), int(records[8].split()[1])
+        os.truncate(f"{c.QUERY_TASK_DIR}/out", (out_size + next_size) // 2)
+
+        asyncio.run(engine.execute_tasks("tsk", "out", resume=True))
+        results = self.read_results()
+        # Every task appears exactly once, results of the first run before the interruption are kept
+        self.assertEqual(sorted([d['responses'][0]['name'] for d in results]), names)
+        self.assertTrue(all([len(d['responses']) == 2 for d in results]))
+
+if __name__ == '__main__':
+  unittest.main()
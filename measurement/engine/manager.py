@@ -1,14 +1,21 @@
 #! /usr/bin/env python3
 
 import os
+import sys
+import hashlib
 import subprocess
 import json
 from multiprocessing import Pool
 import time
 import config as c
+from FileConcat import append_file
+from TaskIndex import load_index, write_index
 
 DRYRUN = False
 
+# Manifest of the outputs appended to the combined file, kept in QUERY_TASK_DIR until all vantage points finished
+MANIFEST_FILE = "manifest"
+
 def validate_query_tasks(qt:dict):
     assert('queries' in qt.keys())
     for q in qt['queries']:
@@ -18,11 +25,12 @@ def validate_query_tasks(qt:dict):
 
 
 
-""" Takes a filename with a three letter prefix followed by an IP with dashes instead of dots (i.e. 1-2-3-4).
+""" Takes a filename with a three letter prefix followed by an IP with dashes instead of dots (i.e. 1-2-3-4),
+optionally followed by a suffix starting with a dot (i.e. .p0 for the files of engine process 0).
 Returns the IP address (i.e. 1.2.3.4)
 """
 def fn_to_ip(fn:str) -> str:
-  octets = fn[3:].split("-")
+  octets = fn[3:].split(".")[0].split("-")
   assert len(octets) == 4, f"Filename of file '{fn}' is not of the expect form."
   return ".".join(octets)
 
@@ -33,21 +41,126 @@ def ip_to_fn(pre:str, ip:str) -> str:
   assert len(octets) == 4, f"IP address {ip} must contain 4 octets"
   return pre+"-".join(octets)
 
-""" Takes a vantage point IP (vp) and launches a vantage point container"""
-def run_vantage_point(vp:str):
-  # Create Docker command
-  docker_cmd = f"docker run --rm --privileged -v ./:/measurement {c.IMAGE_NAME}"
+""" Read the manifest of a previous run. Returns (names of the appended output files, size of the combined file after the
+last recorded append), or None if there is no manifest"""
+def read_manifest(filename:str):
+  if not os.path.exists(filename):
+    return None
+  appended, size = set(), 0
+  with open(filename, "r") as f:
+    for line in f:
+      if not line.endswith("\n"): # Partially written last record
+        break
+      fn, out_size = line.split()
+      appended.add(fn)
+      size = int(out_size)
+  return appended, size
+
+""" Record in the manifest that fn has been appended to the combined file, once the combined file is on disk"""
+def record_manifest(f_manifest, fn:str, f_out):
+  f_out.flush()
+  os.fsync(f_out.fileno())
+  f_manifest.write(f"{fn} {os.fstat(f_out.fileno()).st_size}\n")
+  f_manifest.flush()
+  os.fsync(f_manifest.fileno())
+
+""" Append an output file to the combined file exactly once: the append is recorded in the manifest before the output is
+removed. A resumed manager truncates a partial append and skips outputs that were recorded already"""
+def append_output(f_out, f_manifest, fn:str):
+  print(f"Writing {fn} to combined file")
+  append_file(f_out, f"{c.QUERY_TASK_DIR}/{fn}")
+  record_manifest(f_manifest, fn, f_out)
+  os.remove(f"{c.QUERY_TASK_DIR}/{fn}")
+
+""" Returns the docker arguments to publish the metrics ports of the engine processes of the index-th vantage point"""
+def metrics_ports(index:int) -> str:
+  if c.METRICS_PORT is None:
+    return ""
+  ports = []
+  for i in range(c.ENGINE_PROCESSES):
+    host_port = c.METRICS_PORT + index * c.ENGINE_PROCESSES + i
+    ports.append(f"-p 127.0.0.1:{host_port}:{c.METRICS_PORT + i}")
+  return " ".join(ports) + " "
+
+""" Returns the tag of the engine image: IMAGE_NAME with the content hash of the Dockerfile and the build context
+(see .dockerignore) as tag, such that the image is only rebuilt if one of them changed"""
+def image_tag() -> str:
+  h = hashlib.sha256()
+  for fn in ["Dockerfile", ".dockerignore", "engine.py"]:
+    with open(fn, "rb") as f:
+      h.update(fn.encode() + b"\0" + f.read())
+  return f"{c.IMAGE_NAME.split(':')[0]}:{h.hexdigest()[0:16]}"
+
+""" Build the engine image unless an image with the same content hash exists. Returns the image tag or None on failure"""
+def build_image() -> str:
+  tag = image_tag()
+  r = subprocess.run(["docker", "image", "inspect", tag], capture_output=True)
+  if r.returncode == 0:
+    print(f"Using cached docker image {tag}")
+    return tag
+  print(f"Building docker image {tag}...", end=" ")
+  r = subprocess.run(["docker", "build", "-t", tag, "."], capture_output=True)
+  if r.returncode != 0:
+    print(r.stdout.decode('utf-8'))
+    print(r.stderr.decode('utf-8'))
+    return None
+  print("Done!")
+  return tag
+
+""" Returns the interpreter of the native mode. With NATIVE_VENV, the venv is created and the engine requirements are
+installed once, and again only if requirements.txt changed. Returns None on failure"""
+def prepare_native() -> str:
+  if c.NATIVE_VENV is None:
+    return sys.executable
+  python = f"{c.NATIVE_VENV}/bin/python3"
+  with open("requirements.txt", "rb") as f:
+    req_hash = hashlib.sha256(f.read()).hexdigest()
+  marker = f"{c.NATIVE_VENV}/.requirements-sha256"
+  if os.path.exists(marker):
+    with open(marker, "r") as f:
+      if f.read() == req_hash:
+        return python
+  print(f"Preparing venv '{c.NATIVE_VENV}'...", end=" ")
+  try:
+    # System packages (e.g. python3-dnspython) remain usable, only missing requirements are installed
+    subprocess.run([sys.executable, "-m", "venv", "--system-site-packages", c.NATIVE_VENV], capture_output=True).check_returncode()
+    subprocess.run([python, "-m", "pip", "install", "-q", "-r", "requirements.txt"], capture_output=True).check_returncode()
+  except subprocess.CalledProcessError as e:
+    print(e.stderr.decode('utf-8'))
+    return None
+  with open(marker, "w") as f:
+    f.write(req_hash)
+  print("Done!")
+  return python
+
+""" Takes a vantage point IP (vp) and launches a vantage point container, or with EXECUTION_MODE "native" an engine
+subprocess running interpreter. With resume, the engine continues from its journal.
+index is the position of the vantage point in this run, used to assign the ports of the metrics endpoint"""
+def run_vantage_point(vp:str, index:int=0, resume:bool=False, image:str=None, interpreter:str=None):
   # Prepare script arguments
   fn_in = ip_to_fn("tsk", vp)
   fn_out = ip_to_fn("out", vp)
   # Compose command
-  cmd = f"{docker_cmd} {fn_in} {fn_out}"
+  if c.EXECUTION_MODE == "native":
+    cmd = f"{interpreter} engine.py {fn_in} {fn_out} --native"
+    if c.METRICS_PORT is not None: # Same host ports as published for the containers, only reachable locally
+      cmd += f" --metrics-port {c.METRICS_PORT + index * c.ENGINE_PROCESSES} --metrics-addr 127.0.0.1"
+  else:
+    docker_cmd = f"docker run --rm --privileged {metrics_ports(index)}-v ./:/measurement {image}"
+    cmd = f"{docker_cmd} {fn_in} {fn_out}"
+  if resume:
+    cmd += " --resume"
   try:
     print(f"Starting query task for vantage point {vp}")
     r = subprocess.run(cmd.split(' '))
     r.check_returncode()
   except:
     print(f"Vantage point {vp} failed.")
+  return vp
+
+""" Run a vantage point with keyword arguments, for Pool.imap_unordered. Returns the vantage point once it finished"""
+def run_vantage_point_kwargs(kwargs:dict) -> str:
+  return run_vantage_point(**kwargs)
   
 
 if __name__ == "__main__":
@@ -62,91 +175,136 @@ if __name__ == "__main__":
     help="IP of machine this script is running on")
   parser.add_argument("outfile", 
     help="Output file for collected results")
+  parser.add_argument("--resume", required=False, default=False, action="store_true",
+    help="Continue an interrupted run from the task, output and journal files left in the task directory")
   args = parser.parse_args()
 
-  # Check if docker is installed 
-  from shutil import which
-  if which("docker") is None:
-    print("docker does not seem to be installed..")
-    exit(1)
+  image, interpreter = None, None
+  if c.EXECUTION_MODE == "native":
+    # Run the engine directly, no image to build
+    interpreter = prepare_native()
+    if interpreter is None:
+      print(f"Something went wrong while preparing the venv...")
+      exit(1)
+  else:
+    assert c.EXECUTION_MODE == "docker", f"Unknown execution mode {c.EXECUTION_MODE}"
+    # Check if docker is installed 
+    from shutil import which
+    if which("docker") is None:
+      print("docker does not seem to be installed..")
+      exit(1)
 
-  # Building Docker image
-  assert "Dockerfile" in os.listdir(os.getcwd()), f"No Dockerfile found in {os.getcwd()}"
-  try:
-    print("Building docker image...", end=" ")
-    cmd = f"docker build -t {c.IMAGE_NAME} ."
-    r = subprocess.run(cmd.split(' '), capture_output=True)
-    r.check_returncode()
-  except:
-    print(r.stdout.decode('utf-8'))
-    print(f"Something went wrong while building the Docker Image...")
-    exit(1)
-  print("Done!")
+    # Building Docker image, unless it is cached
+    assert "Dockerfile" in os.listdir(os.getcwd()), f"No Dockerfile found in {os.getcwd()}"
+    image = build_image()
+    if image is None:
+      print(f"Something went wrong while building the Docker Image...")
+      exit(1)
 
   # NOTE: below process of separating taskfile by vantage points is a remnant of VPN based vantage points
   # Load existing VP configs
   vpn_vps = [fn_to_ip(fn) for fn in os.listdir(c.VPN_CONFIG_DIR)]
 
   # Make sure to process file streamlined
-  with open(args.file, 'r') as f:
-    filehandle_dict = dict()
-    for line in f:
-      
-      # Load single task
-      if line == None or line == "":
-        continue
-      q = json.loads(line)
+  if args.resume:
+    # Continue with the task files of the interrupted run, they are only removed once a vantage point finished
+    print(f"Resuming vantage points {','.join([fn_to_ip(fn) for fn in os.listdir(c.QUERY_TASK_DIR) if fn.startswith('tsk') and '.' not in fn])}")
+  else:
+    # Estimated runtimes of the tasks from the index of the input file, if any
+    index = load_index(args.file)
+    runtimes = index['runtimes'] if index is not None else None
+    with open(args.file, 'r') as f:
+      filehandle_dict = dict()
+      offsets_dict = dict()       # Dict of vp -> (byte offsets, runtimes) of its tasks for the index of its task file
+      position_dict = dict()      # Dict of vp -> byte offset of the next task in its task file
+      for i, line in enumerate(f):
+        
+        # Load single task
+        if line == None or line == "":
+          continue
+        q = json.loads(line)
 
-      # Validate
-      validate_query_tasks(q)
-      vp = q['queries'][0]['vp']
+        # Validate
+        validate_query_tasks(q)
+        vp = q['queries'][0]['vp']
 
-      # Make sure the vp is either localhost or a VPN config exists
-      if vp != args.localhost and vp not in vpn_vps:
-        print(f"No configuration found for vantage point {vp}.. skipping")
-        continue
+        # Make sure the vp is either localhost or a VPN config exists
+        if vp != args.localhost and vp not in vpn_vps:
+          print(f"No configuration found for vantage point {vp}.. skipping")
+          continue
 
-      # Check if taskfile handle is already in dict, if not, open new file and add it to the dict
-      if vp not in filehandle_dict.keys():
-        fn = ip_to_fn("tsk", vp)
-        filehandle_dict[vp] = open(f"{c.QUERY_TASK_DIR}/{fn}", 'w')
-
-      # Write task to file
-      filehandle_dict[vp].write(line)
-    # Close all file handles
-    for k in filehandle_dict.keys():
-      filehandle_dict[k].close()
-
-    # Run Vantage Points with a multiprocessing pool
-    t_start = time.time()
-    with Pool(c.NUM_VANTAGE_POINTS) as p:
-      vps = [fn_to_ip(fn) for fn in os.listdir(c.QUERY_TASK_DIR) if fn.startswith("tsk")]
-      results = p.map(run_vantage_point, vps)
-    t_total = time.time() - t_start
-    print(f"Total time: {str(t_total)}")
+        # Check if taskfile handle is already in dict, if not, open new file and add it to the dict
+        if vp not in filehandle_dict.keys():
+          fn = ip_to_fn("tsk", vp)
+          filehandle_dict[vp] = open(f"{c.QUERY_TASK_DIR}/{fn}", 'w')
+          offsets_dict[vp] = ([], [])
+          position_dict[vp] = 0
 
-  # Gather tempoarary files
-  outfiles = os.listdir(c.QUERY_TASK_DIR)
+        # Write task to file
+        offsets_dict[vp][0].append(position_dict[vp])
+        offsets_dict[vp][1].append(runtimes[i] if runtimes is not None else None)
+        filehandle_dict[vp].write(line)
+        position_dict[vp] += len(line.encode())
+      # Close all file handles and write the index of each task file
+      for k in filehandle_dict.keys():
+        filehandle_dict[k].close()
+        write_index(f"{c.QUERY_TASK_DIR}/{ip_to_fn('tsk', k)}", *offsets_dict[k])
 
-  # Sort outfiles, report successes and fails
-  success = [fn for fn in outfiles if fn.startswith("out")]
-  print(f"Gathered {len(success)} successful response files.")
-  fail = [fn for fn in outfiles if fn.startswith("tsk")]
-  print(f"{len(fail)} vantage points failed.")
-
-  # Read all out files and write them to a single file streamlined
+  # Run Vantage Points with a multiprocessing pool. The output of a vantage point is appended to the combined file
+  # as soon as it finished, such that the combined file can be read while other vantage points are still running
+  t_start = time.time()
+  vps = [fn_to_ip(fn) for fn in os.listdir(c.QUERY_TASK_DIR) if fn.startswith("tsk") and "." not in fn]
+  failed_vps = []
+  num_success = 0
   print(f"Writing combined results to '{args.outfile}'")
-  with open(args.outfile, 'w') as f_out:
-    # Open successful files one by one
-    for s in success:
-      print(f"Writing {s} to combined file")
-      with open(f"{c.QUERY_TASK_DIR}/{s}", 'r') as f_in:
-        # Write each line in the successful result file to the combined file
-        for line in f_in:
-          if line != None and line != "":
-            f_out.write(line)
-  
+  # Append on resume, without O_APPEND which rules out copying within the kernel
+  manifest_file = f"{c.QUERY_TASK_DIR}/{MANIFEST_FILE}"
+  manifest = read_manifest(manifest_file) if args.resume else None
+  with open(args.outfile, 'r+b' if args.resume and os.path.exists(args.outfile) else 'wb') as f_out, \
+      open(manifest_file, 'a' if manifest is not None else 'w') as f_manifest, Pool(c.NUM_VANTAGE_POINTS) as p:
+    appended = set()
+    if manifest is not None:
+      # Drop a partial append of the interrupted run
+      appended, size = manifest
+      if os.fstat(f_out.fileno()).st_size > size:
+        f_out.truncate(size)
+    f_out.seek(0, os.SEEK_END)
+    if manifest is None:
+      record_manifest(f_manifest, "start", f_out)
+    if args.resume:
+      # Append the outputs of vantage points that finished before the interruption, but were not appended yet
+      for fn in sorted(os.listdir(c.QUERY_TASK_DIR)):
+        if fn.startswith("out") and "." not in fn and not os.path.exists(f"{c.QUERY_TASK_DIR}/{ip_to_fn('tsk', fn_to_ip(fn))}"):
+          if fn in appended: # Interrupted after the append was recorded
+            os.remove(f"{c.QUERY_TASK_DIR}/{fn}")
+            continue
+          append_output(f_out, f_manifest, fn)
+          num_success += 1
+    runs = [{"vp": vp, "index": i, "resume": args.resume, "image": image, "interpreter": interpreter} for i, vp in enumerate(vps)]
+    for vp in p.imap_unordered(run_vantage_point_kwargs, runs):
+      # The engine only removes its task file once all tasks are done
+      if os.path.exists(f"{c.QUERY_TASK_DIR}/{ip_to_fn('tsk', vp)}"):
+        failed_vps.append(vp)
+        continue
+      if not os.path.exists(f"{c.QUERY_TASK_DIR}/{ip_to_fn('out', vp)}"):
+        continue
+      # Append the result file as is, concatenated compressed files remain valid. Remove it right away to limit disk usage
+      append_output(f_out, f_manifest, ip_to_fn('out', vp))
+      num_success += 1
+  t_total = time.time() - t_start
+  print(f"Total time: {str(t_total)}")
+  print(f"{len(failed_vps)} vantage points failed.")
+  print(f"Gathered {num_success} successful response files.")
+
+  # Gather tempoarary files
+  outfiles = os.listdir(c.QUERY_TASK_DIR)
 
-  # Delete temporary files
+  # Delete temporary files, keep those of failed vantage points and the manifest to allow resuming them
   for f in outfiles:
+    if f[0:3] in ["tsk", "out", "jnl", "log"] and fn_to_ip(f) in failed_vps:
+      continue
+    if f == MANIFEST_FILE and len(failed_vps) > 0:
+      continue
     os.remove(f"{c.QUERY_TASK_DIR}/{f}")
+  if len(failed_vps) > 0:
+    print(f"Kept temporary files of failed vantage points, run again with --resume to continue them.")
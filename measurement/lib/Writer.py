@@ -1,6 +1,7 @@
 
 import os
 import json
+from engine.TaskIndex import write_index
 
 """ Responsible for writing zone files to disk. Manages one file per zone """
 class ZoneWriter():
@@ -116,7 +117,7 @@ class ZoneWriter():
 
 
 
-""" Responsible for writing query tasks to files. Manages one file per client """
+""" Responsible for writing query tasks to files. Manages one file per client, each with an index of its tasks """
 class TaskWriter():
     
     """ Constructor for TaskWriter. Initializes file handles and counters. """
@@ -127,6 +128,9 @@ class TaskWriter():
         self.probe_config = probe_config        # Probe configuration
         self.file_handles = {}                  # Dict of probe_ip -> file handle 
         self.dir = os.path.join(os.getcwd(), materialize_dir)   # Directory to write client tasks to
+        self.offsets = {}                       # Dict of probe_ip -> byte offsets of the tasks in the current file
+        self.runtimes = {}                      # Dict of probe_ip -> estimated runtimes of the tasks in the current file
+        self.positions = {}                     # Dict of probe_ip -> byte offset of the next task in the current file
 
         # Statistics
         self.num_tasks = {}                     # Dict of probe_ip -> num_tasks
@@ -145,14 +149,20 @@ class TaskWriter():
             total[k] = total.get(k, 0) + self.num_tasks[k]    # Add num_tasks of current shard
         return total
 
-    """ Write querytask to task file of specific probe / client. """ 
-    def write(self, client, task:dict):
+    """ Write querytask to task file of specific probe / client. runtime is the estimated runtime of the task in seconds""" 
+    def write(self, client, task:dict, runtime:float=None):
         
         if not client in self.file_handles:     # Check if file handle exists
             self.file_handles[client] = open(f"{self.dir}/{self.TASKFILE_TEMPLATE.format(ip=client, shard=self.shard_num)}", 'w')
+            self.offsets[client] = []
+            self.runtimes[client] = []
+            self.positions[client] = 0
         
-        s = json.dumps(task)                    # Write task to file
-        self.file_handles[client].write(s + "\n")
+        s = json.dumps(task) + "\n"             # Write task to file
+        self.offsets[client].append(self.positions[client])
+        self.runtimes[client].append(runtime)
+        self.file_handles[client].write(s)
+        self.positions[client] += len(s.encode())
 
         # Increment counter
         self.num_tasks[client] = self.num_tasks.get(client, 0) + 1
@@ -160,10 +170,14 @@ class TaskWriter():
     """ Function to perform sharding. Closes all file handles, and opens new ones to continue"""
     def shard(self):
         
+        self._write_indexes()                             # Finish index of the current shard
         self.shard_num += 1                               # Increment shard number
         for p in self.file_handles.keys():                # Close and reopen all files with new shard num
             self.file_handles[p].close()
             self.file_handles[p] = open(f"{self.dir}/{self.TASKFILE_TEMPLATE.format(ip=p, shard=self.shard_num)}", 'w')
+            self.offsets[p] = []
+            self.runtimes[p] = []
+            self.positions[p] = 0
 
         for k in self.num_tasks:        # Sum total number of tasks
             self.num_tasks_total[k] = self.num_tasks_total.get(k, 0) + self.num_tasks[k]
@@ -171,4 +185,16 @@ class TaskWriter():
     
     """ Check internal counters and decide whether to shard """
     def should_shard(self) -> bool:
-        return False
\ No newline at end of file
+        return False
+
+    """ Internal function to write the index files of the current shard"""
+    def _write_indexes(self):
+        for p in self.file_handles.keys():
+            write_index(f"{self.dir}/{self.TASKFILE_TEMPLATE.format(ip=p, shard=self.shard_num)}", self.offsets[p], self.runtimes[p])
+
+    """ Write the index files and close all task files"""
+    def close(self):
+        self._write_indexes()
+        for k in self.file_handles:
+            self.file_handles[k].close()
+        self.file_handles = {}
\ No newline at end of file
@@ -52,14 +52,18 @@ pattern_scheme = {
           "vp": {"type": "string"},
           "query": {"type": "string"},
           "type": {"type": "string"},
-          "wait": {"type": ["integer", "string"]},
+          "wait": {"type": ["number", "string"]},
           "repeat": {"type": ["integer", "string"]},
-          "timeout": {"type": ["integer", "string"]},
+          "timeout": {"type": ["number", "string"]},
           "random_subdomains": {"type": "boolean"},
           "concurrent": {"type": "boolean"},
+          "parallelism": {"type": "integer", "minimum": 0},
           "expected_status": {"type": "string"},
           "recursion_desired": {"type": "boolean"},
-          "wait_after": {"type": ["integer", "string"]},
+          "wait_after": {"type": ["number", "string"]},
+          "wait_policy": {"type": "string"},
+          "abort_policy": {"type": "string"},
+          "policy_params": {"type": "object"},
         },
         "required": ["rr","vp","query"]
       }},
@@ -14,6 +14,8 @@ import lib.schemas as schemas
 #import common.Materialization as m
 import config as c
 import lib.Writer as w
+from engine.StatusTracker import WAIT_POLICIES, ABORT_POLICIES
+from engine.TaskIndex import estimate_runtime
 
 
 """ Fill in missing fields in the pattern file with the defaults from config.py"""
@@ -33,6 +35,19 @@ def pattern_set_defaults(pattern:dict):
     for k in default.keys():
       q.setdefault(k, default[k])
 
+""" Check whether the value of a dynamic field is a number (e.g. 1, 0.25 or "0.25") rather than a placeholder"""
+def is_number(value) -> bool:
+  try:
+    float(value)
+    return True
+  except ValueError:
+    return False
+
+""" Convert the value of a dynamic field to an int if it is integral, otherwise to a float"""
+def to_number(value):
+  f = float(value)
+  return int(f) if f.is_integer() else f
+
 """ Extract all dynamic fields that are required for the given pattern"""
 def pattern_get_required_columns(pattern: dict) -> set:
   required_columns = set()
@@ -40,9 +55,7 @@ def pattern_get_required_columns(pattern: dict) -> set:
     # Go through all queries in the pattern
     for qt in pattern['queries']:
       # check if the dynamic field is set with a placeholder
-      try:
-        int(qt[dyn_f])
-      except ValueError:
+      if not is_number(qt[dyn_f]):
         required_columns.add(qt[dyn_f])
   return required_columns
 
@@ -66,6 +79,10 @@ class Materialization:
 
     print(f"Materialized {num_tasks} querytasks and {num_records} RRs on {num_servers} nameserver(s) to {num_shards} shard(s).")
 
+  """ Finish all task files, i.e. write their indexes. Must be called once all resolvers are materialized"""
+  def close(self):
+    self.task_writer.close()
+
   """ Internal function to materialize a label."""
   def _materialize_label(self, label:str, resolver:dict):
     if label.startswith('$'):
@@ -103,8 +120,8 @@ class Materialization:
 
     # Create queries
     task = self._create_queries(resolver, ns_config)
-    # Write queries to task files
-    self.task_writer.write(resolver['vp0'], task)
+    # Write queries to task files, the index records their estimated runtime (see TASK_ORDER of the engine)
+    self.task_writer.write(resolver['vp0'], task, estimate_runtime(task))
 
     # Decide whether to shard
     if self.zone_writer.should_shard() or self.task_writer.should_shard():
@@ -164,25 +181,33 @@ class Materialization:
 
     return rrs 
  
+  """ Public function to estimate the runtime in seconds of the querytask of a given resolver, without materializing it"""
+  def estimate_runtime(self, resolver:dict) -> float:
+    return estimate_runtime({"queries": [self._substitute_dynamic_fields(qp, resolver) for qp in self.pattern['queries']]})
+
+  """ Internal function to copy a query of the pattern with its dynamic fields substituted for a given resolver"""
+  def _substitute_dynamic_fields(self, qp:dict, resolver:dict) -> dict:
+    q = dict(qp)
+    for f in DYNAMIC_FIELDS:
+      if not is_number(qp[f]):
+        # Make sure the placeholder is in the resolver csv
+        if qp[f] not in resolver.keys():
+          print(f"This pattern requires a variable {f}, but '{qp[f]}' is not in the resolver file")
+          exit(1)
+        # If wait is not a number, find the placeholder in the resolver csv
+        q[f] = resolver[qp[f]]
+      assert is_number(q[f]), f"Value '{q[f]}' of {f} is not a number"
+      assert f not in INTEGER_FIELDS or float(q[f]).is_integer(), f"Value '{q[f]}' of {f} is not an integer"
+      q[f] = to_number(q[f])
+    return q
+
   """ Internal function to create querytasks for a given resolver"""
   def _create_queries(self, resolver:dict, ns_config:dict=None) -> dict:
     materialized_queries = []
 
     for qp in self.pattern['queries']:
-      # Copy fields from pattern
-      q = dict(qp)
-
-      # Substitute dynamic fields
-      for f in DYNAMIC_FIELDS:
-        try:
-          int(qp[f])
-        except ValueError:
-          # Make sure the placeholder is in the resolver csv
-          if qp[f] not in resolver.keys():
-            print(f"This pattern requires a variable {f}, but '{qp[f]}' is not in the resolver file")
-            exit(1)
-          # If wait is not an integer, find the placeholder in the resolver csv
-          q[f] = resolver[qp[f]]
+      # Copy fields from pattern, substitute dynamic fields
+      q = self._substitute_dynamic_fields(qp, resolver)
 
       # Replace meta variables  
       q['rr'] = resolver[str(qp['rr'])].strip()
@@ -203,7 +228,38 @@ class Materialization:
     return result
 
 
-DYNAMIC_FIELDS = ['wait', 'repeat', 'timeout']
+""" Assigns querytasks to vantage points by their estimated runtime (greedy bin packing): each task goes to the vantage
+point that would finish it first, given the runtime of the tasks it already has and its relative capacity.
+Ties go to the vantage point listed first."""
+class RuntimeBalancer:
+
+  def __init__(self, vps:list, capacities:dict=None):
+    capacities = {} if capacities is None else capacities
+    self.vps = vps
+    self.capacities = {vp: float(capacities.get(vp, 1)) for vp in vps}
+    assert all([cap > 0 for cap in self.capacities.values()]), "Capacities of vantage points must be positive"
+    self.reset()
+
+  """ Forget the assigned tasks, e.g. for the next shard"""
+  def reset(self):
+    self.loads = {vp: 0.0 for vp in self.vps} # Dict of vp -> estimated runtime of its tasks in seconds
+
+  """ Assign a task with the given estimated runtime in seconds, returns its vantage point"""
+  def assign(self, runtime:float) -> str:
+    vp = min(self.vps, key=lambda vp: (self.loads[vp] + runtime) / self.capacities[vp])
+    self.loads[vp] += runtime
+    return vp
+
+  """ Returns the estimated load of each vantage point: the runtime of its tasks in seconds if run one after the other,
+  divided by its capacity. The actual runtime is lower, the engine runs several tasks at a time (NUM_WORKERS)"""
+  def weighted_loads(self) -> dict:
+    return {vp: self.loads[vp] / self.capacities[vp] for vp in self.vps}
+
+
+# Fields of query entries that are either a number or the name of a column in the resolver file.
+# Waits and timeouts are in seconds and may be fractional (e.g. 0.05), repeat must be an integer
+DYNAMIC_FIELDS = ['wait', 'repeat', 'timeout', 'wait_after']
+INTEGER_FIELDS = ['repeat']
 
 if __name__ == "__main__"  :
   
@@ -214,6 +270,7 @@ if __name__ == "__main__"  :
   parser.add_argument("resolverfile", help="Resolver file")
   parser.add_argument("--xprod", required=False, default=False, action="store_true", help="Cross product of all resolvers and vantage points")
   parser.add_argument("--split", required=False, default=False, action="store_true", help="Split querytasks equally across vantage points")
+  parser.add_argument("--balance", required=False, default=False, action="store_true", help="With --split, balance the estimated runtime of the querytasks across vantage points, weighted by CLIENT_CAPACITY")
   parser.add_argument("--shift", required=False, default=0, type=int, help="Shift the split query tasks by one vantage point")
   parser.add_argument("--shard_after", required=False, default=c.MAX_ZONE_ENTRIES, type=int, help="Shard the zone and querytask files into multiple files")
   parser.add_argument("--skip-duplicate-check", required=False, default=False, action="store_true", help="Skip duplicate check for zone files")
@@ -223,12 +280,19 @@ if __name__ == "__main__"  :
   assert args.shift < len(c.CLIENT_HOSTS), f"Shift must be smaller than number of vantage points ({len(c.CLIENT_HOSTS)})"
   assert args.shard_after > 0, "Shard after must be greater than 0"
   assert not (args.xprod and args.split), "Cannot use --xprod and --split at the same time"
+  assert not args.balance or args.split, "--balance requires --split"
+  assert not (args.balance and args.shift > 0), "Cannot use --shift with --balance, tasks are not assigned round-robin"
 
 
   # Read query pattern file
   with open(args.pattern, 'r') as f:
     pattern = json.loads(f.read())
     js.validate(pattern, schemas.pattern_scheme)
+    for q in pattern['queries']: # Policies selected per query entry must exist in the engine
+      if 'wait_policy' in q:
+        assert q['wait_policy'] in WAIT_POLICIES, f"Unknown wait policy {q['wait_policy']}"
+      if 'abort_policy' in q:
+        assert q['abort_policy'] in ABORT_POLICIES, f"Unknown abort policy {q['abort_policy']}"
   print(f"Loaded pattern '{pattern['pattern']}'")
 
   # Set missing fields to defaults
@@ -281,6 +345,10 @@ if __name__ == "__main__"  :
     # Initialize materialization object    
     m = Materialization(pattern, c.MATERIALIZE_DIR, args.shard_after, args.skip_duplicate_check)
 
+    # Balance the runtime of each shard across vantage points
+    balancer = RuntimeBalancer(vps, c.CLIENT_CAPACITY) if args.balance else None
+    balancer_shard = 0
+
     # Read resolver file line by line
     resolver_reader = csv.DictReader(f_resolver)
     for line in resolver_reader:
@@ -291,6 +359,14 @@ if __name__ == "__main__"  :
           line['vp0'] = vp
           m.materialize(line)
 
+      elif args.split and balancer is not None: # Split querytasks by estimated runtime across vantage points
+        if m.task_writer.shard_num != balancer_shard: # Shards run one after the other, balance each of them
+          print(f"Estimated load of shard {balancer_shard} per vantage point (serial runtime in seconds / capacity): {balancer.weighted_loads()}")
+          balancer.reset()
+          balancer_shard = m.task_writer.shard_num
+        line['vp0'] = balancer.assign(m.estimate_runtime(line))
+        m.materialize(line)
+
       elif args.split: # Split querytasks equally across vantage points
         # Set vantage point, increment round robin index, materialize
         line['vp0'] = vps[split_ind]
@@ -300,6 +376,12 @@ if __name__ == "__main__"  :
       else: # Materialize according to resolver file
         m.materialize(line)
 
+    if balancer is not None:
+      print(f"Estimated load of shard {balancer_shard} per vantage point (serial runtime in seconds / capacity): {balancer.weighted_loads()}")
+
+    # Write task indexes
+    m.close()
+
     # Dump 'nameservers' field to results directory
     with open(os.path.join(c.RESULTS_DIR, 'zoneconfig.json'), 'w') as f:
       json.dump(m.materialize_zone_config(), f, indent=2)
@@ -12,6 +12,7 @@ import config as c
 #import ..config as c
 
 import engine.config as ec
+from engine.TaskIndex import INDEX_SUFFIX
 #import engine.config as ec
 
 import common.jsonline as io
@@ -85,6 +86,12 @@ def prepare_tasks(source_dir:str, taskfiles:list, host_handles:list):
         print("Failed!")
         exit(1)
 
+      # Copy index of the probetask file, if any
+      if os.path.exists(probe_files[ip] + INDEX_SUFFIX):
+        if not handle.copy_file_to(probe_files[ip] + INDEX_SUFFIX, remote_taskfile + INDEX_SUFFIX):
+          print(f"Copying index of probetask file to remote host {ip} failed!")
+          exit(1)
+
 
 """ Check if a session with name session_name is running on any of the hosts. Return list of handles for hosts where it is running """
 def running_sessions(host_handles:list, session_name:str):
@@ -97,8 +104,24 @@ def dump_engine_settings(out_dir:str, out_file:str):
       "settings": {
         "max_timeouts": ec.MAX_FAILS,
         "num_workers": ec.NUM_WORKERS,
+        "engine_processes": ec.ENGINE_PROCESSES,
+        "execution_mode": ec.EXECUTION_MODE,
         "wait_policy": ec.WAIT_POLICY,
         "abort_policy": ec.ABORT_POLICY,
+        "query_engine": ec.QUERY_ENGINE,
+        "rate_limit_probe_qps": ec.RATE_LIMIT_PROBE_QPS,
+        "rate_limit_rr_qps": ec.RATE_LIMIT_RR_QPS,
+        "rate_limit_ns_qps": ec.RATE_LIMIT_NS_QPS,
+        "task_scheduler": ec.TASK_SCHEDULER,
+        "result_schema": ec.RESULT_SCHEMA,
+        "timestamp_format": ec.TIMESTAMP_FORMAT,
+        "kernel_timestamps": ec.KERNEL_TIMESTAMPS,
+        "output_format": ec.OUTPUT_FORMAT,
+        "output_compression": ec.OUTPUT_COMPRESSION,
+        "adaptive_timeout": ec.ADAPTIVE_TIMEOUT,
+        "adaptive_timeout_min": ec.ADAPTIVE_TIMEOUT_MIN,
+        "offline_ttl": ec.OFFLINE_TTL,
+        "concurrency_control": ec.CONCURRENCY_CONTROL,
         "debug": ec.DEBUG
       }
     }
@@ -199,8 +222,8 @@ if __name__ == "__main__"  :
 
   if args.command == "run":
     
-    # Task files are named "tasks<shard>@<probe_ip>"
-    taskfiles = [f for f in os.listdir(MATERIALIZED_DIR) if f.startswith("tasks")]
+    # Task files are named "tasks<shard>@<probe_ip>", their indexes "tasks<shard>@<probe_ip>.idx"
+    taskfiles = [f for f in os.listdir(MATERIALIZED_DIR) if f.startswith("tasks") and not f.endswith(INDEX_SUFFIX)]
 
     # Determine shard numbers
     shard_ids = list(set([f.split('@')[0][5:] for f in taskfiles]))
@@ -151,6 +151,26 @@ class TestStringMethods(unittest.TestCase):
     self.assertEqual(len(zone), 1)
     self.assertEqual(zone[0]['name'], "*.01020304-05060708.ta6.ch.")
 
+  def test_fractional_dynamic_fields(self):
+    # Waits and timeouts may be fractional, only non-numeric values are placeholders of resolver file columns
+    pattern = {"queries": [{"wait": 0.05, "repeat": 10, "timeout": "0.5", "wait_after": "pause"}]}
+    self.assertEqual(m.pattern_get_required_columns(pattern), {"pause"})
+    self.assertEqual(m.to_number("0.25"), 0.25)
+    self.assertEqual(m.to_number("3"), 3)
+    self.assertIsInstance(m.to_number("3.0"), int)
+    self.assertFalse(m.is_number("wait0"))
+
+  def test_runtime_balancer(self):
+    # Tasks go to the vantage point that finishes them first, in proportion to its capacity
+    balancer = m.RuntimeBalancer(["vp0", "vp1", "vp2"], {"vp2": 2})
+    vps = [balancer.assign(r) for r in [10, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]]
+    self.assertEqual(vps[0:3], ["vp2", "vp0", "vp1"])
+    loads = balancer.weighted_loads()
+    self.assertLessEqual(max(loads.values()) - min(loads.values()), 1)
+    self.assertEqual(sum(balancer.loads.values()), 22)
+    balancer.reset()
+    self.assertEqual(balancer.assign(1), "vp2")
+
 
     
 if __name__ == '__main__':